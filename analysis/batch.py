@@ -0,0 +1,296 @@
+"""Monthly store reports without the Streamlit app.
+
+    python -m analysis.batch sales.csv --month 2025-01 [--out reports] [--workers 8]
+
+The CSV is parsed once into its snapshot (reused if the same file was uploaded to the app
+before); worker processes memory-map that snapshot and each renders a share of the stores.
+"""
+import argparse
+import html
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analysis.benchmarks import load_benchmarks
+from analysis.company_standards import STANDARD_SOURCES
+from analysis.context import AnalysisContext
+from analysis.counter_shelf_analysis import compute_counter_shelf_performance
+from analysis.cube import load_or_build_cube
+from analysis.filters import FilterState
+from analysis.fnb_performance import compute_fnb_performance
+from analysis.ingest import load_sales_csv
+from analysis.kpi import KpiService
+from analysis.monetized_brands import compute_monetized_brands
+from analysis.order_analysis import compute_order_metrics
+from analysis.partition_index import PartitionIndex
+from analysis.profit import compute_profits
+from analysis.result_cache import ResultCache
+from analysis.sales_by_category import compute_category_sales, compute_weekly_contribution
+from analysis.sales_per_channel import compute_channel_sales
+from analysis.snapshot_cache import content_hash, load_snapshot, save_snapshot
+from analysis.time_slot_analysis import compute_time_slot_sales
+from analysis.top_n_brand_sales import DEFAULT_TOP_BRANDS, compute_brand_sales
+from analysis.top_n_products import DEFAULT_TOP_PRODUCTS, compute_product_sales, compute_top_products
+
+# Same defaults as the app's sliders
+TOP_BRANDS = DEFAULT_TOP_BRANDS
+TOP_PRODUCTS = DEFAULT_TOP_PRODUCTS
+
+
+@dataclass
+class ReportSection:
+    """One analysis of a store report: headline numbers and tables, or the error that stopped it."""
+    title: str
+    metrics: dict = field(default_factory=dict)
+    tables: list = field(default_factory=list)
+    error: str = None
+
+
+def load_dataset(csv_path):
+    """(dataset key, frame) of a sales CSV, parsing it only if no snapshot of these bytes exists yet."""
+    with open(csv_path, 'rb') as source:
+        dataset_key = content_hash(source)
+        data = load_snapshot(dataset_key)
+        if data is None:
+            data = load_sales_csv(source)
+            save_snapshot(dataset_key, data)
+    return dataset_key, data
+
+
+def month_range(month):
+    """First and last day of a 'YYYY-MM' month."""
+    period = pd.Period(month, freq='M')
+    return period.start_time.normalize(), period.end_time.normalize()
+
+
+def _sections(ctx):
+    # (title, compute) in the order the app shows them; compute returns (metrics, tables)
+    def profit():
+        profits = compute_profits(ctx.kpis, ctx.selected_store, ctx.start_date, ctx.end_date, ctx.average_daily_sales, ctx.profit_ratio)
+        return {
+            'Store Profit': profits.selected_store_profit,
+            'Store Average Profit per Day': profits.selected_store_average_profit,
+            'Overall Average Profit': profits.overall_average_profit,
+            'Profit %': profits.profit_contribution_percentage,
+        }, []
+
+    def orders():
+        result = compute_order_metrics(ctx.store_rows)
+        metrics = {
+            'Total Unique Orders': result.total_orders_count,
+            'Total Quantity': result.total_quantity,
+            'Customer Info Collected %': result.customer_collection_percentage,
+            'Total Numbers Collected': result.total_customers,
+        }
+        tables = [('Valid customers per day', result.daily_metrics)] if result.daily_metrics is not None else []
+        return metrics, tables
+
+    def categories():
+        result = compute_category_sales(ctx.store_cube, ctx.benchmark('category'))
+        weekly = compute_weekly_contribution(
+            ctx.store_cube, ctx.store_cube_calendar, ctx.start_date.to_period('M')
+        )
+        return {
+            'Total Quantity': result.total_quantity,
+            'Total Cost Price': result.total_cost_price,
+            'Total Profit': result.total_profit,
+        }, [('Sales per category', result.sales_per_category), ('Weekly contribution', weekly)]
+
+    def time_slots():
+        result = compute_time_slot_sales(
+            ctx.store_rows,
+            ctx.store_hour,
+            ctx.store_rows_calendar['day_of_week'],
+            ctx.company_totals('orderDate')['totalProductPrice'],
+            ctx.company_revenue,
+            ctx.benchmark('hourly'),
+        )
+        return {}, [('Hourly sales', result.hourly), ('Daily sales', result.daily), ('Sales by day of week', result.weekday)]
+
+    def channels():
+        result = compute_channel_sales(ctx.store_cube, ctx.benchmark('channel'))
+        return {}, [('Sales per channel', result.channel_sales), ('Against company standards', result.comparison)]
+
+    def brands():
+        result = compute_brand_sales(ctx.store_cube, ctx.company_totals('brandName'), ctx.benchmark('brand'), TOP_BRANDS)
+        return {}, [
+            (f'Top {TOP_BRANDS} brands', result.top_brands),
+            ('Company top brands missing in the store', result.missing_top_brands),
+            ('Benchmark brands', result.benchmark),
+            ('Benchmark brands not sold', result.missing_benchmark_brands),
+        ]
+
+    def products():
+        product_sales = compute_product_sales(ctx.store_cube)
+        n_products = min(TOP_PRODUCTS, len(product_sales.product_sales))
+        top = compute_top_products(
+            product_sales, ctx.company_totals('productName')['totalProductPrice'], ctx.company_revenue, n_products
+        )
+        return {}, [(f'Top {n_products} products', top), ('Red products', product_sales.rag('Red'))]
+
+    def fnb():
+        return {}, [('F&B brands', compute_fnb_performance(ctx.store_cube, ctx.benchmark('fnb')).performance)]
+
+    def monetized():
+        result = compute_monetized_brands(ctx.store_cube, ctx.benchmark('monetized'))
+        missing = pd.DataFrame({'brandName': result.missing_brands})
+        return {}, [('Monetized brands', result.performance), ('Monetized brands not sold', missing)]
+
+    def counter_shelf():
+        result = compute_counter_shelf_performance(ctx.store_cube, ctx.benchmark('counter_shelf'))
+        missing = pd.DataFrame({'categoryName': sorted(result.missing_categories)})
+        return {}, [('Counter shelf categories', result.performance), ('Categories not sold', missing)]
+
+    return [
+        ('Profit', profit),
+        ('Order Analysis', orders),
+        ('Sales by Category', categories),
+        ('Time Slot Analysis', time_slots),
+        ('Sales per Channel', channels),
+        ('Top-N Brands', brands),
+        ('Top-N Products', products),
+        ('F&B Performance', fnb),
+        ('Monetized Brands', monetized),
+        ('Counter Shelf Products', counter_shelf),
+    ]
+
+
+def build_store_report(ctx):
+    """Every section of the selected store's report; a failing section records its error and the rest still run."""
+    report = []
+    for title, compute in _sections(ctx):
+        try:
+            metrics, tables = compute()
+            report.append(ReportSection(title, metrics, tables))
+        except Exception as e:
+            report.append(ReportSection(title, error=str(e)))
+    return report
+
+
+def _format_number(value):
+    return f"{value:,.2f}" if isinstance(value, (float, np.floating)) else f"{value:,}"
+
+
+def report_html(store, start_date, end_date, sections):
+    """A standalone HTML page of one store's report."""
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(store)} {start_date.date()} to {end_date.date()}</title>",
+        "<style>body{font-family:Arial,sans-serif;margin:40px;} h1,h2{color:green;} "
+        "table{border-collapse:collapse;margin-bottom:20px;} th,td{border:1px solid #ccc;padding:4px 8px;}</style>",
+        "</head><body>",
+        f"<h1>{html.escape(store)}</h1><p>{start_date.date()} to {end_date.date()}</p>",
+    ]
+    for section in sections:
+        parts.append(f"<h2>{html.escape(section.title)}</h2>")
+        if section.error is not None:
+            parts.append(f"<p style='color:red;'>Could not compute this section: {html.escape(section.error)}</p>")
+            continue
+        if section.metrics:
+            parts.append("<table>")
+            parts.extend(
+                f"<tr><th>{html.escape(label)}</th><td>{_format_number(value)}</td></tr>"
+                for label, value in section.metrics.items()
+            )
+            parts.append("</table>")
+        for caption, frame in section.tables:
+            parts.append(f"<h3>{html.escape(caption)}</h3>")
+            if frame.empty:
+                parts.append("<p>No data.</p>")
+            else:
+                parts.append(frame.to_html(index=False, float_format=_format_number, na_rep=''))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def report_filename(store, month):
+    return f"{re.sub(r'[^A-Za-z0-9._-]+', '_', store).strip('_')}_{month}.html"
+
+
+# Per-process dataset state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(dataset_key, standards):
+    pd.set_option("mode.copy_on_write", True)
+    # The parent wrote both snapshots, so this is a memory map rather than a parse
+    data = load_snapshot(dataset_key)
+    _worker['dataset_key'] = dataset_key
+    _worker['index'] = PartitionIndex(data)
+    _worker['cube_index'] = PartitionIndex(load_or_build_cube(dataset_key, data))
+    _worker['kpis'] = KpiService(data)
+    _worker['standards'] = standards
+    # Results not tied to one store (measured standards, peer groups), computed once per worker
+    _worker['results'] = ResultCache()
+    if standards == 'files':
+        # Fail on an invalid benchmark file before the first report
+        load_benchmarks()
+
+
+def _render_store(store, month, out_dir):
+    start_date, end_date = month_range(month)
+    ctx = AnalysisContext(
+        _worker['index'], _worker['cube_index'], _worker['kpis'], FilterState(store, start_date, end_date),
+        _worker['dataset_key'], _worker['results'], _worker['standards'],
+    )
+    sections = build_store_report(ctx)
+
+    path = Path(out_dir) / report_filename(store, month)
+    path.write_text(report_html(store, start_date, end_date, sections), encoding='utf-8')
+    return path, sum(section.error is not None for section in sections)
+
+
+def run_batch(csv_path, month, out_dir, workers=None, stores=None, standards='files'):
+    """Write one report per store (all stores with sales in `month` by default); returns the report paths.
+
+    `standards` (a STANDARD_SOURCES key) picks what the reports compare against: the benchmark
+    files, or standards measured from the month's sales of every store or of each store's peers.
+    """
+    dataset_key, data = load_dataset(csv_path)
+    # Build and persist the cube here so the workers all find it on disk
+    load_or_build_cube(dataset_key, data)
+
+    start_date, end_date = month_range(month)
+    if stores is None:
+        index = PartitionIndex(data)
+        stores = [store for store in index.store_names if len(index.store_rows(store, start_date, end_date))]
+    del data
+
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset_key, standards)) as pool:
+        futures = {pool.submit(_render_store, store, month, out_dir): store for store in stores}
+        for future in as_completed(futures):
+            path, errors = future.result()
+            paths.append(path)
+            note = f" ({errors} section(s) failed)" if errors else ""
+            print(f"[{len(paths)}/{len(stores)}] {futures[future]} -> {path}{note}", flush=True)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a monthly HTML report for every store.")
+    parser.add_argument('csv', help="sales CSV export, as uploaded to the app")
+    parser.add_argument('--month', required=True, help="month to report on, YYYY-MM")
+    parser.add_argument('--out', default='reports', help="directory for the reports (default: reports)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument('--store', action='append', dest='stores', help="only this store; may be repeated")
+    parser.add_argument('--standards', choices=list(STANDARD_SOURCES), default='files',
+                        help="compare against the benchmark files (default), or standards measured from the month's "
+                             "sales of every store (company) or of the store's peer group (peers)")
+    args = parser.parse_args(argv)
+
+    pd.set_option("mode.copy_on_write", True)
+    started = time.perf_counter()
+    paths = run_batch(args.csv, args.month, args.out, args.workers, args.stores, args.standards)
+    print(f"Wrote {len(paths)} report(s) to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
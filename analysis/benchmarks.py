@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# The company_bechmark directory next to the analysis package, whatever the working directory
+BENCHMARK_DIR = Path(os.environ.get('TNS_BENCHMARK_DIR', Path(__file__).resolve().parent.parent / 'company_bechmark'))
+
+# Other spellings of the same key, after normalization (see normalize_key)
+KEY_ALIASES = {
+    'malboro': 'marlboro',
+}
+
+
+def normalize_key(value):
+    """Case-, whitespace- and alias-insensitive form of a benchmark key: 'Cafe ' -> 'cafe', 'Malboro' -> 'marlboro'."""
+    key = re.sub(r'\s+', ' ', str(value)).strip().casefold()
+    return KEY_ALIASES.get(key, key)
+
+
+def normalize_hour(value):
+    """Hour of day 0-23 of an hourly benchmark label ('1:00 PM') or of an hour number."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.to_datetime(str(value).strip(), format='%I:%M %p').hour
+
+
+@dataclass(frozen=True)
+class BenchmarkSpec:
+    """Where a benchmark lives and what its keys are."""
+    file_name: str
+    key_column: str
+    normalize: callable = normalize_key
+
+
+BENCHMARKS = {
+    'category': BenchmarkSpec('category_benchmark.csv', 'subCategoryOf'),
+    'hourly': BenchmarkSpec('hourly_sales_benchmark.csv', 'hour', normalize_hour),
+    'brand': BenchmarkSpec('brand_sales_benchmark.csv', 'brandName'),
+    'fnb': BenchmarkSpec('fnb_benchmark.csv', 'brandName'),
+    'monetized': BenchmarkSpec('monetized_brands.csv', 'brandName'),
+    'counter_shelf': BenchmarkSpec('counter_shelf_benchmark.csv', 'categoryName'),
+    'channel': BenchmarkSpec('sales_per_channel_benchmark.csv', 'orderType'),
+}
+
+
+class Benchmark:
+    """One validated benchmark: company standard (percent of sales) per key.
+
+    Spellings that normalize to the same key (Red bull / Red Bull, Malboro / Marlboro) are one
+    entry with their standards summed, named after the spelling with the larger share.
+    """
+
+    def __init__(self, spec, frame, version=None):
+        self.key_column = spec.key_column
+        self.normalize = spec.normalize
+        # File mtime the table was read at; part of the cache key of results that use it
+        self.version = version
+
+        groups = frame.assign(_key=frame[spec.key_column].map(spec.normalize)).groupby('_key', sort=False)
+        standards = groups['Company Standard'].sum()
+        names = frame[spec.key_column].loc[groups['Company Standard'].idxmax().to_numpy()]
+        if names.dtype == object:
+            names = names.map(lambda name: re.sub(r'\s+', ' ', name).strip())
+
+        self._standards = dict(zip(standards.index, standards.to_numpy()))
+        self._names = dict(zip(standards.index, names.to_numpy()))
+        # Benchmark order, display spellings
+        self.frame = pd.DataFrame({spec.key_column: names.to_numpy(), 'Company Standard': standards.to_numpy()})
+
+    def __contains__(self, key):
+        return self.normalize(key) in self._standards
+
+    def __len__(self):
+        return len(self._standards)
+
+    def get(self, key, default=None):
+        """Company standard of `key`, or `default` if the benchmark does not list it."""
+        return self._standards.get(self.normalize(key), default)
+
+    def standard_for(self, values):
+        """Company standard of each of `values` (NaN where not listed), aligned with them."""
+        return values.map(lambda value: self._standards.get(self.normalize(value), np.nan)).astype(float)
+
+    def canonical(self, values):
+        """`values` with every listed key replaced by its benchmark spelling; others unchanged."""
+        return values.map(lambda value: self._names.get(self.normalize(value), value)).astype(object)
+
+
+def read_benchmark(path, spec):
+    """Read and validate one benchmark CSV; raises ValueError naming the file and the problem."""
+    frame = pd.read_csv(path)
+    missing = [column for column in (spec.key_column, 'Company Standard') if column not in frame.columns]
+    if missing:
+        raise ValueError(f"{path.name}: missing column(s) {', '.join(missing)}")
+
+    frame = frame[[spec.key_column, 'Company Standard']]
+    if frame[spec.key_column].isna().any():
+        raise ValueError(f"{path.name}: {int(frame[spec.key_column].isna().sum())} row(s) without a {spec.key_column}")
+
+    standards = pd.to_numeric(frame['Company Standard'], errors='coerce')
+    invalid = frame.loc[standards.isna() | (standards < 0), spec.key_column]
+    if len(invalid):
+        raise ValueError(f"{path.name}: Company Standard is not a non-negative number for {', '.join(map(str, invalid))}")
+
+    try:
+        frame[spec.key_column].map(spec.normalize)
+    except ValueError as e:
+        raise ValueError(f"{path.name}: unreadable {spec.key_column}: {e}") from None
+    return frame.assign(**{'Company Standard': standards})
+
+
+_lock = threading.Lock()
+# name -> Benchmark, reloaded when its file's mtime changes
+_loaded = {}
+
+
+def get_benchmark(name):
+    """The benchmark `name` (a BENCHMARKS key), read once and again only after the file changes."""
+    spec = BENCHMARKS[name]
+    path = BENCHMARK_DIR / spec.file_name
+    version = path.stat().st_mtime_ns
+    with _lock:
+        benchmark = _loaded.get(name)
+        if benchmark is None or benchmark.version != version:
+            benchmark = Benchmark(spec, read_benchmark(path, spec), version)
+            _loaded[name] = benchmark
+    return benchmark
+
+
+def load_benchmarks():
+    """Every benchmark by name; fails on the first invalid file."""
+    return {name: get_benchmark(name) for name in BENCHMARKS}
@@ -26,7 +26,7 @@ def top_n_brand_availability_analysis(store_data_filtered):
     )
 
     # Group by brandName and calculate the availability
-    brand_availability = store_data_filtered.groupby('brandName').agg(
+    brand_availability = store_data_filtered.groupby('brandName', observed=True).agg(
         total_availability=('quantity', 'sum'), 
         total_products=('productId', 'count')
     ).reset_index()
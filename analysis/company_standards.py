@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from analysis.benchmarks import BENCHMARKS, Benchmark
+from analysis.fnb_performance import EXCLUDED_CATEGORIES, FNB_BRANDS
+from analysis.time_parsing import hour_of_day
+
+# Fallbacks when standards come from the benchmark files: average daily sales of a store and profit per rupee of sales
+COMPANY_AVERAGE_DAILY_SALES = 42358
+COMPANY_PROFIT_RATIO = 0.3
+
+# Where the sections' company standards come from: the benchmark files (with the fixed figures above),
+# every store's sales in the selected dates, or the sales of the selected store's peer group
+STANDARD_SOURCES = {
+    'files': "Benchmark files",
+    'company': "All stores (live)",
+    'peers': "Peer group (live)",
+}
+
+# Benchmark name -> cube column whose values it compares, as share (percent) of all sales
+CUBE_SHARES = {
+    'category': 'subCategoryOf',
+    'brand': 'brandName',
+    'monetized': 'brandName',
+    'counter_shelf': 'categoryName',
+    'channel': 'orderType',
+}
+
+
+@dataclass
+class CompanyStandards:
+    """Company standards measured from the data over one date range.
+
+    `benchmarks` holds a Benchmark per BENCHMARKS name, so the sections use them exactly
+    like the file benchmarks; `version` names the range and goes into their cache keys.
+    """
+    version: str
+    average_daily_sales: float
+    profit_ratio: float
+    benchmarks: dict
+
+
+def _share_benchmark(name, sales, version):
+    # Benchmark of each key's share (percent) of `sales`' total
+    spec = BENCHMARKS[name]
+    total = sales.sum()
+    shares = sales / total * 100 if total else sales * 0.0
+    frame = pd.DataFrame({spec.key_column: sales.index.to_numpy(), 'Company Standard': shares.to_numpy()})
+    return Benchmark(spec, frame, version)
+
+
+def compute_company_standards(kpis, cube_rows, line_rows, start_date, end_date, stores=None, scope='company'):
+    """Every company standard over [start_date, end_date], from the cube cells and line items of that range.
+
+    The rows are every store's, or with `stores` (a list) just those stores', and the KPI figures are
+    limited the same way; `scope` names the group in the version, e.g. 'peers4.2'.
+
+    Average daily sales is per store and active day (KpiService.period_average), the profit
+    ratio is company profit over company revenue, and each share benchmark is the company's
+    split of sales over that benchmark's keys: all sales for categories, brands, channels and
+    counter shelf categories, F&B sales for the F&B brands, line items for the hours.
+    """
+    version = f"live:{scope}:{pd.Timestamp(start_date):%Y-%m-%d}:{pd.Timestamp(end_date):%Y-%m-%d}"
+
+    totals = kpis.totals(stores, start_date, end_date)
+    # Both are 0 when nothing sold in the range, like the cards show for an empty range
+    average_daily_sales = np.nan_to_num(kpis.period_average(stores, start_date, end_date, 'day'))
+    profit_ratio = (totals['revenue'] - totals['cost']) / totals['revenue'] if totals['revenue'] else 0.0
+
+    cube = cube_rows[list(dict.fromkeys(CUBE_SHARES.values())) + ['totalProductPrice']]
+
+    benchmarks = {}
+    for name, column in CUBE_SHARES.items():
+        sales = cube.groupby(column, observed=True)['totalProductPrice'].sum()
+        benchmarks[name] = _share_benchmark(name, sales, version)
+
+    fnb = cube[cube['brandName'].isin(FNB_BRANDS) & ~cube['categoryName'].isin(EXCLUDED_CATEGORIES)]
+    benchmarks['fnb'] = _share_benchmark('fnb', fnb.groupby('brandName', observed=True)['totalProductPrice'].sum(), version)
+
+    hours = hour_of_day(line_rows['time_seconds']).to_numpy(dtype=np.float64, na_value=np.nan)
+    known = ~np.isnan(hours)
+    hourly_sales = np.bincount(
+        hours[known].astype(np.int64),
+        weights=np.nan_to_num(line_rows['totalProductPrice'].to_numpy(dtype=np.float64)[known]),
+        minlength=24,
+    )
+    hourly_sales = pd.Series(hourly_sales, index=np.arange(24))
+    benchmarks['hourly'] = _share_benchmark('hourly', hourly_sales[hourly_sales > 0], version)
+
+    return CompanyStandards(
+        version=version,
+        average_daily_sales=float(average_daily_sales),
+        profit_ratio=profit_ratio,
+        benchmarks=benchmarks,
+    )
@@ -0,0 +1,224 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from analysis.benchmarks import get_benchmark
+from analysis.company_standards import COMPANY_AVERAGE_DAILY_SALES, COMPANY_PROFIT_RATIO, compute_company_standards
+from analysis.peer_groups import DEFAULT_PEER_GROUPS, compute_peer_groups
+from analysis.time_parsing import hour_of_day
+
+# Additive cube measures, summed for company totals
+CUBE_SUMS = ['totalProductPrice', 'quantity', 'line_cost', 'line_profit', 'line_count']
+
+
+def calendar_columns(dates):
+    """year, ISO week, month name/period, week of month and weekday for a column of order dates.
+
+    The fields are derived once per distinct date and mapped back, instead of once per row.
+    """
+    codes, days = pd.factorize(dates)
+    days = pd.DatetimeIndex(days)
+
+    table = pd.DataFrame({
+        'year': days.year,
+        'week': days.isocalendar().week.to_numpy(),
+        'month': days.strftime('%b'),
+        'month_period': days.to_period('M'),
+        'week_of_month': (days.day - 1) // 7 + 1,
+        'day_of_week': days.day_name(),
+    })
+
+    # Missing dates (code -1) map onto a trailing all-NA row
+    if (codes < 0).any():
+        table = table.reindex(range(len(days) + 1))
+        codes = np.where(codes < 0, len(days), codes)
+
+    return table.iloc[codes].set_axis(dates.index)
+
+
+class AnalysisContext:
+    """Everything the analysis sections share within one rerun.
+
+    Built once in main.py from the dataset's indexes and the sidebar's FilterState; each
+    intermediate is computed the first time a section asks for it and reused after that.
+    Frames are handed out as shallow copies, so a section adding columns to its copy
+    (copy-on-write is on) never changes what the next section sees.
+    """
+
+    def __init__(self, index, cube_index, kpis, filters, dataset_key=None, results=None,
+                 standards='files', n_peer_groups=DEFAULT_PEER_GROUPS):
+        self.index = index
+        self.cube_index = cube_index
+        self.kpis = kpis
+        self.filters = filters
+        self.selected_store = filters.store
+        self.start_date = filters.start_date
+        self.end_date = filters.end_date
+        self.dataset_key = dataset_key
+        # Shared ResultCache; None computes every result in place
+        self.results = results
+        # Which standards the sections compare against, a STANDARD_SOURCES key
+        self.standards = standards
+        self.n_peer_groups = n_peer_groups
+        self._company_totals = {}
+
+    @cached_property
+    def _store_rows(self):
+        return self.filters.rows(self.index)
+
+    @cached_property
+    def _store_cube(self):
+        return self.filters.rows(self.cube_index)
+
+    @property
+    def store_rows(self):
+        """Line items of the selected store in the selected date range, channels and categories."""
+        return self._store_rows.copy(deep=False)
+
+    @property
+    def store_cube(self):
+        """Daily cube cells of the selected store in the selected date range, channels and categories."""
+        return self._store_cube.copy(deep=False)
+
+    @property
+    def company_cube(self):
+        """The whole daily cube: every store, every date."""
+        return self.cube_index.frame.copy(deep=False)
+
+    def store_cube_for(self, store):
+        """Cube cells of `store` under the same filters (the memoized slice for the selected store)."""
+        if store == self.selected_store:
+            return self.store_cube
+        return self.filters.for_store(store).rows(self.cube_index)
+
+    @cached_property
+    def company_revenue(self):
+        """Revenue of every store over the whole dataset."""
+        return self.cube_index.frame['totalProductPrice'].sum()
+
+    @property
+    def selection_key(self):
+        """The dataset, store, date range and filters, e.g. for what a download covers."""
+        return (self.dataset_key, *self.filters.cache_key)
+
+    def cached(self, section, compute, *params):
+        """`compute()` for this store, date range and filters, shared through the result cache.
+
+        `section` names the computation and `params` are whatever else its result depends on
+        (slider values, chosen months, ...); they must be hashable.
+        """
+        if self.results is None or self.dataset_key is None:
+            return compute()
+        key = (self.dataset_key, *self.filters.cache_key, section, params)
+        return self.results.get_or_compute(key, compute)
+
+    def range_cached(self, section, compute, *params):
+        """Like `cached`, for results covering every store: shared by whichever store and filters are selected."""
+        if self.results is None or self.dataset_key is None:
+            return compute()
+        key = (self.dataset_key, None, self.start_date, self.end_date, section, params)
+        return self.results.get_or_compute(key, compute)
+
+    def company_totals(self, dimension):
+        """Whole-dataset sums per value of `dimension` (e.g. brandName, productName, orderDate)."""
+        if dimension not in self._company_totals:
+            compute = lambda: self.cube_index.frame.groupby(dimension, observed=True)[CUBE_SUMS].sum()
+            if self.results is None or self.dataset_key is None:
+                self._company_totals[dimension] = compute()
+            else:
+                # Not tied to the store or date range, so every view of the dataset shares it
+                key = (self.dataset_key, None, None, None, 'company_totals', (dimension,))
+                self._company_totals[dimension] = self.results.get_or_compute(key, compute)
+        return self._company_totals[dimension]
+
+    @cached_property
+    def company_standards(self):
+        """CompanyStandards of every store over the selected date range (whichever store is selected)."""
+        compute = lambda: compute_company_standards(
+            self.kpis,
+            self.cube_index.date_rows(self.start_date, self.end_date),
+            self.index.date_rows(self.start_date, self.end_date)[['time_seconds', 'totalProductPrice']],
+            self.start_date,
+            self.end_date,
+        )
+        return self.range_cached('company_standards', compute)
+
+    @cached_property
+    def peer_groups(self):
+        """PeerGroups of the whole dataset's stores, by category mix."""
+        compute = lambda: compute_peer_groups(self.cube_index.frame, self.n_peer_groups)
+        if self.results is None or self.dataset_key is None:
+            return compute()
+        key = (self.dataset_key, None, None, None, 'peer_groups', (self.n_peer_groups,))
+        return self.results.get_or_compute(key, compute)
+
+    @cached_property
+    def peers(self):
+        """The selected store's peer group (itself included)."""
+        return self.peer_groups.peers_of(self.selected_store)
+
+    @cached_property
+    def peer_standards(self):
+        """CompanyStandards of the selected store's peer group over the selected date range."""
+        peers = self.peers
+        if not peers:
+            return self.company_standards
+        scope = f"peers{self.n_peer_groups}.{self.peer_groups.group_of(self.selected_store)}"
+        compute = lambda: compute_company_standards(
+            self.kpis,
+            pd.concat([self.cube_index.store_rows(store, self.start_date, self.end_date) for store in peers]),
+            pd.concat([
+                self.index.store_rows(store, self.start_date, self.end_date)[['time_seconds', 'totalProductPrice']]
+                for store in peers
+            ]),
+            self.start_date,
+            self.end_date,
+            peers,
+            scope,
+        )
+        # Shared by every store of the group
+        return self.range_cached('peer_standards', compute, scope)
+
+    @property
+    def live_standards(self):
+        """The measured CompanyStandards in use, or None when the benchmark files are."""
+        if self.standards == 'company':
+            return self.company_standards
+        if self.standards == 'peers':
+            return self.peer_standards
+        return None
+
+    def benchmark(self, name):
+        """The Benchmark `name` the sections compare against: measured standards or the benchmark file."""
+        standards = self.live_standards
+        if standards is not None:
+            return standards.benchmarks[name]
+        return get_benchmark(name)
+
+    @property
+    def average_daily_sales(self):
+        """Company (or peer group) average daily sales of a store, for the KPI cards."""
+        standards = self.live_standards
+        return COMPANY_AVERAGE_DAILY_SALES if standards is None else standards.average_daily_sales
+
+    @property
+    def profit_ratio(self):
+        """Company (or peer group) profit per rupee of sales."""
+        standards = self.live_standards
+        return COMPANY_PROFIT_RATIO if standards is None else standards.profit_ratio
+
+    @cached_property
+    def store_hour(self):
+        """Hour of day (0-23) of each of the selected store's line items."""
+        return hour_of_day(self._store_rows['time_seconds'])
+
+    @cached_property
+    def store_rows_calendar(self):
+        """calendar_columns for the selected store's line items."""
+        return calendar_columns(self._store_rows['orderDate'])
+
+    @cached_property
+    def store_cube_calendar(self):
+        """calendar_columns for the selected store's cube cells."""
+        return calendar_columns(self._store_cube['orderDate'])
@@ -1,65 +1,85 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-def analyze_counter_shelf_products(store_data, all_data): 
-    st.markdown("<h4 style='color: green; text-align: center;'>COUNTER SHELF PRODUCTS ANALYSIS</h4>", unsafe_allow_html=True)
-    st.markdown("---")
+from analysis.formatting import AMOUNT, PERCENT, labels, styled
 
-    # List of counter shelf product categories to filter
-    counter_shelf_categories = [
-        "Candies & Toffees", 
-        "Sweets, Chocolates & Candies", 
-        "Chocolates", 
-        "Gums, Mints & Mouth Freshener"
-    ]
+# List of counter shelf product categories to filter
+COUNTER_SHELF_CATEGORIES = [
+    "Candies & Toffees", 
+    "Sweets, Chocolates & Candies", 
+    "Chocolates", 
+    "Gums, Mints & Mouth Freshener"
+]
 
-    st.sidebar.markdown("## Filter Options for counter shelf")
 
-    store_names = store_data['storeName'].unique()
-    selected_store = st.sidebar.selectbox("Select a Store:", store_names, key="store_selector_counter_shelf")
+@dataclass
+class CounterShelfPerformance:
+    """Per-category sales of the counter shelf categories in one store, and the ones it does not sell."""
+    performance: pd.DataFrame
+    missing_categories: set
 
-    metric = st.sidebar.selectbox("Select Metric for Counter Shelf Products Analysis:", 
-                                  ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
-                                  key="metric_selector_counter_shelf")
 
-    # Option to display data labels in the sidebar
-    show_data_labels = st.sidebar.checkbox("Show Data Labels", value=True, key="data_labels_counter_shelf")
+def compute_counter_shelf_performance(store_cube, company_benchmark, categories=COUNTER_SHELF_CATEGORIES):
+    """Quantity, revenue, cost, profit, margin and share of store sales per counter shelf category."""
+    filtered_counter_shelf = store_cube[store_cube['categoryName'].isin(categories)]
 
-    # Choose plot type, set default to "Pie" in the sidebar
-    plot_type = st.sidebar.selectbox("Select Plot Type:", ["Bar", "Scatter", "Pie"], key="plot_type_selector_counter_shelf", index=0)
+    missing_categories = set(categories) - set(filtered_counter_shelf['categoryName'].unique())
 
-    # Choose color scale in the sidebar
-    color_scale = st.sidebar.selectbox("Select Color Scale:", 
-                                       ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
-                                       key="color_scale_counter_shelf")
+    counter_shelf_performance = filtered_counter_shelf.groupby('categoryName', observed=True).agg(
+        total_quantity=('quantity', 'sum'),
+        total_revenue=('totalProductPrice', 'sum'),
+        total_cost=('line_cost', 'sum'),
+        total_products=('productId', 'nunique') 
+    ).reset_index()
 
-    store_data_filtered = store_data[store_data['storeName'] == selected_store]
+    counter_shelf_performance['profit'] = counter_shelf_performance['total_revenue'] - counter_shelf_performance['total_cost']
+    counter_shelf_performance['profit_margin'] = (counter_shelf_performance['profit'] / counter_shelf_performance['total_revenue']) * 100
 
-    filtered_counter_shelf = store_data_filtered[store_data_filtered['categoryName'].isin(counter_shelf_categories)]
+    total_store_revenue = store_cube['totalProductPrice'].sum()
+    counter_shelf_performance['contribution'] = (counter_shelf_performance['total_revenue'] / total_store_revenue) * 100
 
-    missing_categories = set(counter_shelf_categories) - set(filtered_counter_shelf['categoryName'].unique())
+    counter_shelf_performance['Company Standard'] = company_benchmark.standard_for(counter_shelf_performance['categoryName'])
 
-    if not filtered_counter_shelf.empty:
+    counter_shelf_performance['variance'] = counter_shelf_performance['contribution']-counter_shelf_performance['Company Standard']
+    return CounterShelfPerformance(counter_shelf_performance, missing_categories)
 
-        counter_shelf_performance = filtered_counter_shelf.groupby('categoryName').agg(
-            total_quantity=('quantity', 'sum'),
-            total_revenue=('totalProductPrice', 'sum'),
-            total_cost=('costPrice', lambda x: (x * filtered_counter_shelf.loc[x.index, 'quantity']).sum()), 
-            total_products=('productId', 'nunique') 
-        ).reset_index()
 
-        counter_shelf_performance['profit'] = counter_shelf_performance['total_revenue'] - counter_shelf_performance['total_cost']
-        counter_shelf_performance['profit_margin'] = (counter_shelf_performance['profit'] / counter_shelf_performance['total_revenue']) * 100
+def cached_counter_shelf_performance(ctx):
+    """compute_counter_shelf_performance of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('counter_shelf')
+    return ctx.cached('counter_shelf_performance', lambda: compute_counter_shelf_performance(ctx.store_cube, benchmark), benchmark.version)
 
-        total_store_revenue = store_data_filtered['totalProductPrice'].sum()
-        counter_shelf_performance['contribution'] = (counter_shelf_performance['total_revenue'] / total_store_revenue) * 100
 
-        company_benchmark = pd.read_csv('./company_bechmark/counter_shelf_benchmark.csv')
+@st.fragment
+def render_counter_shelf_products(ctx):
+    st.markdown("<h4 style='color: green; text-align: center;'>COUNTER SHELF PRODUCTS ANALYSIS</h4>", unsafe_allow_html=True)
+    st.markdown("---")
 
-        counter_shelf_performance = counter_shelf_performance.merge(company_benchmark, on='categoryName', how='left')
+    controls = st.expander("Filter Options for counter shelf")
 
-        counter_shelf_performance['variance'] = counter_shelf_performance['contribution']-counter_shelf_performance['Company Standard']
+    metric = controls.selectbox("Select Metric for Counter Shelf Products Analysis:", 
+                                  ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
+                                  key="metric_selector_counter_shelf")
+
+    # Option to display data labels
+    show_data_labels = controls.checkbox("Show Data Labels", value=True, key="data_labels_counter_shelf")
+
+    # Choose plot type, set default to "Pie"
+    plot_type = controls.selectbox("Select Plot Type:", ["Bar", "Scatter", "Pie"], key="plot_type_selector_counter_shelf", index=0)
+
+    # Choose color scale
+    color_scale = controls.selectbox("Select Color Scale:", 
+                                       ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
+                                       key="color_scale_counter_shelf")
+
+    result = cached_counter_shelf_performance(ctx)
+    counter_shelf_performance = result.performance
+    missing_categories = result.missing_categories
+
+    if not counter_shelf_performance.empty:
 
         if metric == "Total Quantity":
             y_axis = 'total_quantity'
@@ -116,20 +136,14 @@ def analyze_counter_shelf_products(store_data, all_data):
 
         st.plotly_chart(fig_counter_shelf)
 
-        counter_shelf_performance['profit_margin'] = counter_shelf_performance['profit_margin'].map(lambda x: f"{x:.2f}%")
-        counter_shelf_performance['contribution'] = counter_shelf_performance['contribution'].map(lambda x: f"{x:.2f}%")
-        counter_shelf_performance['Company Standard'] = counter_shelf_performance['Company Standard'].map(lambda x: f"{x:.2f}%")
-        counter_shelf_performance['variance'] = counter_shelf_performance['variance'].map(lambda x: f"{x:.2f}%")
-        counter_shelf_performance['total_revenue'] = counter_shelf_performance['total_revenue'].apply(lambda x: f"{x:.2f}")
-        counter_shelf_performance['total_cost'] = counter_shelf_performance['total_cost'].apply(lambda x: f"{x:.2f}")
-        counter_shelf_performance['profit'] = counter_shelf_performance['profit'].apply(lambda x: f"{x:.2f}")
-
-        def highlight_negative(s):
-            return ['background-color: red' if float(val.replace('%', '')) < 0 else '' for val in s]
-
         to_display = counter_shelf_performance[['categoryName', 'total_revenue', 'total_cost', 'profit','contribution','Company Standard','variance']]
 
-        styled_df = to_display.style.apply(highlight_negative, subset=['variance'])
+        styled_df = styled(
+            to_display,
+            {'total_revenue': AMOUNT, 'total_cost': AMOUNT, 'profit': AMOUNT,
+             'contribution': PERCENT, 'Company Standard': PERCENT, 'variance': PERCENT},
+            negative=['variance'], negative_style='background-color: red',
+        )
 
         st.table(styled_df)
 
@@ -140,8 +154,7 @@ def analyze_counter_shelf_products(store_data, all_data):
             value_name='Percentage'
         )
 
-        melted_df['Percentage'] = melted_df['Percentage'].apply(lambda x: float(x.replace('%', '')))
-        melted_df['Percentage_label'] = melted_df['Percentage'].apply(lambda x: f'{x:.2f}%')
+        melted_df['Percentage_label'] = labels(melted_df['Percentage'])
 
         fig_comparison = px.bar(
             melted_df,
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from analysis.partition_index import sort_by_store_and_date
+from analysis.snapshot_cache import load_snapshot, save_snapshot
+
+# Grain of the daily aggregate cube; orderDate is a calendar day in the sales export
+CUBE_KEYS = ['storeName', 'orderDate', 'categoryName', 'subCategoryOf', 'brandName', 'productId', 'productName', 'orderType']
+
+# Measures keep the raw column names so modules can group the cube exactly like line items:
+#   totalProductPrice, quantity, line_cost, line_profit - sums of the line item columns
+#   line_count - number of line items folded into the cell
+CUBE_MEASURES = ['totalProductPrice', 'quantity', 'line_cost', 'line_profit', 'line_count']
+
+
+def build_cube(data):
+    """Fold line items into one row per store/day/category/subCategoryOf/brand/product/orderType."""
+    keys = [col for col in CUBE_KEYS if col in data.columns]
+
+    # Sum in float64; the float32 line items would lose cents over a few million rows.
+    # Prices are rupees and paise, so rounding to 2 places recovers the exact values float32 approximated.
+    measures = pd.DataFrame({
+        'totalProductPrice': data['totalProductPrice'].astype('float64').round(2),
+        'quantity': data['quantity'].astype('float64'),
+        'line_cost': data['line_cost'].astype('float64').round(2),
+        'line_profit': data['line_profit'].astype('float64').round(2),
+        'line_count': np.ones(len(data), dtype=np.int64),
+    })
+    measures[keys] = data[keys]
+
+    cube = measures.groupby(keys, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+    return sort_by_store_and_date(cube)
+
+
+def load_or_build_cube(key, data):
+    """The dataset's cube, read from its snapshot directory or built and persisted there."""
+    cube = load_snapshot(key, name='cube')
+    if cube is None:
+        cube = build_cube(data)
+        save_snapshot(key, cube, name='cube')
+    return cube
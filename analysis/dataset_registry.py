@@ -0,0 +1,123 @@
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# A session that has not rerun for this long no longer holds its dataset
+SESSION_TTL_SECONDS = 30 * 60
+
+
+def current_session_id():
+    """Id of the Streamlit session running this script ('local' outside a Streamlit run)."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'local'
+
+
+class DatasetRegistry:
+    """One read-only frame per distinct dataset, shared by every session on this server.
+
+    Datasets are keyed by content hash and reference-counted by the sessions using them;
+    once no live session holds a dataset it is dropped from memory (its snapshot stays on disk).
+    """
+
+    def __init__(self, session_ttl=SESSION_TTL_SECONDS):
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+        self._frames = {}
+        # key -> {session_id: last time that session used the dataset}
+        self._holders = {}
+        # Per-key locks so two sessions opening the same file only load it once
+        self._loading = {}
+        # key -> {artifact name: object derived from the frame, e.g. its partition index}
+        self._artifacts = {}
+
+    def acquire(self, key, session_id, loader):
+        """Return a read-only view of dataset `key`, loading it with `loader()` on first use.
+
+        Any dataset the session held before is released. Returns None if the loader does.
+        """
+        self.release(session_id, except_key=key)
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = loader()
+                if frame is None:
+                    return None
+
+            with self._lock:
+                self._frames[key] = frame
+                self._holders.setdefault(key, {})[session_id] = time.monotonic()
+
+        self.collect()
+        return self._view(frame)
+
+    def get(self, key, session_id):
+        """View of an already registered dataset (refreshing the session's hold), or None."""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                return None
+            self._holders.setdefault(key, {})[session_id] = time.monotonic()
+        return self._view(frame)
+
+    def artifact(self, key, name, build):
+        """Object derived from dataset `key` by `build(frame)`, built once and evicted with the dataset."""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                raise KeyError(f"Dataset {key} is not loaded")
+            key_lock = self._loading.setdefault(key, threading.Lock())
+            artifacts = self._artifacts.setdefault(key, {})
+
+        with key_lock:
+            if name not in artifacts:
+                artifacts[name] = build(frame)
+            return artifacts[name]
+
+    def release(self, session_id, except_key=None):
+        """Drop the session's hold on every dataset other than `except_key`."""
+        with self._lock:
+            for key, holders in self._holders.items():
+                if key != except_key:
+                    holders.pop(session_id, None)
+        self.collect()
+
+    def collect(self):
+        """Forget sessions past their TTL and evict datasets nobody holds any more."""
+        cutoff = time.monotonic() - self.session_ttl
+        with self._lock:
+            for key in list(self._frames):
+                holders = self._holders.get(key, {})
+                for session_id, last_seen in list(holders.items()):
+                    if last_seen < cutoff:
+                        del holders[session_id]
+                if not holders:
+                    self._frames.pop(key, None)
+                    self._holders.pop(key, None)
+                    self._loading.pop(key, None)
+                    self._artifacts.pop(key, None)
+
+    def stats(self):
+        """[(key, number of sessions holding it, bytes in memory)] for each resident dataset."""
+        with self._lock:
+            return [
+                (key, len(self._holders.get(key, {})), int(frame.memory_usage(deep=True).sum()))
+                for key, frame in self._frames.items()
+            ]
+
+    @staticmethod
+    def _view(frame):
+        # With copy-on-write enabled a shallow copy shares the underlying arrays, and any write
+        # through it copies the touched column instead of changing the shared frame
+        return frame.copy(deep=False)
+
+
+@st.cache_resource
+def get_registry():
+    """The process-wide dataset registry."""
+    return DatasetRegistry()
@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import io
+import os
+
+import pandas as pd
+import streamlit as st
+
+from analysis.result_cache import ResultCache
+
+# Memory the prepared download payloads may use, shared by every session on this server
+MAX_DOWNLOAD_BYTES = int(os.environ.get('TNS_DOWNLOAD_CACHE_MAX_BYTES', 128 * 1024 ** 2))
+# Rows serialized at a time, so a big export never exists as one CSV string
+CSV_CHUNK_ROWS = 50_000
+# Session value of a download nobody has prepared yet (None is a valid scope)
+_UNPREPARED = object()
+
+
+@st.cache_resource
+def get_download_cache():
+    """The process-wide cache of CSV payloads, keyed by frame content."""
+    return ResultCache(MAX_DOWNLOAD_BYTES)
+
+
+def frame_digest(frame):
+    """Hash of a frame's columns and values; equal frames share one cached payload."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(frame.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def write_csv(frame, target, chunk_rows=CSV_CHUNK_ROWS):
+    """Write `frame` as UTF-8 CSV to the binary file `target`, `chunk_rows` rows at a time."""
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        target.write(chunk.to_csv(index=False, header=start == 0).encode('utf-8'))
+
+
+def csv_payload(frame, compress=False, cache=True):
+    """CSV bytes of `frame` (gzip-compressed if `compress`), built once per distinct content unless not `cache`."""
+    def build():
+        buffer = io.BytesIO()
+        if compress:
+            # mtime=0 keeps the archive bytes a function of the content alone
+            with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as target:
+                write_csv(frame, target)
+        else:
+            write_csv(frame, buffer)
+        return buffer.getvalue()
+
+    if not cache:
+        return build()
+    return get_download_cache().get_or_compute((frame_digest(frame), compress), build)
+
+
+def csv_download(label, frame, file_name, container=None, scope=None):
+    """Download of `frame` as CSV in `container` (default: here), serialized only once the user asks for it.
+
+    `frame` may be a DataFrame or a function returning one, so exports that need extra work
+    (like the full order history) are not even assembled until then. `scope` is what the export
+    covers, e.g. AnalysisContext.selection_key: a "Prepare" click holds only while it is unchanged,
+    and a function `frame` must depend on nothing else, as its payload is then cached by scope and
+    label, so reruns neither rebuild nor rehash it. Sections are fragments, which cannot write to
+    the sidebar, so they pass their own controls.
+
+    The payload is handed over as one bytes object: Streamlit's download_button reads whatever it
+    is given into memory anyway, so a file or generator would not save anything.
+    """
+    # One slot, so the download button takes the place of the "Prepare" button on the click's own run
+    slot = (container or st).empty()
+    prepared_key = f"download_prepared:{label}"
+    if st.session_state.get(prepared_key, _UNPREPARED) != scope:
+        if slot.button(f"Prepare {label}", key=f"prepare:{label}"):
+            st.session_state[prepared_key] = scope
+        else:
+            return
+
+    compress = st.session_state.get('gzip_downloads', False)
+    if callable(frame) and scope is not None:
+        build = frame
+        payload = get_download_cache().get_or_compute(
+            ('scoped', scope, label, compress), lambda: csv_payload(build(), compress, cache=False)
+        )
+    else:
+        payload = csv_payload(frame() if callable(frame) else frame, compress)
+    slot.download_button(
+        label=label,
+        data=payload,
+        file_name=f"{file_name}.gz" if compress else file_name,
+        mime='application/gzip' if compress else 'text/csv',
+    )
@@ -2,21 +2,228 @@
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 from PIL import Image
 import io
+import os
 import base64
+import hashlib
+import html
+import re
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from pathlib import Path
+from typing import List, Optional
 from jinja2 import Template
+from fpdf import FPDF
 import pdfkit
 from datetime import datetime
 
+# Rasterized figures, one PNG per hash of the figure JSON, reused across exports and sessions
+FIGURE_CACHE_DIR = Path(os.environ.get('TNS_FIGURE_CACHE_DIR', Path(__file__).resolve().parent.parent / '.cache' / 'figures'))
+
+# Worker processes rendering figures; each keeps its Kaleido renderer running between figures
+RENDER_WORKERS = int(os.environ.get('TNS_RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def _render_png(fig_json: str, scale: int, key: str) -> Path:
+    # Runs in a render worker; Kaleido starts on the first figure and stays up for the next ones.
+    # The image goes straight to the cache file, so only its path travels back to the caller.
+    return _store_png(key, pio.from_json(fig_json).to_image(format="png", scale=scale))
+
+
+def _get_renderer() -> ProcessPoolExecutor:
+    """The process-wide pool of render workers, started on first use."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        return _renderer
+
+
+def figure_key(fig_json: str, scale: int) -> str:
+    """Cache key of a figure rendered at `scale`."""
+    digest = hashlib.blake2b(fig_json.encode('utf-8'), digest_size=16)
+    digest.update(f"@{scale}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def _store_png(key: str, png: bytes) -> Path:
+    FIGURE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = FIGURE_CACHE_DIR / f"{key}.png"
+    # Write to a temporary file first so a concurrent export never reads a partial image
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(png)
+    os.replace(tmp_path, path)
+    return path
+
+
+def submit_figures(figs: List[go.Figure], scale: int = 2) -> List[Future]:
+    """Futures of each figure's cached PNG file, in order.
+
+    Figures rendered before (same JSON, same scale) resolve at once from the cache; the
+    others are rendered concurrently by the render workers.
+    """
+    futures = []
+    # Identical figures in one export are only rendered once
+    pending = {}
+    for fig in figs:
+        fig_json = fig.to_json()
+        key = figure_key(fig_json, scale)
+        path = FIGURE_CACHE_DIR / f"{key}.png"
+        if key not in pending:
+            if path.exists():
+                pending[key] = Future()
+                pending[key].set_result(path)
+            else:
+                pending[key] = _get_renderer().submit(_render_png, fig_json, scale, key)
+        futures.append(pending[key])
+    return futures
+
+
+def rasterize_figures(figs: List[go.Figure], scale: int = 2) -> List[bytes]:
+    """PNG bytes of each figure, in order (see submit_figures)."""
+    return [future.result().read_bytes() for future in submit_figures(figs, scale)]
+
+
+REPORT_CSS = """
+body { 
+    font-family: Arial, sans-serif; 
+    margin: 40px;
+    line-height: 1.6;
+}
+.header { 
+    text-align: center; 
+    margin-bottom: 30px;
+}
+.section {
+    margin-bottom: 40px;
+}
+.chart-container {
+    margin: 20px 0;
+}
+.chart-container img {
+    display: block;
+    margin: 20px auto;
+    max-width: 100%;
+}
+table { 
+    width: 100%; 
+    border-collapse: collapse; 
+    margin: 20px 0;
+}
+th, td { 
+    border: 1px solid #ddd; 
+    padding: 8px; 
+    text-align: left;
+}
+th { background-color: #f5f5f5; }
+.footer { 
+    text-align: center; 
+    margin-top: 50px; 
+    font-size: 12px;
+    color: #666;
+}
+"""
+
+# Report backends accepted by PDFExporter.create_pdf
+REPORT_BACKENDS = ('pdfkit', 'fpdf', 'html')
+
+
+def _html_text(content: str) -> str:
+    # Plain text of an HTML fragment, one line per block, for backends that cannot lay out HTML
+    text = html.unescape(re.sub(r'<[^>]+>', '\n', content))
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _latin1(text: str) -> str:
+    # fpdf's core fonts only cover Latin-1
+    return text.replace('₹', 'Rs. ').encode('latin-1', 'replace').decode('latin-1')
+
+
+class HtmlReportWriter:
+    """Report written to disk one section at a time.
+
+    Images are copied next to the report (into <name>_files/) and linked, not inlined, so
+    only the section being written is ever held in memory.
+    """
+
+    def __init__(self, filename: str):
+        self.path = Path(filename)
+        self.assets_dir = self.path.with_name(f"{self.path.stem}_files")
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write(
+            f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8'>\n<style>{REPORT_CSS}"
+            ".section { page-break-inside: avoid; }</style>\n</head>\n<body>\n"
+            f"<div class=\"header\">\n<h1>Dashboard Report</h1>\n"
+            f"<p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>\n</div>\n<div class=\"content\">\n"
+        )
+
+    def add_section(self, title: str, content: str, image: Optional[Path] = None):
+        if image is not None:
+            self.assets_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(image, self.assets_dir / image.name)
+            src = f"{self.assets_dir.name}/{image.name}"
+            content = f'<div class="chart-container">\n{content}\n<img src="{src}" style="width: 100%; max-width: 800px;">\n</div>'
+        self._file.write(f'<div class="section">\n<h2>{title}</h2>\n{content}\n</div>\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.write('</div>\n<div class="footer">\nGenerated using Streamlit\n</div>\n</body>\n</html>\n')
+        self._file.close()
+
+
+class FpdfReportWriter:
+    """PDF laid out with fpdf, section by section, with no browser or wkhtmltopdf involved.
+
+    Section HTML is reduced to plain text; images are read from their files when placed.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.pdf = FPDF()
+        self.pdf.set_auto_page_break(True, margin=15)
+        self.pdf.add_page()
+        self.pdf.set_font('Arial', 'B', 18)
+        self.pdf.cell(0, 10, 'Dashboard Report', ln=1, align='C')
+        self.pdf.set_font('Arial', '', 10)
+        self.pdf.cell(0, 6, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=1, align='C')
+        self.pdf.ln(6)
+
+    def add_section(self, title: str, content: str, image: Optional[Path] = None):
+        self.pdf.set_font('Arial', 'B', 14)
+        self.pdf.multi_cell(0, 8, _latin1(title))
+        text = _html_text(content)
+        if text:
+            self.pdf.set_font('Arial', '', 10)
+            self.pdf.multi_cell(0, 5, _latin1(text))
+        if image is not None:
+            self.pdf.image(str(image), w=self.pdf.w - self.pdf.l_margin - self.pdf.r_margin)
+        self.pdf.ln(8)
+
+    def close(self):
+        self.pdf.output(self.filename, 'F')
+
+
+def _png_to_html(png: bytes) -> str:
+    # Return HTML img tag with embedded base64 image
+    img_base64 = base64.b64encode(png).decode()
+    return f'<img src="data:image/png;base64,{img_base64}" style="width: 100%; max-width: 800px;">'
+
+
 @dataclass
 class ComponentExport:
     """Class to hold component export information"""
     title: str
     content: str
     order: int = 0
+    # Plotly figure still to be rasterized into the content at export time
+    figure: Optional[go.Figure] = None
 
 class PDFExporter:
     def __init__(self):
@@ -24,48 +231,66 @@ class PDFExporter:
     
     def plotly_to_html(self, fig) -> str:
         """Convert Plotly figure to static HTML image"""
-        # Convert plotly figure to static image bytes
-        img_bytes = fig.to_image(format="png", scale=2)
-        
-        # Convert bytes to base64 string
-        img_base64 = base64.b64encode(img_bytes).decode()
-        
-        # Return HTML img tag with embedded base64 image
-        return f'<img src="data:image/png;base64,{img_base64}" style="width: 100%; max-width: 800px;">'
+        return _png_to_html(rasterize_figures([fig])[0])
     
     def register_component(self, title: str, content: str, order: int = 0):
         """Register a component for PDF export"""
         self._components.append(ComponentExport(title=title, content=content, order=order))
     
     def register_plotly_component(self, title: str, fig, description: str = "", order: int = 0):
-        """Register a Plotly figure with optional description"""
-        # Convert Plotly figure to static HTML image
-        fig_html = self.plotly_to_html(fig)
-        
-        # Combine description and figure
-        content = f"""
-        <div class="chart-container">
-            {description}
-            {fig_html}
-        </div>
-        """
-        
-        self.register_component(title, content, order)
+        """Register a Plotly figure with optional description; it is rasterized when the PDF is created"""
+        self._components.append(ComponentExport(title=title, content=description, order=order, figure=fig))
     
     def clear_components(self):
         """Clear all registered components"""
         self._components = []
     
-    def create_pdf(self, filename: str = "output.pdf") -> bool:
-        """Generate PDF from all registered components"""
-        sorted_components = sorted(self._components, key=lambda x: x.order)
-        
-        combined_content = "\n\n".join([
-            f'<div class="section">\n<h2>{comp.title}</h2>\n{comp.content}\n</div>'
-            for comp in sorted_components
-        ])
-        
-        return self._generate_pdf(combined_content, filename)
+    def _component_html(self, comp: ComponentExport, png: Optional[bytes]) -> str:
+        if png is None:
+            return comp.content
+        # Combine description and figure
+        return f"""
+        <div class="chart-container">
+            {comp.content}
+            {_png_to_html(png)}
+        </div>
+        """
+    
+    def create_pdf(self, filename: str = "output.pdf", backend: str = "pdfkit") -> bool:
+        """Generate the report from all registered components.
+
+        backend is 'pdfkit' (one HTML page through wkhtmltopdf), 'fpdf' (PDF without a browser)
+        or 'html' (paged HTML with the images as files); the last two write each section as
+        soon as it and the sections before it are ready.
+        """
+        if backend not in REPORT_BACKENDS:
+            raise ValueError(f"Unknown report backend: {backend!r}")
+
+        sorted_components = sorted(self._components, key=lambda comp: comp.order)
+
+        # Submit every figure at once so the render workers run them side by side
+        figures = [comp.figure for comp in sorted_components if comp.figure is not None]
+        futures = iter(submit_figures(figures))
+        pending = [(comp, next(futures) if comp.figure is not None else None) for comp in sorted_components]
+
+        # Figures render here, not when registered, so render errors are reported like any other report error
+        try:
+            if backend == 'pdfkit':
+                combined_content = "\n\n".join([
+                    f'<div class="section">\n<h2>{comp.title}</h2>\n'
+                    f'{self._component_html(comp, future.result().read_bytes() if future else None)}\n</div>'
+                    for comp, future in pending
+                ])
+                return self._generate_pdf(combined_content, filename)
+
+            writer = FpdfReportWriter(filename) if backend == 'fpdf' else HtmlReportWriter(filename)
+            for comp, future in pending:
+                writer.add_section(comp.title, comp.content, future.result() if future else None)
+            writer.close()
+            return True
+        except Exception as e:
+            st.error(f"Error generating PDF: {str(e)}")
+            return False
     
     def _generate_pdf(self, content: str, filename: str) -> bool:
         """Convert HTML content to PDF"""
@@ -73,45 +298,7 @@ class PDFExporter:
         <!DOCTYPE html>
         <html>
             <head>
-                <style>
-                    body { 
-                        font-family: Arial, sans-serif; 
-                        margin: 40px;
-                        line-height: 1.6;
-                    }
-                    .header { 
-                        text-align: center; 
-                        margin-bottom: 30px;
-                    }
-                    .section {
-                        margin-bottom: 40px;
-                    }
-                    .chart-container {
-                        margin: 20px 0;
-                    }
-                    .chart-container img {
-                        display: block;
-                        margin: 20px auto;
-                        max-width: 100%;
-                    }
-                    table { 
-                        width: 100%; 
-                        border-collapse: collapse; 
-                        margin: 20px 0;
-                    }
-                    th, td { 
-                        border: 1px solid #ddd; 
-                        padding: 8px; 
-                        text-align: left;
-                    }
-                    th { background-color: #f5f5f5; }
-                    .footer { 
-                        text-align: center; 
-                        margin-top: 50px; 
-                        font-size: 12px;
-                        color: #666;
-                    }
-                </style>
+                <style>{{style}}</style>
             </head>
             <body>
                 <div class="header">
@@ -130,6 +317,7 @@ class PDFExporter:
         
         html_content = html_template.render(
             date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            style=REPORT_CSS,
             content=content
         )
         
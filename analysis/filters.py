@@ -0,0 +1,63 @@
+from dataclasses import dataclass, replace
+
+import pandas as pd
+
+# Optional filters: FilterState field -> the sales column it narrows
+FILTER_COLUMNS = {
+    'channels': 'orderType',
+    'categories': 'subCategoryOf',
+}
+
+
+@dataclass(frozen=True)
+class FilterState:
+    """The page's one selection: a store, an inclusive date range and optional channel/category filters.
+
+    Built once from the sidebar (or per report in batch) and applied once, through the partition
+    indexes, by AnalysisContext. Empty `channels`/`categories` mean all of them. The channel and
+    category filters narrow the selected store's slices, so the section tables; the KPI prefix
+    sums, company standards and leaderboard always cover all sales.
+    """
+    store: str
+    start_date: pd.Timestamp
+    end_date: pd.Timestamp
+    channels: tuple = ()
+    categories: tuple = ()
+
+    @property
+    def narrowed(self):
+        """Whether a channel or category filter is set."""
+        return bool(self.channels or self.categories)
+
+    @property
+    def cache_key(self):
+        """Everything a result of the selected store depends on, for result cache keys."""
+        return (self.store, self.start_date, self.end_date, self.channels, self.categories)
+
+    def for_store(self, store):
+        """The same dates and filters for another store."""
+        return replace(self, store=store)
+
+    def apply(self, rows):
+        """`rows` in the selected channels and categories (all of them when there is no such filter)."""
+        if not self.narrowed:
+            return rows
+        keep = None
+        for field, column in FILTER_COLUMNS.items():
+            values = getattr(self, field)
+            if values:
+                matches = rows[column].isin(values).to_numpy()
+                keep = matches if keep is None else keep & matches
+        return rows[keep]
+
+    def rows(self, index):
+        """Rows of the store in the date range from a PartitionIndex (line items or cube), filtered."""
+        return self.apply(index.store_rows(self.store, self.start_date, self.end_date))
+
+
+def filter_options(index, column):
+    """Values of `column` in a PartitionIndex's frame, for the filter pickers."""
+    values = index.frame[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    return sorted(values.dropna().unique())
@@ -1,89 +1,102 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
-def fnb_performance_analysis(store_data, all_data):
-    # st.markdown("<br><br><br>", unsafe_allow_html=True)
-    st.markdown("<h4 style='color: green; text-align: center;'>F&B PERFORMANCE</h4>", unsafe_allow_html=True)
-    st.markdown("---")
-
-    # List of F&B brands to filter
-    fnb_brands = ['Takeout Cafe', 'TNS', 'The New Shop', 'Urban Tapri']
-
-    # Categories to exclude from the analysis
-    categories_to_exclude = [
-        'Home Cleaning', 'Others', 'Hookah', 'Art', 'Atta & Flour', 'Audio & Accessories', 'Baby Care',
-        'Bath & Body', 'Bath &  Body', 'Accessories', 'Car Accessories', 'Book & Magazine', 'Boxes', 
-        'Gift Boxes', 'Cigar', 'Cigarettes', 'Cloths', 'Decor', 'Decoration', 'Chhath Puja Special', 
-        'Beauty Grooming Devices', 'Carry Bags', 'Condiments', 'Dhoop & Aggarbattis', 'Diabetes Care', 
-        'Dips & Dressings', 'Crockery & Utensils', 'Notebooks & Diaries', 'Provisions', 
-        'Fashion & Accessories', 'Fragrances', 'Disposables', 'Disposables & Tissues', 'Home Decor', 
-        'Home Care', 'Kitchen', 'Laundry', 'Home & Kitchen Appliances', 'Valentine Week', 'Toys', 
-        'Todler Toys', 'Tobacco', 'Skin Care', 'Sexual Wellness', 'Services', 'Raw Material', 'Rakhi', 
-        'Rakhi Special', 'Pest Control', 'Personal Care', 'Pooja', 'Pooja Essentials', 'Science Kits', 
-        'Health Care', 'Light Candles & Diyas', 'Light up & Diyas', 'Toilet', 'Pain Relief', 'Papers', 
-        'Party', 'Party Pack', 'Oral Care', 'Learning & Motivation', 'Pen & Pencils', 'Hygiene', 
-        'Interior Accessories', 'Hair Care', 'Ice Cubes', 'Havan Accessories', 'Face Care', 'Hookah'
-    ]
-
-    # Sidebar controls
-    with st.sidebar:
-        st.header("F&B Performance Controls")
-        
-        # Select a store from the store names
-        store_names = store_data['storeName'].unique()
-        selected_store = st.selectbox("Select a Store:", store_names, key="store_selector_fnb")
-
-        # User input for selecting the metric for performance analysis
-        metric = st.selectbox("Select Metric for F&B Performance Analysis:", 
-                              ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
-                              key="metric_selector_fnb",index=1)
-
-        # Option to display data labels
-        show_data_labels = st.checkbox("Show Data Labels", value=True, key="data_labels_fnb")
-
-        # Choose plot type
-        plot_type = st.selectbox("Select Plot Type:", ["Pie", "Bar", "Scatter"], key="plot_type_selector_fnb")
-
-        # Choose color scale
-        color_scale = st.selectbox("Select Color Scale:", 
-                                   ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
-                                   key="color_scale_fnb", index=4)
-
-    # Filter the data for the selected store
-    store_data_filtered = store_data[store_data['storeName'] == selected_store]
-
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, styled
+
+# List of F&B brands to filter
+FNB_BRANDS = ['Takeout Cafe', 'TNS', 'The New Shop', 'Urban Tapri']
+
+# Categories to exclude from the analysis
+EXCLUDED_CATEGORIES = [
+    'Home Cleaning', 'Others', 'Hookah', 'Art', 'Atta & Flour', 'Audio & Accessories', 'Baby Care',
+    'Bath & Body', 'Bath &  Body', 'Accessories', 'Car Accessories', 'Book & Magazine', 'Boxes', 
+    'Gift Boxes', 'Cigar', 'Cigarettes', 'Cloths', 'Decor', 'Decoration', 'Chhath Puja Special', 
+    'Beauty Grooming Devices', 'Carry Bags', 'Condiments', 'Dhoop & Aggarbattis', 'Diabetes Care', 
+    'Dips & Dressings', 'Crockery & Utensils', 'Notebooks & Diaries', 'Provisions', 
+    'Fashion & Accessories', 'Fragrances', 'Disposables', 'Disposables & Tissues', 'Home Decor', 
+    'Home Care', 'Kitchen', 'Laundry', 'Home & Kitchen Appliances', 'Valentine Week', 'Toys', 
+    'Todler Toys', 'Tobacco', 'Skin Care', 'Sexual Wellness', 'Services', 'Raw Material', 'Rakhi', 
+    'Rakhi Special', 'Pest Control', 'Personal Care', 'Pooja', 'Pooja Essentials', 'Science Kits', 
+    'Health Care', 'Light Candles & Diyas', 'Light up & Diyas', 'Toilet', 'Pain Relief', 'Papers', 
+    'Party', 'Party Pack', 'Oral Care', 'Learning & Motivation', 'Pen & Pencils', 'Hygiene', 
+    'Interior Accessories', 'Hair Care', 'Ice Cubes', 'Havan Accessories', 'Face Care', 'Hookah'
+]
+
+
+@dataclass
+class FnbPerformance:
+    """Per-brand F&B sales of one store against the F&B benchmark."""
+    performance: pd.DataFrame
+
+
+def compute_fnb_performance(store_cube, company_benchmark, fnb_brands=FNB_BRANDS, categories_to_exclude=EXCLUDED_CATEGORIES):
+    """Quantity, revenue, cost, profit, margin and share of F&B sales per F&B brand."""
     # Filter the data for F&B brands
-    fnb_data = store_data_filtered[store_data_filtered['brandName'].isin(fnb_brands)]
+    fnb_data = store_cube[store_cube['brandName'].isin(fnb_brands)]
 
     # Exclude specific categories
     fnb_data = fnb_data[~fnb_data['categoryName'].isin(categories_to_exclude)]
 
     # Calculate total sales, total cost, profit, and profit margin for each brand
-    fnb_performance = fnb_data.groupby('brandName').agg(
+    fnb_performance = fnb_data.groupby('brandName', observed=True).agg(
         total_quantity=('quantity', 'sum'),
         total_revenue=('totalProductPrice', 'sum'),
-        total_cost=('costPrice', lambda x: (x * fnb_data.loc[x.index, 'quantity']).sum())  
+        total_cost=('line_cost', 'sum')
     ).reset_index()
 
     # Calculate total sales for the selected store
     total_sales_selected_store = fnb_performance['total_revenue'].sum()
 
-    all_fnb_data = all_data[all_data['brandName'].isin(fnb_brands)]
-    all_fnb_data = all_fnb_data[~all_fnb_data['categoryName'].isin(categories_to_exclude)]
-
     fnb_performance['contribution'] = (fnb_performance['total_revenue'] / total_sales_selected_store) * 100
 
-    company_benchmark = pd.read_csv('./company_bechmark/fnb_benchmark.csv')
-
-    fnb_performance = fnb_performance.merge(company_benchmark, on = "brandName", how='left')
+    fnb_performance['Company Standard'] = company_benchmark.standard_for(fnb_performance['brandName'])
 
     fnb_performance['variance'] = fnb_performance['contribution'] - fnb_performance['Company Standard']
 
     # Calculate profit and profit margin
     fnb_performance['profit'] = fnb_performance['total_revenue'] - fnb_performance['total_cost']
     fnb_performance['profit_margin'] = (fnb_performance['profit'] / fnb_performance['total_revenue']) * 100
+    return FnbPerformance(fnb_performance)
+
+
+def cached_fnb_performance(ctx):
+    """compute_fnb_performance of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('fnb')
+    return ctx.cached('fnb_performance', lambda: compute_fnb_performance(ctx.store_cube, benchmark), benchmark.version)
+
+
+@st.fragment
+def render_fnb_performance(ctx):
+    # st.markdown("<br><br><br>", unsafe_allow_html=True)
+    st.markdown("<h4 style='color: green; text-align: center;'>F&B PERFORMANCE</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+
+    # Section controls; the section is a fragment, so changing them reruns only this section
+    controls = st.expander("F&B Performance Controls")
+    with controls:
+        # User input for selecting the metric for performance analysis
+        metric = st.selectbox("Select Metric for F&B Performance Analysis:", 
+                              ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
+                              key="metric_selector_fnb",index=1)
+
+        # Option to display data labels
+        show_data_labels = st.checkbox("Show Data Labels", value=True, key="data_labels_fnb")
+
+        # Choose plot type
+        plot_type = st.selectbox("Select Plot Type:", ["Pie", "Bar", "Scatter"], key="plot_type_selector_fnb")
+
+        # Choose color scale
+        color_scale = st.selectbox("Select Color Scale:", 
+                                   ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
+                                   key="color_scale_fnb", index=4)
+
+    result = cached_fnb_performance(ctx)
+    fnb_performance = result.performance
 
     if metric == "Total Quantity":
         y_axis = 'total_quantity'
@@ -145,46 +158,20 @@ def fnb_performance_analysis(store_data, all_data):
     # Display the plot with specified size
     st.plotly_chart(fig_fnb)
 
-    def highlight_negative_variance(s):
-        numeric_values = pd.to_numeric(s, errors='coerce')
-        return ['background-color: red' if v < 0 else '' for v in numeric_values]
-
-    fnb_performance['contribution'] = fnb_performance['contribution'].map(lambda x: f"{x:.2f}%")
-    fnb_performance['Company Standard'] = fnb_performance['Company Standard'].map(lambda x: f"{x:.2f}%")
-    fnb_performance['profit_margin'] = fnb_performance['profit_margin'].map(lambda x: f"{x:.2f}%")
-    fnb_performance['profit'] = fnb_performance['profit'].map(lambda x: f"{x:.2f}")
-    fnb_performance['total_revenue'] = fnb_performance['total_revenue'].map(lambda x: f"{x:.2f}")
-    fnb_performance['total_cost'] = fnb_performance['total_cost'].map(lambda x: f"{x:.2f}")
-    fnb_performance['variance_str'] = fnb_performance['variance'].map(lambda x: f"{x:.2f}%" if x >= 0 else f"-{abs(x):.2f}%")
-
-    variance_highlight = fnb_performance['variance']
-    highlighted_variance = highlight_negative_variance(variance_highlight)
-
-    st.table(
-        fnb_performance[['brandName', 'total_revenue', 'total_cost', 'profit', 'profit_margin', 'contribution', 'Company Standard', 'variance']].style.apply(highlight_negative_variance, subset=['variance'])
-    )
-
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_fnb = convert_df(fnb_performance)
-
-    st.sidebar.download_button(
-            label="Download FnB Sales Data",
-            data=csv_fnb,   
-            file_name='fnb_sales.csv',
-            mime='text/csv',
-        )
+    st.table(styled(
+        fnb_performance[['brandName', 'total_revenue', 'total_cost', 'profit', 'profit_margin', 'contribution', 'Company Standard', 'variance']],
+        {'total_revenue': AMOUNT, 'total_cost': AMOUNT, 'profit': AMOUNT,
+         'profit_margin': PERCENT, 'contribution': PERCENT, 'Company Standard': PERCENT, 'variance': PERCENT},
+        negative=['variance'], negative_style='background-color: red',
+    ))
 
-    fnb_performance['contribution_float'] = pd.to_numeric(fnb_performance['contribution'].astype(str).str.rstrip('%'), errors='coerce')
-    fnb_performance['Company Standard_float'] = pd.to_numeric(fnb_performance['Company Standard'].astype(str).str.rstrip('%'), errors='coerce')
+    csv_download("Download FnB Sales Data", fnb_performance, 'fnb_sales.csv', controls, scope=ctx.selection_key)
 
     # Line chart for contribution vs Company Standard
     fig_line = go.Figure()
     fig_line.add_trace(go.Scatter(
         x=fnb_performance['brandName'], 
-        y=fnb_performance['contribution_float'], 
+        y=fnb_performance['contribution'], 
         mode='lines+markers', 
         name='Contribution', 
         line=dict(color='blue')
@@ -192,7 +179,7 @@ def fnb_performance_analysis(store_data, all_data):
 
     fig_line.add_trace(go.Scatter(
         x=fnb_performance['brandName'], 
-        y=fnb_performance['Company Standard_float'], 
+        y=fnb_performance['Company Standard'], 
         mode='lines+markers', 
         name='Company Standard', 
         line=dict(color='green')
@@ -0,0 +1,33 @@
+import pandas as pd
+import streamlit as st
+
+# Display formats of the analysis tables; the frames themselves stay numeric
+AMOUNT = '{:.2f}'
+RUPEE_AMOUNT = '₹{:,.2f}'
+PERCENT = '{:.2f}%'
+INTEGER = '{:.0f}'
+
+
+def styled(frame, formats=None, negative=None, negative_style='color: red'):
+    """Styler showing `frame` with `formats` ({column: format spec}) applied at display time.
+
+    Negative numbers in the `negative` columns get `negative_style`.
+    """
+    styler = frame.style.format(formats or {})
+    if negative:
+        styler = styler.map(lambda value: negative_style if pd.notna(value) and value < 0 else '', subset=negative)
+    return styler
+
+
+def labels(values, spec=PERCENT):
+    """Text labels for chart traces, e.g. '12.50%'."""
+    return values.map(spec.format)
+
+
+def column_config(formats):
+    """st.dataframe column_config showing numeric columns with the given format specs."""
+    # '{:.2f}%' -> '%.2f%%', the printf style NumberColumn expects
+    return {
+        column: st.column_config.NumberColumn(format=spec.replace('%', '%%').replace('{:', '%').replace('}', ''))
+        for column, spec in formats.items()
+    }
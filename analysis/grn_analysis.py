@@ -4,45 +4,68 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 
-def grn_analysis(sales_data, stock_data, selected_store):
+
+def _reconcile(sales_agg, stock_agg, keys):
+    # Merge sales and stock data on the keys
+    merged = pd.merge(sales_agg, stock_agg, on=keys, how='outer')
+
+    # Handle missing values
+    merged['quantity_sales'] = merged['quantity_sales'].fillna(0)
+    merged['quantity_stock'] = merged['quantity_stock'].fillna(0)
+
+    # Calculate discrepancies between stock and sales quantities, rounded up
+    merged['discrepancy'] = np.ceil(merged['quantity_stock'] - merged['quantity_sales'])
+    return merged
+
+
+def compute_product_stock(store_sales, store_stock):
+    """Sold against stocked quantity per productName; discrepancy is stock - sales, rounded up."""
+    # Modified aggregation for sales data to ensure correct summing
+    sales_agg = (store_sales.groupby(['productName', 'storeName'], observed=True)
+                 .agg({'quantity': 'sum'})
+                 .reset_index()
+                 .rename(columns={'quantity': 'quantity_sales'}))
+
+    # Aggregate stock data by 'productName' and 'storeName'
+    stock_agg = (store_stock.groupby(['productName', 'storeName'], observed=True)
+                 .agg({'quantity': 'sum'})
+                 .reset_index()
+                 .rename(columns={'quantity': 'quantity_stock'}))
+
+    return _reconcile(sales_agg, stock_agg, ['productName', 'storeName'])
+
+
+def compute_brand_stock(store_sales, store_stock):
+    """Sold against stocked quantity per brand; needs the stock file's brand and totalAmount columns."""
+    # Aggregating sales data by 'brandName' and 'storeName'
+    sales_agg = (store_sales.groupby(['brandName', 'storeName'], observed=True)
+                 .agg({'quantity': 'sum'})
+                 .reset_index()
+                 .rename(columns={'quantity': 'quantity_sales', 'brandName': 'brand'}))
+
+    # Aggregating stock data by 'brand' and 'storeName'
+    stock_agg = (store_stock.groupby(['brand', 'storeName'], observed=True)
+                 .agg({'quantity': 'sum', 'totalAmount': 'sum'})
+                 .reset_index()
+                 .rename(columns={'quantity': 'quantity_stock'}))
+
+    return _reconcile(sales_agg, stock_agg, ['brand', 'storeName'])
+
+
+@st.fragment
+def render_grn_analysis(ctx, stock_data):
+    selected_store = ctx.selected_store
     if stock_data is None:
         st.warning("Please upload stock data to perform Stock analysis.")
         return
 
     try:
         # Filter data for the selected store
-        store_sales_data = sales_data[sales_data['storeName'] == selected_store].copy()
+        # Stock is compared against everything the store ever sold, so take its cube cells across all dates
+        store_sales_data = ctx.cube_index.store_rows(selected_store)
         store_stock_data = stock_data[stock_data['storeName'] == selected_store].copy()
         
-        # Modified aggregation for sales data to ensure correct summing
-        store_sales_data_agg = (store_sales_data.groupby(['productName', 'storeName'])
-                               .agg({'quantity': 'sum'})
-                               .reset_index()
-                               .rename(columns={'quantity': 'quantity_sales'}))
-        
-        # Aggregate stock data by 'productName' and 'storeName'
-        store_stock_data_agg = (store_stock_data.groupby(['productName', 'storeName'])
-                               .agg({'quantity': 'sum'})
-                               .reset_index()
-                               .rename(columns={'quantity': 'quantity_stock'}))
-     
-        # Merge sales and stock data on 'productName' and 'storeName'
-        merged_data = pd.merge(
-            store_sales_data_agg,
-            store_stock_data_agg,
-            on=['productName', 'storeName'],
-            how='outer'
-        )
-         
-        # Handle missing values
-        merged_data['quantity_sales'] = merged_data['quantity_sales'].fillna(0)
-        merged_data['quantity_stock'] = merged_data['quantity_stock'].fillna(0)
-        
-        # Calculate discrepancies between stock and sales quantities
-        merged_data['discrepancy'] = merged_data['quantity_stock'] - merged_data['quantity_sales']
-        
-        # Round up the discrepancy column
-        merged_data['discrepancy'] = np.ceil(merged_data['discrepancy'])
+        merged_data = compute_product_stock(store_sales_data, store_stock_data)
         
         # Display analysis results
         st.markdown("<h4 style='color: green; text-align: center;'>Overall Report</h4>", unsafe_allow_html=True)
@@ -75,7 +98,7 @@ def grn_analysis(sales_data, stock_data, selected_store):
         else:
             filtered_data = merged_data
 
-        top_n = st.sidebar.number_input(
+        top_n = st.number_input(
             "Select number of products to display",
             min_value=5,
             max_value=len(filtered_data),
@@ -206,33 +229,7 @@ def grn_analysis(sales_data, stock_data, selected_store):
 
 
 
-        # Aggregating sales data by 'brandName' and 'storeName'
-        store_sales_data_agg_brand = (store_sales_data.groupby(['brandName', 'storeName'])
-                               .agg({'quantity': 'sum'})
-                               .reset_index()
-                               .rename(columns={'quantity': 'quantity_sales', 'brandName': 'brand'}))
-        
-        # Aggregating stock data by 'brand' and 'storeName'
-        store_stock_data_agg_brand = (store_stock_data.groupby(['brand', 'storeName'])
-                               .agg({'quantity': 'sum', 'totalAmount': 'sum'})
-                               .reset_index()
-                               .rename(columns={'quantity': 'quantity_stock'}))
-        
-        # Merge sales and stock data on 'brand' and 'storeName'
-        merged_data_brand = pd.merge(
-            store_sales_data_agg_brand,
-            store_stock_data_agg_brand,
-            on=['brand', 'storeName'],
-            how='outer'
-        )
-        
-        # Handle missing values
-        merged_data_brand['quantity_sales'] = merged_data_brand['quantity_sales'].fillna(0)
-        merged_data_brand['quantity_stock'] = merged_data_brand['quantity_stock'].fillna(0)
-        
-        # Calculate discrepancies between stock and sales quantities
-        merged_data_brand['discrepancy'] = merged_data_brand['quantity_stock'] - merged_data_brand['quantity_sales']
-        merged_data_brand['discrepancy'] = np.ceil(merged_data_brand['discrepancy'])
+        merged_data_brand = compute_brand_stock(store_sales_data, store_stock_data)
         
 
         # Detailed analysis
@@ -254,7 +251,7 @@ def grn_analysis(sales_data, stock_data, selected_store):
         else:
             filtered_data = merged_data_brand
 
-        top_n_brand = st.sidebar.number_input(
+        top_n_brand = st.number_input(
             "Select number of brands to display",
             min_value=0,
             max_value=len(filtered_data),
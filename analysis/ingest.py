@@ -0,0 +1,91 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from analysis.partition_index import sort_by_store_and_date
+from analysis.time_parsing import parse_time_of_day
+
+# Rows per chunk when streaming the sales export
+CHUNK_ROWS = 250_000
+
+# Low-cardinality text columns are held as categoricals
+CATEGORICAL_COLUMNS = ['storeName', 'brandName', 'productName', 'categoryName', 'subCategoryOf', 'orderType']
+
+# Declared dtypes for the sales export; columns not listed here are inferred by pandas
+SALES_SCHEMA = {
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+    'orderDate': 'category',
+    'time': 'category',
+    'totalProductPrice': 'float32',
+    'costPrice': 'float32',
+    'quantity': 'float32',
+    'customerNumber': 'str',
+}
+
+
+def _parse_chunk(chunk):
+    # orderDate and time repeat heavily, so parse each distinct value once and map back through the codes
+    if 'orderDate' in chunk.columns:
+        dates = chunk['orderDate'].cat
+        parsed_dates = pd.to_datetime(dates.categories.astype(str), format="mixed", dayfirst=True, errors="coerce")
+        chunk['orderDate'] = pd.Series(parsed_dates.take(dates.codes, allow_fill=True, fill_value=pd.NaT), index=chunk.index)
+
+    # Cost and profit per line are materialized once so every module can aggregate them with a plain sum
+    if {'costPrice', 'quantity', 'totalProductPrice'} <= set(chunk.columns):
+        chunk['line_cost'] = chunk['costPrice'] * chunk['quantity']
+        chunk['line_profit'] = chunk['totalProductPrice'] - chunk['line_cost']
+
+    # The raw time text stays as a categorical; modules read the parsed seconds-since-midnight column
+    if 'time' in chunk.columns:
+        chunk['time_seconds'] = parse_time_of_day(chunk['time'])
+
+    return chunk
+
+
+def _concat_chunks(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+
+    columns = chunks[0].columns
+    categorical = [col for col in columns if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)]
+
+    # Each chunk carries its own categories, so unify them instead of letting concat fall back to object
+    frame = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for col in categorical:
+        frame[col] = union_categoricals([chunk[col] for chunk in chunks])
+
+    return frame[columns]
+
+
+def _source_size(source):
+    try:
+        position = source.tell()
+        size = source.seek(0, 2)
+        source.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def load_sales_csv(source, progress=None, chunksize=CHUNK_ROWS):
+    """Stream a sales CSV into one compact, typed frame.
+
+    `progress`, if given, is called with the fraction of the input consumed after each chunk.
+    """
+    size = _source_size(source)
+
+    chunks = []
+    for chunk in pd.read_csv(source, dtype=SALES_SCHEMA, chunksize=chunksize):
+        chunks.append(_parse_chunk(chunk))
+        if progress is not None and size:
+            progress(min(source.tell() / size, 1.0))
+
+    if not chunks:
+        return pd.DataFrame(columns=list(SALES_SCHEMA))
+
+    # Sorted by (storeName, orderDate) so store/date filters can be served by PartitionIndex
+    data = sort_by_store_and_date(_concat_chunks(chunks))
+
+    if progress is not None:
+        progress(1.0)
+
+    return data
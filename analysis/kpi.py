@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+# Per-store daily measures held as prefix sums
+KPI_MEASURES = ['revenue', 'cost', 'quantity', 'lines', 'orders', 'customers']
+
+# Calendar buckets for period averages; weeks and months are numbered without the year, like the KPI cards always have
+PERIODS = {
+    'day': lambda days: days.to_numpy(dtype='datetime64[D]').view(np.int64),
+    'week': lambda days: days.isocalendar().week.to_numpy(dtype=np.int64),
+    'month': lambda days: days.month.to_numpy(dtype=np.int64),
+}
+
+
+class KpiService:
+    """Cumulative per-store daily totals, so any [start, end] total is two lookups.
+
+    Each measure is a (stores, days + 1) array whose row holds the running total of that
+    store up to (but excluding) each day, so total = cum[store, end + 1] - cum[store, start].
+    """
+
+    def __init__(self, data):
+        self.stores = data['storeName'].cat.categories
+        store_codes = data['storeName'].cat.codes.to_numpy(dtype=np.int64)
+        days = data['orderDate'].to_numpy(dtype='datetime64[D]')
+
+        valid = (store_codes >= 0) & ~np.isnat(days)
+        store_codes, days = store_codes[valid], days[valid]
+
+        if len(days):
+            self.first_day, last_day = days.min(), days.max()
+        else:
+            self.first_day = last_day = np.datetime64('1970-01-01', 'D')
+        n_stores = len(self.stores)
+        n_days = int((last_day - self.first_day).astype(np.int64)) + 1
+        self.days = pd.date_range(self.first_day, periods=n_days, freq='D')
+
+        # Flat (store, day) cell of every line item
+        cells = store_codes * n_days + (days - self.first_day).astype(np.int64)
+        size = n_stores * n_days
+
+        price = data['totalProductPrice'].to_numpy(dtype=np.float64)[valid].round(2)
+        cost = data['line_cost'].to_numpy(dtype=np.float64)[valid].round(2)
+        quantity = data['quantity'].to_numpy(dtype=np.float64)[valid]
+
+        # An order is a distinct invoice within a store's day
+        if 'invoice' in data.columns:
+            invoices = pd.factorize(data['invoice'])[0][valid]
+            order_cells = np.unique(np.stack([cells, invoices]), axis=1)[0]
+        else:
+            order_cells = cells
+
+        # Line items with a customer number recorded (all digits), tested once per distinct value
+        if 'customerNumber' in data.columns:
+            numbers, distinct = pd.factorize(data['customerNumber'])
+            recorded = pd.Series(distinct, dtype=object).astype(str).str.isdigit().to_numpy()
+            customer_lines = np.append(recorded, False)[numbers][valid]
+        else:
+            customer_lines = np.zeros(len(cells), dtype=bool)
+
+        daily = {
+            'revenue': np.bincount(cells, weights=np.nan_to_num(price), minlength=size),
+            'cost': np.bincount(cells, weights=np.nan_to_num(cost), minlength=size),
+            'quantity': np.bincount(cells, weights=np.nan_to_num(quantity), minlength=size),
+            'lines': np.bincount(cells, minlength=size).astype(np.float64),
+            'orders': np.bincount(order_cells, minlength=size).astype(np.float64),
+            'customers': np.bincount(cells[customer_lines], minlength=size).astype(np.float64),
+        }
+
+        self._cumulative = {}
+        for measure, values in daily.items():
+            cumulative = np.zeros((n_stores, n_days + 1))
+            np.cumsum(values.reshape(n_stores, n_days), axis=1, out=cumulative[:, 1:])
+            self._cumulative[measure] = cumulative
+
+        # Which stores sold anything on each day, for period averages
+        self._active = daily['lines'].reshape(n_stores, n_days) > 0
+
+    def _day_bounds(self, start, end):
+        # Half-open [lo, hi) day offsets for an inclusive date range, clipped to the data
+        lo = 0 if start is None else (np.datetime64(pd.Timestamp(start).date(), 'D') - self.first_day).astype(np.int64)
+        hi = len(self.days) if end is None else (np.datetime64(pd.Timestamp(end).date(), 'D') - self.first_day).astype(np.int64) + 1
+        lo, hi = int(np.clip(lo, 0, len(self.days))), int(np.clip(hi, 0, len(self.days)))
+        return lo, max(lo, hi)
+
+    def _store_rows(self, store):
+        if store is None:
+            return slice(None)
+        if isinstance(store, (list, tuple)):
+            # A group of stores; names not in the data are skipped
+            codes = self.stores.get_indexer(list(store))
+            return codes[codes >= 0]
+        if store not in self.stores:
+            return slice(0, 0)
+        code = self.stores.get_loc(store)
+        return slice(code, code + 1)
+
+    def total(self, store, start=None, end=None, measure='revenue'):
+        """Sum of a measure for one store (a list of stores, or every store when `store` is None) over [start, end]."""
+        lo, hi = self._day_bounds(start, end)
+        cumulative = self._cumulative[measure][self._store_rows(store)]
+        return float((cumulative[:, hi] - cumulative[:, lo]).sum())
+
+    def totals(self, store, start=None, end=None):
+        """Every measure for one store (or all stores) over [start, end], as a dict."""
+        return {measure: self.total(store, start, end, measure) for measure in KPI_MEASURES}
+
+    def store_totals(self, start=None, end=None):
+        """Every measure and the number of days with sales, per store over [start, end], as a frame indexed by store."""
+        lo, hi = self._day_bounds(start, end)
+        table = pd.DataFrame(
+            {measure: cumulative[:, hi] - cumulative[:, lo] for measure, cumulative in self._cumulative.items()},
+            index=pd.Index(self.stores, name='storeName'),
+        )
+        table['active_days'] = self._active[:, lo:hi].sum(axis=1)
+        return table
+
+    def has_sales(self, store, start=None, end=None):
+        return self.total(store, start, end, 'lines') > 0
+
+    def period_average(self, store, start=None, end=None, period='day', measure='revenue'):
+        """Average per day/week/month of a measure, over the periods in which the store sold anything.
+
+        With `store` None this is the company figure: the total over every period in which any store
+        sold, divided by the number of stores that sold in the range. A list of stores gives the same
+        figure for just those stores. NaN when nothing sold.
+        """
+        lo, hi = self._day_bounds(start, end)
+        active = self._active[self._store_rows(store), lo:hi]
+        active_days = active.any(axis=0)
+        n_periods = len(np.unique(PERIODS[period](self.days[lo:hi][active_days])))
+        n_stores = int(active.any(axis=1).sum())
+
+        if n_periods == 0 or n_stores == 0:
+            return np.nan
+        return self.total(store, start, end, measure) / n_periods / n_stores
@@ -7,7 +7,7 @@ def low_performing_brand_analysis(store_data):
     st.markdown("---")
 
     # Group the data by brandName to calculate product count, total sales, total cost, profit, and profit margin
-    low_performing_brands = store_data.groupby('brandName').agg(
+    low_performing_brands = store_data.groupby('brandName', observed=True).agg(
         product_count=('productId', 'nunique'),
         quantity_sold=('quantity', 'sum'),
         total_revenue=('totalProductPrice', 'sum'), 
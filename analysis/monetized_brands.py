@@ -1,79 +1,91 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import numpy as np
 import streamlit as st
 import plotly.express as px
 
-def analyze_monetized_brands(store_data, all_data):
-    # st.markdown("<br><br><br><br>", unsafe_allow_html=True)
-    st.markdown("<h4 style='color: green; text-align: center;'>📈 MONETIZED BRANDS PERFORMANCE</h4>", unsafe_allow_html=True)
-    st.markdown("---")
-    
-    # List of brands to filter
-    brands_to_select = [
-        "Bazana", "Pokka", "Panash", "Morning Fresh", "ITC Master Chef",
-        "Havmor", "HUFT", "Rtb Kombucha", "Wow Momo", "Vegan-Day",
-        "UE Boost", "Moon", "Continental", "Nutriburst", "Runway",
-        "Vadilal", "Pure Temptation", "Rebound", "3 Sisters",
-        "Whiskers", "Burf", "AMRIT FOOD", "Growfitz", "Aplomb",
-        "Sanfe", "Griesmore", "Alphadent", "Clove"
-    ]
-
-    # Sidebar inputs for filtering
-    st.sidebar.markdown("### Filters for monetized brands")
-    store_names = store_data['storeName'].unique()
-    selected_store = st.sidebar.selectbox("Select a Store:", store_names, key="store_selector_monetized")
-    metric = st.sidebar.selectbox("Select Metric for Monetized Brands Analysis:", 
-                                  ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
-                                  key="metric_selector_monetized")
-    show_data_labels = st.sidebar.checkbox("Show Data Labels", value=True, key="data_labels_monetized")
-    plot_type = st.sidebar.selectbox("Select Plot Type:", ["Bar", "Scatter", "Pie"], key="plot_type_selector_monetized")
-    color_scale = st.sidebar.selectbox("Select Color Scale:", 
-                                       ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
-                                       key="color_scale_monetized")
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, styled
+
+# List of brands to filter
+MONETIZED_BRANDS = [
+    "Bazana", "Pokka", "Panash", "Morning Fresh", "ITC Master Chef",
+    "Havmor", "HUFT", "Rtb Kombucha", "Wow Momo", "Vegan-Day",
+    "UE Boost", "Moon", "Continental", "Nutriburst", "Runway",
+    "Vadilal", "Pure Temptation", "Rebound", "3 Sisters",
+    "Whiskers", "Burf", "AMRIT FOOD", "Growfitz", "Aplomb",
+    "Sanfe", "Griesmore", "Alphadent", "Clove"
+]
+
+
+@dataclass
+class MonetizedBrands:
+    """Per-brand sales of the monetized brands in one store, and the ones it does not sell."""
+    performance: pd.DataFrame
+    missing_brands: list
 
-    # Filter data for the selected store and the chosen brands
-    store_data_filtered = store_data[store_data['storeName'] == selected_store]
-    filtered_brands_store = store_data_filtered[store_data_filtered['brandName'].isin(brands_to_select)]
 
-    # Calculate total sales for the selected store and all data
-    total_sales_store = store_data_filtered['totalProductPrice'].sum()
-    #total_sales_all_data = all_data['totalProductPrice'].sum()
+def compute_monetized_brands(store_cube, company_benchmark, brands=MONETIZED_BRANDS):
+    """Quantity, revenue, cost, profit, margin and share of store sales per monetized brand."""
+    filtered_brands_store = store_cube[store_cube['brandName'].isin(brands)]
 
-    # Filter all data for the specified brands
-    #filtered_brands_all = all_data[all_data['brandName'].isin(brands_to_select)]
+    # Calculate total sales for the selected store
+    total_sales_store = store_cube['totalProductPrice'].sum()
 
-    if not filtered_brands_store.empty:
-        # Aggregate monetized performance for the selected store
-        monetized_performance_store = filtered_brands_store.groupby('brandName').agg(
-            total_quantity=('quantity', 'sum'),
-            total_revenue=('totalProductPrice', 'sum'),
-            total_cost=('costPrice', 'sum'),
-            total_products=('productId', 'nunique')
-        ).reset_index()
+    # Aggregate monetized performance for the selected store
+    monetized_performance_store = filtered_brands_store.groupby('brandName', observed=True).agg(
+        total_quantity=('quantity', 'sum'),
+        total_revenue=('totalProductPrice', 'sum'),
+        total_cost=('line_cost', 'sum'),
+        total_products=('productId', 'nunique')
+    ).reset_index()
 
-        # Calculate profit and profit margin for the selected store
-        monetized_performance_store['profit'] = monetized_performance_store['total_revenue'] - monetized_performance_store['total_cost']
-        monetized_performance_store['profit_margin'] = (monetized_performance_store['profit'] / monetized_performance_store['total_revenue']) * 100
+    # Calculate profit and profit margin for the selected store
+    monetized_performance_store['profit'] = monetized_performance_store['total_revenue'] - monetized_performance_store['total_cost']
+    monetized_performance_store['profit_margin'] = (monetized_performance_store['profit'] / monetized_performance_store['total_revenue']) * 100
 
-        # Calculate sales contribution % of each monetized brand to the total sales of the selected store
-        monetized_performance_store['contribution'] = (monetized_performance_store['total_revenue'] / total_sales_store) * 100
+    # Calculate sales contribution % of each monetized brand to the total sales of the selected store
+    monetized_performance_store['contribution'] = (monetized_performance_store['total_revenue'] / total_sales_store) * 100
 
-        # Aggregate monetized performance for all data
-        # monetized_performance_all = filtered_brands_all.groupby('brandName').agg(
-        #     total_quantity=('quantity', 'sum'),
-        #     total_revenue=('totalProductPrice', 'sum')
-        # ).reset_index()
+    monetized_performance_store['Company Standard'] = company_benchmark.standard_for(monetized_performance_store['brandName'])
 
-        company_benchmark = pd.read_csv('./company_bechmark/monetized_brands.csv')
+    # Calculate the variance
+    monetized_performance_store["variance"] = monetized_performance_store['contribution'] - monetized_performance_store['Company Standard']
 
-        # monetized_performance_all = monetized_performance_all.merge(company_benchmark, on="brandName", how = "left")
-        # Calculate sales contribution % of each monetized brand to the total sales of all data
-        # Merge the dataframes for store and all data contributions
-        monetized_performance_store = pd.merge(monetized_performance_store, company_benchmark[['brandName', 'Company Standard']], on='brandName', how='left')
+    # Brands the store does not sell, in list order
+    sold = set(monetized_performance_store['brandName'])
+    missing_brands = [brand for brand in brands if brand not in sold]
+    return MonetizedBrands(monetized_performance_store, missing_brands)
 
-        # Calculate the variance
-        monetized_performance_store["variance"] = monetized_performance_store['contribution'] - monetized_performance_store['Company Standard']
 
+def cached_monetized_brands(ctx):
+    """compute_monetized_brands of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('monetized')
+    return ctx.cached('monetized_brands', lambda: compute_monetized_brands(ctx.store_cube, benchmark), benchmark.version)
+
+
+@st.fragment
+def render_monetized_brands(ctx):
+    # st.markdown("<br><br><br><br>", unsafe_allow_html=True)
+    st.markdown("<h4 style='color: green; text-align: center;'>📈 MONETIZED BRANDS PERFORMANCE</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+    
+    # Inputs for filtering
+    controls = st.expander("Filters for monetized brands")
+    metric = controls.selectbox("Select Metric for Monetized Brands Analysis:", 
+                                  ["Total Quantity", "Total Revenue", "Profit", "Profit Margin"], 
+                                  key="metric_selector_monetized")
+    show_data_labels = controls.checkbox("Show Data Labels", value=True, key="data_labels_monetized")
+    plot_type = controls.selectbox("Select Plot Type:", ["Bar", "Scatter", "Pie"], key="plot_type_selector_monetized")
+    color_scale = controls.selectbox("Select Color Scale:", 
+                                       ["Viridis", "Cividis", "Plasma", "Inferno", "Magma"], 
+                                       key="color_scale_monetized")
+
+    result = cached_monetized_brands(ctx)
+    monetized_performance_store = result.performance
+
+    if not monetized_performance_store.empty:
         # Determine y-axis based on selected metric
         if metric == "Total Quantity":
             y_axis = 'total_quantity'
@@ -128,52 +140,24 @@ def analyze_monetized_brands(store_data, all_data):
         fig_monetized.update_layout(width=1000, height=600)
         st.plotly_chart(fig_monetized)
 
-        # Format profit margin and sales contribution as percentages
-        monetized_performance_store['profit_margin'] = monetized_performance_store['profit_margin'].map(lambda x: f"{x:.2f}%")
-        monetized_performance_store['contribution'] = monetized_performance_store['contribution'].map(lambda x: f"{x:.2f}%")
-        monetized_performance_store['Company Standard'] = monetized_performance_store['Company Standard'].map(lambda x: f"{x:.2f}%")
-        monetized_performance_store['variance'] = monetized_performance_store['variance'].map(lambda x: f"{x:.2f}%")
-
-        # Highlight negative variance
-        def highlight_negative(val):
-            try:
-                val_float = float(val.replace('%', ''))
-                if val_float < 0:
-                    return 'background-color: red; color: white'
-            except ValueError:
-                return ''
-            return ''
-        
-        monetized_performance_store['total_revenue'] = monetized_performance_store['total_revenue'].apply(lambda x: f"{x:.2f}")
-        monetized_performance_store['total_cost'] = monetized_performance_store['total_cost'].apply(lambda x: f"{x:.2f}")
-        monetized_performance_store['profit'] = monetized_performance_store['profit'].apply(lambda x: f"{x:.2f}")
-        styled_df = monetized_performance_store[['brandName', 'total_revenue', 'total_cost', 'profit', 'profit_margin', 'contribution', 'Company Standard', 'variance']].style.applymap(
-                     highlight_negative, subset=['variance']
-                    )
+        # Amounts and percentages are formatted for display only; highlight negative variance
+        styled_df = styled(
+            monetized_performance_store[['brandName', 'total_revenue', 'total_cost', 'profit', 'profit_margin', 'contribution', 'Company Standard', 'variance']],
+            {'total_revenue': AMOUNT, 'total_cost': AMOUNT, 'profit': AMOUNT,
+             'profit_margin': PERCENT, 'contribution': PERCENT, 'Company Standard': PERCENT, 'variance': PERCENT},
+            negative=['variance'], negative_style='background-color: red; color: white',
+        )
 
         st.table(styled_df)
 
-        @st.cache_data
-        def convert_df(df):
-            return df.to_csv(index=False).encode('utf-8')
-
-        csv_monetized = convert_df(monetized_performance_store)
-
-        st.sidebar.download_button(
-                label="Download monetized brands Data",
-                data=csv_monetized,   
-                file_name='monetized_brands.csv',
-                mime='text/csv',
-            )
+        csv_download("Download monetized brands Data", monetized_performance_store, 'monetized_brands.csv', controls, scope=ctx.selection_key)
 
         # New Line Plot for Contribution vs Company Standard
-        monetized_performance_store['contribution_numeric'] = monetized_performance_store['contribution'].str.replace('%', '').astype(float)
-        monetized_performance_store['company_standard_numeric'] = monetized_performance_store['Company Standard'].str.replace('%', '').astype(float)
 
         line_fig = px.line(
             monetized_performance_store,
             x='brandName',
-            y=['contribution_numeric', 'company_standard_numeric'],
+            y=['contribution', 'Company Standard'],
             title='Contribution vs Company Standard',
             labels={'value': 'Percentage', 'brandName': 'Brand Name'},
             markers=True,
@@ -190,11 +174,11 @@ def analyze_monetized_brands(store_data, all_data):
     else:
         st.warning("No data available for the selected brands.")
 
-    missing_brands = set(brands_to_select) - set(filtered_brands_store['brandName'].unique())
+    missing_brands = result.missing_brands
     if missing_brands:
         # Create a DataFrame for the missing brands
         st.markdown("<h4 style='color: red; text-align: center;'>Missing monetized Brands</h4>", unsafe_allow_html=True)
-        missing_brands_df = pd.DataFrame(list(missing_brands), columns=['Missing Monetized Brands'])
+        missing_brands_df = pd.DataFrame(missing_brands, columns=['Missing Monetized Brands'])
         st.table(missing_brands_df) 
 
     st.markdown("<h4 style='color: green; text-align: center; margin-top: 0px;'>Recommendations</h4>", unsafe_allow_html=True)
@@ -1,52 +1,97 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-def order_analysis(store_data):
-    st.markdown("<h4 style='color: green; text-align: center;'>Order Analysis</h4>", unsafe_allow_html=True)
-    st.markdown("---")
+from analysis.downloads import csv_download
+
+@dataclass
+class OrderMetrics:
+    """Order, quantity and customer-capture figures of one store's line items."""
+    total_orders_count: int
+    total_quantity: float
+    total_revenue: float
+    total_cost: float
+    total_customers: int
+    customer_collection_percentage: float
+    # Whether each line item carries a numeric customerNumber
+    valid_customer: pd.Series
+    # Valid customers and line items per day; None when the data has no date column
+    date_column: str = None
+    daily_metrics: pd.DataFrame = None
 
-    # Clean the customerNumber column to determine valid entries
-    valid_customers = store_data['customerNumber'].apply(lambda x: str(x).isdigit())
-    store_data['valid_customer'] = valid_customers
+    @property
+    def total_profit(self):
+        return self.total_revenue - self.total_cost
+
+
+def compute_order_metrics(store_rows):
+    """Order counts, totals and the share of line items with a customer number recorded."""
+    # A line has a valid customer number when it is all digits, tested once per distinct value
+    numbers, distinct = pd.factorize(store_rows['customerNumber'])
+    recorded = pd.Series(distinct, dtype=object).astype(str).str.isdigit().to_numpy(dtype=bool)
+    valid_customers = pd.Series(np.append(recorded, False)[numbers], index=store_rows.index)
     total_customers = valid_customers.sum()
-    total_entries = len(store_data)
+    total_entries = len(store_rows)
     customer_collection_percentage = (total_customers / total_entries) * 100 if total_entries > 0 else 0
 
-    # Calculate total orders, total quantity sold, and total revenue
-    total_orders_count = len(store_data['invoice'])
-    total_quantity = store_data['quantity'].sum()
-    total_revenue = store_data['totalProductPrice'].sum()
-    total_cost = store_data['costPrice'].sum()
-    total_profit = total_revenue - total_cost
-
-    # Display metrics
-    col1, col2, col3 , col4 = st.columns(4)
-    col1.metric("Total Unique Orders", total_orders_count)
-    col2.metric("Total Quantity", total_quantity)
-    col3.metric("Customer Info Collected", f"{customer_collection_percentage:.2f}%")
-    col4.metric('Total Numbers Collected', total_customers)
+    result = OrderMetrics(
+        total_orders_count=len(store_rows['invoice']),
+        # Summed in float64 and rounded to paise, like the cube (float32 would drift over many lines)
+        total_quantity=store_rows['quantity'].astype('float64').sum(),
+        total_revenue=round(store_rows['totalProductPrice'].astype('float64').round(2).sum(), 2),
+        total_cost=round(store_rows['line_cost'].astype('float64').round(2).sum(), 2),
+        total_customers=total_customers,
+        customer_collection_percentage=customer_collection_percentage,
+        valid_customer=valid_customers,
+    )
 
     # Check if a date column exists or if it's named differently
-    date_column = None
-    for col in store_data.columns:
+    for col in store_rows.columns:
         if 'date' in col.lower():
-            date_column = col
+            result.date_column = col
             break
 
-    if date_column:
-        # Convert date column to datetime if it's not already
-        store_data[date_column] = pd.to_datetime(store_data[date_column])
-
+    if result.date_column:
         # Aggregate data for plotting the number of valid customers collected
-        daily_metrics = store_data.groupby(date_column).agg(
+        result.daily_metrics = store_rows.assign(
+            **{result.date_column: pd.to_datetime(store_rows[result.date_column]), 'valid_customer': valid_customers}
+        ).groupby(result.date_column).agg(
             valid_customers=('valid_customer', 'sum'),
             total_entries=('valid_customer', 'count')
         ).reset_index()
 
+    return result
+
+
+def cached_order_metrics(ctx):
+    """compute_order_metrics of the selected store and range, through the result cache."""
+    return ctx.cached('order_metrics', lambda: compute_order_metrics(ctx.store_rows))
+
+
+@st.fragment
+def render_order_analysis(ctx):
+    store_data = ctx.store_rows
+    st.markdown("<h4 style='color: green; text-align: center;'>Order Analysis</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+
+    result = cached_order_metrics(ctx)
+
+    # Display metrics
+    col1, col2, col3 , col4 = st.columns(4)
+    col1.metric("Total Unique Orders", result.total_orders_count)
+    col2.metric("Total Quantity", result.total_quantity)
+    col3.metric("Customer Info Collected", f"{result.customer_collection_percentage:.2f}%")
+    col4.metric('Total Numbers Collected', result.total_customers)
+
+    if result.date_column:
+        date_column = result.date_column
+
         # Create the bar chart for the number of valid customers collected
         fig = px.bar(
-            daily_metrics,
+            result.daily_metrics,
             x=date_column,
             y='valid_customers',
             title='Number of Valid Customers Collected Over Time',
@@ -60,19 +105,13 @@ def order_analysis(store_data):
     else:
         st.warning("No date column found in the dataset. Cannot plot valid customers over time.")
 
-    # Prepare data for download
-    store_data['totalProductPrice'] = store_data['totalProductPrice'].apply(lambda x: f"{x:.2f}")
-    store_data['costPrice'] = store_data['costPrice'].apply(lambda x: f"{x:.2f}")
-
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_orders = convert_df(store_data)
+    # Data for download, assembled only once asked for: the whole order history of the store and range;
+    # prices stay numeric, rounded to paise
+    def export_data():
+        return store_data.assign(
+            valid_customer=result.valid_customer,
+            totalProductPrice=store_data['totalProductPrice'].round(2),
+            costPrice=store_data['costPrice'].round(2),
+        )
 
-    st.sidebar.download_button(
-        label="Download Order Data",
-        data=csv_orders,
-        file_name='filtered_orders.csv',
-        mime='text/csv',
-    )
+    csv_download("Download Order Data", export_data, 'filtered_orders.csv', scope=ctx.selection_key)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+def _sort_keys(frame):
+    # Store categorical codes and orderDate as int64 nanoseconds (NaT sorts first as the int64 minimum)
+    store_codes = frame['storeName'].cat.codes.to_numpy(dtype=np.int64)
+    times = frame['orderDate'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return store_codes, times
+
+
+def sort_by_store_and_date(frame):
+    """Reorder a sales frame by (storeName, orderDate) so PartitionIndex can slice it."""
+    store_codes, times = _sort_keys(frame)
+    order = np.lexsort((times, store_codes))
+    return frame.take(order).reset_index(drop=True)
+
+
+class PartitionIndex:
+    """Row offsets of a frame sorted by (storeName, orderDate).
+
+    Looking up "store X between D1 and D2" is a pair of binary searches that returns a
+    contiguous positional slice of the frame instead of a boolean mask over every row.
+    """
+
+    def __init__(self, frame):
+        store_codes, times = _sort_keys(frame)
+        if len(frame) and np.any(np.diff(store_codes) < 0):
+            raise ValueError("Frame must be sorted by storeName and orderDate; use sort_by_store_and_date")
+
+        self.frame = frame
+        self.stores = frame['storeName'].cat.categories
+        self._times = times
+        # Rows of store code i are store_bounds[i]:store_bounds[i + 1]; rows with a missing store come first
+        self.store_bounds = np.searchsorted(store_codes, np.arange(len(self.stores) + 1), side='left')
+
+        for code in range(len(self.stores)):
+            lo, hi = self.store_bounds[code], self.store_bounds[code + 1]
+            if np.any(np.diff(times[lo:hi]) < 0):
+                raise ValueError("Frame must be sorted by storeName and orderDate; use sort_by_store_and_date")
+
+        # Stores that actually have rows, and the overall orderDate range, for the sidebar controls
+        self.store_names = self.stores[np.diff(self.store_bounds) > 0]
+        valid_times = times[times != np.iinfo(np.int64).min]
+        self.min_date = pd.Timestamp(valid_times.min()) if len(valid_times) else pd.NaT
+        self.max_date = pd.Timestamp(valid_times.max()) if len(valid_times) else pd.NaT
+
+    def _date_bounds(self, lo, hi, start, end):
+        # Narrow [lo, hi) within one store's block to the requested date range
+        if start is not None:
+            lo += np.searchsorted(self._times[lo:hi], pd.Timestamp(start).value, side='left')
+        if end is not None:
+            hi = lo + np.searchsorted(self._times[lo:hi], pd.Timestamp(end).value, side='right')
+        return lo, hi
+
+    def store_rows(self, store, start=None, end=None):
+        """Rows of one store with start <= orderDate <= end (either bound may be None)."""
+        if store not in self.stores:
+            return self.frame.iloc[0:0]
+
+        code = self.stores.get_loc(store)
+        lo, hi = self._date_bounds(self.store_bounds[code], self.store_bounds[code + 1], start, end)
+        return self.frame.iloc[lo:hi]
+
+    def date_rows(self, start=None, end=None):
+        """Rows of every store with start <= orderDate <= end, in (storeName, orderDate) order."""
+        slices = []
+        for code in range(len(self.stores)):
+            lo, hi = self._date_bounds(self.store_bounds[code], self.store_bounds[code + 1], start, end)
+            if hi > lo:
+                slices.append(self.frame.iloc[lo:hi])
+
+        if not slices:
+            return self.frame.iloc[0:0]
+        if len(slices) == 1:
+            return slices[0]
+        return pd.concat(slices)
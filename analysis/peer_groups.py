@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Peer groups the stores are split into unless the sidebar asks for another number
+DEFAULT_PEER_GROUPS = 4
+# k-means stops after this many rounds even if assignments still move
+KMEANS_ITERATIONS = 100
+
+
+@dataclass
+class PeerGroups:
+    """Stores clustered by the share of their sales in each subCategoryOf.
+
+    `mix` is the store x subCategoryOf share matrix (rows sum to 1) the clustering ran on,
+    `labels` the group of each of its rows and `centroids` each group's average mix.
+    """
+    mix: pd.DataFrame
+    labels: np.ndarray
+    centroids: np.ndarray
+
+    @property
+    def stores(self):
+        return self.mix.index
+
+    def group_of(self, store):
+        """Group number of `store`, or None if it has no sales in the dataset."""
+        if store not in self.mix.index:
+            return None
+        return int(self.labels[self.mix.index.get_loc(store)])
+
+    def peers_of(self, store):
+        """Stores in the same group as `store` (itself included), in dataset order; empty if it has no group."""
+        group = self.group_of(store)
+        if group is None:
+            return []
+        return list(self.mix.index[self.labels == group])
+
+
+def category_mix(cube):
+    """Store x subCategoryOf matrix of each store's sales share per category, in one bincount."""
+    store_codes, stores = pd.factorize(cube['storeName'], sort=True)
+    category_codes, categories = pd.factorize(cube['subCategoryOf'], sort=True)
+    valid = (store_codes >= 0) & (category_codes >= 0)
+
+    cells = store_codes[valid] * len(categories) + category_codes[valid]
+    revenue = np.nan_to_num(cube['totalProductPrice'].to_numpy(dtype=np.float64)[valid])
+    sales = np.bincount(cells, weights=revenue, minlength=len(stores) * len(categories)).reshape(len(stores), len(categories))
+
+    totals = sales.sum(axis=1, keepdims=True)
+    keep = totals[:, 0] > 0
+    shares = sales[keep] / totals[keep]
+    return pd.DataFrame(shares, index=pd.Index(np.asarray(stores)[keep], name='storeName'), columns=pd.Index(np.asarray(categories), name='subCategoryOf'))
+
+
+def _squared_distances(points, centroids):
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, one matrix product instead of a (points, centroids, dims) array
+    distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+def kmeans(points, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Lloyd's k-means on the rows of `points`, seeded with k-means++; returns (labels, centroids).
+
+    Deterministic for a given `seed`. Groups are numbered in order of their first row, so the
+    same data always gives the same numbering.
+    """
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    # k-means++: each next seed is drawn with probability proportional to its distance from the nearest seed so far
+    seeds = [int(rng.integers(n))]
+    nearest = _squared_distances(points, points[seeds])[:, 0]
+    for _ in range(1, k):
+        total = nearest.sum()
+        seed_row = int(rng.choice(n, p=nearest / total)) if total > 0 else int(rng.integers(n))
+        seeds.append(seed_row)
+        nearest = np.minimum(nearest, _squared_distances(points, points[[seed_row]])[:, 0])
+    centroids = points[seeds].astype(np.float64)
+
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        new_labels = _squared_distances(points, centroids).argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        # A group that lost all its stores keeps its old centroid
+        centroids = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+
+    # Renumber by first appearance
+    _, first_rows = np.unique(labels, return_index=True)
+    order = labels[np.sort(first_rows)]
+    renumber = np.empty(k, dtype=np.int64)
+    renumber[order] = np.arange(len(order))
+    return renumber[labels], centroids[order]
+
+
+def compute_peer_groups(cube, n_groups=DEFAULT_PEER_GROUPS):
+    """PeerGroups of every store with sales in `cube`, from their category mix."""
+    mix = category_mix(cube)
+    if mix.empty:
+        return PeerGroups(mix, np.zeros(0, dtype=np.int64), np.zeros((0, mix.shape[1])))
+    labels, centroids = kmeans(mix.to_numpy(), n_groups)
+    return PeerGroups(mix, labels, centroids)
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from analysis.counter_shelf_analysis import cached_counter_shelf_performance
+from analysis.fnb_performance import cached_fnb_performance
+from analysis.monetized_brands import cached_monetized_brands
+from analysis.order_analysis import cached_order_metrics
+from analysis.sales_by_category import cached_category_sales
+from analysis.sales_per_channel import cached_channel_sales
+from analysis.store_comparison import cached_store_comparison, default_comparison_stores
+from analysis.store_leaderboard import cached_store_leaderboard
+from analysis.time_slot_analysis import cached_time_slot_sales
+from analysis.top_n_brand_sales import DEFAULT_TOP_BRANDS, cached_brand_sales
+from analysis.top_n_products import DEFAULT_TOP_PRODUCTS, cached_product_sales, cached_top_products
+
+# Threads computing section results ahead of rendering, shared by every session on this server
+PREFETCH_WORKERS = int(os.environ.get('TNS_PREFETCH_WORKERS', min(8, os.cpu_count() or 1)))
+
+
+def _top_products(ctx, n_products):
+    return cached_top_products(ctx, cached_product_sales(ctx), n_products)
+
+
+def _store_comparison(ctx, stores):
+    stores = default_comparison_stores(ctx) if stores is None else stores
+    if len(stores) >= 2:
+        cached_store_comparison(ctx, stores)
+
+
+# Section title -> kernel(ctx, widget state) warming the results its render function reads first.
+# Widget state is a plain dict read on the script thread; the kernels never touch Streamlit.
+SECTION_KERNELS = {
+    "Store Leaderboard": lambda ctx, state: cached_store_leaderboard(ctx),
+    "Order Analysis": lambda ctx, state: cached_order_metrics(ctx),
+    "Sales by Category": lambda ctx, state: cached_category_sales(ctx),
+    "Time Slot Analysis": lambda ctx, state: cached_time_slot_sales(ctx),
+    "Sales per Channel": lambda ctx, state: cached_channel_sales(ctx),
+    "Top-N Brands": lambda ctx, state: cached_brand_sales(ctx, state.get('n_brands', DEFAULT_TOP_BRANDS)),
+    "Top-N Products": lambda ctx, state: _top_products(ctx, state.get('n_products', DEFAULT_TOP_PRODUCTS)),
+    "F&B Performance": lambda ctx, state: cached_fnb_performance(ctx),
+    "Monetized Brands": lambda ctx, state: cached_monetized_brands(ctx),
+    "Counter Shelf Products": lambda ctx, state: cached_counter_shelf_performance(ctx),
+    "Store Comparison": lambda ctx, state: _store_comparison(ctx, state.get('comparison_stores')),
+}
+
+
+@st.cache_resource
+def get_prefetch_pool():
+    """The process-wide thread pool for section kernels."""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='tns-prefetch')
+
+
+def prefetch_sections(ctx, titles, state):
+    """Start the kernels of the sections in `titles` at once; {title: Future} to wait on before rendering.
+
+    Sections only read the context's slices and the shared indexes, so they run side by side and the
+    page waits about as long as its slowest section. Results land in the ResultCache, where the render
+    functions find them. A failing kernel is left for its render function to hit and report.
+    """
+    pool = get_prefetch_pool()
+    return {title: pool.submit(SECTION_KERNELS[title], ctx, state) for title in titles if title in SECTION_KERNELS}
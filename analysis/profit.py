@@ -1,35 +1,43 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 
+from analysis.company_standards import COMPANY_AVERAGE_DAILY_SALES, COMPANY_PROFIT_RATIO
+
 def format_currency(value):
     """Format the value as currency in Rupees with commas."""
     return f"₹{value:,.2f}"
 
-def calculate_profits(data, selected_store, start_date, end_date):
-    st.markdown("<h4 style='color: green; text-align: center;'>Profit KPI</h4>", unsafe_allow_html=True)
+@dataclass
+class ProfitMetrics:
+    """Profit KPIs of one store over a date range."""
+    selected_store_profit: float
+    overall_average_profit: float
+    selected_store_average_profit: float
+    profit_contribution_percentage: float
 
-    # Filter data for the selected date range and store
-    filtered_data = data[(data['orderDate'] >= start_date) & (data['orderDate'] <= end_date)]
-    
-    # Calculate profit per store for the filtered data
-    store_profit = filtered_data.groupby('storeName').apply(
-        lambda x: (x['totalProductPrice'] - (x['costPrice']* x['quantity'])).sum()
-    ).reset_index()
-    store_profit.columns = ['storeName', 'profit']
 
-    # Calculate overall profit for the filtered data
-    overall_profit = store_profit['profit'].sum()
+def compute_profits(kpis, selected_store, start_date, end_date,
+                    average_daily_sales=COMPANY_AVERAGE_DAILY_SALES, profit_ratio=COMPANY_PROFIT_RATIO):
+    """Store profit, its daily average and profit-to-revenue percentage, from the KPI prefix sums.
+
+    The overall average profit is a store's expected profit over the range: `average_daily_sales`
+    per day at `profit_ratio`, the company standards (fixed or measured, see AnalysisContext).
+    """
+    # Range totals come from the KPI prefix sums, so no rows are scanned here
+    store_totals = kpis.totals(selected_store, start_date, end_date)
 
     # Calculate date range in days
     date_range_days = (end_date - start_date).days + 1
 
     # Calculate overall average profit using the new formula
-    overall_average_profit = 42358 * date_range_days * 0.3
+    overall_average_profit = average_daily_sales * date_range_days * profit_ratio
 
-    # Ensure the selected store exists in the filtered data
-    if selected_store in store_profit['storeName'].values:
+    # Ensure the selected store has sales in the selected range
+    if kpis.has_sales(selected_store, start_date, end_date):
         # Calculate store-specific profit
-        store_profit_value = store_profit.loc[store_profit['storeName'] == selected_store, 'profit'].values[0]
+        store_profit_value = store_totals['revenue'] - store_totals['cost']
 
         # Calculate store average profit
         store_average_profit = store_profit_value / date_range_days if date_range_days > 0 else 0
@@ -38,25 +46,25 @@ def calculate_profits(data, selected_store, start_date, end_date):
         store_profit_value = 0
         store_average_profit = 0
 
-    # Calculate store revenue for the selected store
-    store_revenue = filtered_data[filtered_data['storeName'] == selected_store]['totalProductPrice'].sum()
+    # Store revenue for the selected store
+    store_revenue = store_totals['revenue']
 
     # Calculate profit contribution percentage
     profit_contribution_percentage = (store_profit_value / store_revenue * 100) if store_revenue > 0 else 0
 
-    # Prepare the results as a dictionary
-    results = {
-        'selected_store_profit': store_profit_value,
-        'overall_average_profit': overall_average_profit,
-        'selected_store_average_profit': store_average_profit,
-        'profit_contribution_percentage': profit_contribution_percentage
-    }
+    return ProfitMetrics(
+        selected_store_profit=store_profit_value,
+        overall_average_profit=overall_average_profit,
+        selected_store_average_profit=store_average_profit,
+        profit_contribution_percentage=profit_contribution_percentage,
+    )
 
-    return results
 
-def display_profit_metrics(data, selected_store, start_date, end_date):
+def render_profit_metrics(ctx):
+    st.markdown("<h4 style='color: green; text-align: center;'>Profit KPI</h4>", unsafe_allow_html=True)
+
     # Calculate profits
-    profits = calculate_profits(data, selected_store, start_date, end_date)
+    profits = compute_profits(ctx.kpis, ctx.selected_store, ctx.start_date, ctx.end_date, ctx.average_daily_sales, ctx.profit_ratio)
 
     # Create three equal columns
     col1, col2, col3 = st.columns(3, gap="large")
@@ -97,23 +105,23 @@ def display_profit_metrics(data, selected_store, start_date, end_date):
     with col1:
         st.metric(
             "Store Profit",
-            format_currency(profits['selected_store_profit'])
+            format_currency(profits.selected_store_profit)
         )
 
     # Overall Average Profit in col2
     with col2:
         st.metric(
             "Overall Average Profit",
-            format_currency(profits['overall_average_profit'])
+            format_currency(profits.overall_average_profit)
         )
 
     # Profit Contribution Percentage in col3 with conditional formatting
     with col3:
-        profit_percentage = profits['profit_contribution_percentage']
+        profit_percentage = profits.profit_contribution_percentage
         st.metric(
             "Profit to Revenue Percentage",
             f"{profit_percentage:.2f}%"
         )
     
-    # Return the profits dictionary
+    # Return the profit metrics
     return profits
@@ -0,0 +1,119 @@
+import dataclasses
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Memory the cached section results may use, shared by every session on this server
+MAX_RESULT_BYTES = int(os.environ.get('TNS_RESULT_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+
+def estimate_bytes(value):
+    """Approximate memory held by a cached result (frames deep, containers recursively)."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_bytes(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _view(value):
+    # Hand out shallow copies of frames: with copy-on-write a caller adding or formatting
+    # columns changes its own copy, never the cached result the next session gets
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.replace(value, **{f.name: _view(getattr(value, f.name)) for f in dataclasses.fields(value) if f.init})
+    if isinstance(value, dict):
+        return {k: _view(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_view(item) for item in value)
+    if isinstance(value, list):
+        return [_view(item) for item in value]
+    return value
+
+
+class ResultCache:
+    """Least-recently-used cache of computed section results under a memory budget.
+
+    Keys are tuples starting with the dataset hash, e.g. (dataset, store, start, end, section, params),
+    so two sessions looking at the same store and range share one result.
+    """
+
+    def __init__(self, max_bytes=MAX_RESULT_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (value, bytes); most recently used last
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Cached result for `key`, computing and storing `compute()` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _view(entry[0])
+            self.misses += 1
+
+        # Computed outside the lock; two sessions missing the same key at once both compute it
+        value = compute()
+        size = estimate_bytes(value)
+
+        with self._lock:
+            if size <= self.max_bytes:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[1]
+                self._entries[key] = (value, size)
+                self._bytes += size
+                self._evict()
+        return _view(value)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def discard_dataset(self, dataset_key):
+        """Drop every result computed from `dataset_key`."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == dataset_key]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Drop every result and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Entries, bytes used, budget and hit/miss counts, for the admin panel."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_result_cache():
+    """The process-wide section result cache."""
+    return ResultCache()
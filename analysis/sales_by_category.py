@@ -3,27 +3,48 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass
 
-def sales_by_category_analysis(store_data, all_data):
-    results = {
-        'sales_per_category': None,
-        'category_chart': None,
-        'store_kpis': None,
-        #'weekly_sales': None,
-        #'monthly_sales': None
-    }
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, column_config, labels, styled
 
-    store_data['totalProductPrice'] = pd.to_numeric(store_data['totalProductPrice'], errors='coerce')
-    store_data['quantity'] = pd.to_numeric(store_data['quantity'], errors='coerce')
-    store_data['costPrice'] = pd.to_numeric(store_data['costPrice'], errors='coerce')
 
-    st.markdown("<h4 style='color: green; text-align: center; margin-top: 0px;'>💰 SALES BY CATEGORY</h4>", unsafe_allow_html=True)
+@dataclass
+class CategorySales:
+    """Per-subCategoryOf sales of one store against the category benchmark, with store totals."""
+    sales_per_category: pd.DataFrame
+    total_quantity: float
+    total_cost_price: float
+    total_profit: float
+
+
+@dataclass
+class WeeklyCategorySales:
+    """Sales per subCategoryOf and month by week of month ('Week 1', ...), with week-over-week % change."""
+    sales: pd.DataFrame
+    num_weeks: int
+
+
+def _percentage_change(previous, current):
+    if previous == 0 and current == 0:
+        return 0
+    elif previous == 0:
+        return 100
+    else:
+        return ((current - previous) / previous) * 100
+
+
+def compute_category_sales(store_cube, company_benchmark):
+    """Sales, quantity, cost, profit and contribution per subCategoryOf, largest first.
 
+    `company_benchmark` is the 'category' Benchmark. Percentages are numbers (contribution rounded
+    to 2 places); missing benchmark values are 0.
+    """
     # Group by category and calculate necessary metrics for the selected store
-    sales_per_category = store_data.groupby('subCategoryOf').agg(
+    sales_per_category = store_cube.groupby('subCategoryOf', observed=True).agg(
         total_sales=('totalProductPrice', 'sum'),
         total_quantity=('quantity', 'sum'),
-        total_cost_price=('costPrice', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
     ).reset_index()
 
     # Calculate profit and profit margin
@@ -31,13 +52,10 @@ def sales_by_category_analysis(store_data, all_data):
     sales_per_category['profit_margin'] = (sales_per_category['profit'] / sales_per_category['total_sales']) * 100
 
     # Sort by total sales
-    sales_per_category = sales_per_category.sort_values(by='total_sales', ascending=False)
-
-    # Load company benchmark data
-    company_benchmark = pd.read_csv('./company_bechmark/category_benchmark.csv')
+    sales_per_category = sales_per_category.sort_values(by='total_sales', ascending=False, ignore_index=True)
 
-    # Merge with company benchmark data
-    sales_per_category = sales_per_category.merge(company_benchmark, on='subCategoryOf', how='left')
+    # Company standard of each category
+    sales_per_category['Company Standard'] = company_benchmark.standard_for(sales_per_category['subCategoryOf'])
 
     # Calculate total sales across all categories
     total_sales = sales_per_category['total_sales'].sum()
@@ -46,85 +64,192 @@ def sales_by_category_analysis(store_data, all_data):
     #revenue contribution
     sales_per_category['revenue_contribution'] = (sales_per_category['total_sales'] / total_sales) * 100
 
-    # Convert profit_margin and percentage_contribution to string with "%" symbol
-    sales_per_category['profit_margin'] = sales_per_category['profit_margin'].apply(lambda x: f"{x:.2f}%")
-    sales_per_category['profit_contribution'] = sales_per_category['profit_contribution'].apply(lambda x: f"{x:.2f}%")
-
-    results['sales_per_category'] = sales_per_category
-
-    # Sidebar for user inputs
-    with st.sidebar:
-        st.markdown("### Sales Category Analysis Options")
-
-        # Ensure that the default value does not exceed the maximum value
-        max_categories = len(sales_per_category)
-        top_n = st.number_input("Select Top-N categories to display:", min_value=0, max_value=max_categories, value=min(20, max_categories), key="top_n_category")
-
-    top_sales_per_category = sales_per_category.head(top_n)
-
-    total_sales_sum = sales_per_category['total_sales'].sum()
-    total_quantity_sum = sales_per_category['total_quantity'].sum()
-    total_cost_price_sum = sales_per_category['total_cost_price'].sum()
-    total_profit_sum = sales_per_category['profit'].sum()
-
+    total_quantity = sales_per_category['total_quantity'].sum()
+    total_cost_price = sales_per_category['total_cost_price'].sum()
+    total_profit = sales_per_category['profit'].sum()
 
     sales_per_category['total_sales'] = sales_per_category['total_sales'].round(2)
 
     # Calculate total sales across all categories
     total_sales = sales_per_category['total_sales'].sum()
- 
-       # Contribution of each category to the total sales (store level)
+
+    # Contribution of each category to the total sales (store level)
     sales_per_category['contribution'] = np.where(total_sales != 0,
         (sales_per_category['total_sales'] / total_sales * 100).round(2), 0)
 
     # Calculate Variance as the percentage difference between the store contribution and company standard
     sales_per_category['variance'] = ((sales_per_category['contribution'] - sales_per_category['Company Standard']) / sales_per_category['Company Standard']).round(2)
 
-    # Replace empty strings with NaN
-    sales_per_category.replace('', np.nan, inplace=True)
+    # Round the difference to 2 decimal places
+    sales_per_category['difference'] = (sales_per_category['contribution'] - sales_per_category['Company Standard']).round(2)
 
-    # Ensure numeric types for calculations
-    sales_per_category['profit_margin'] = pd.to_numeric(sales_per_category['profit_margin'], errors='coerce')
-    sales_per_category['contribution'] = pd.to_numeric(sales_per_category['contribution'], errors='coerce')
-    sales_per_category['Company Standard'] = pd.to_numeric(sales_per_category['Company Standard'], errors='coerce')
-    sales_per_category['variance'] = pd.to_numeric(sales_per_category['variance'], errors='coerce')
+    # Handle NaN values (example: filling with 0); the category key column is categorical, so only fill numbers
+    numeric_columns = sales_per_category.select_dtypes('number').columns
+    sales_per_category[numeric_columns] = sales_per_category[numeric_columns].fillna(0)
 
-    sales_per_category["difference"] = sales_per_category['contribution'] - sales_per_category['Company Standard']
+    return CategorySales(sales_per_category, total_quantity, total_cost_price, total_profit)
+
+
+def compute_weekly_category_sales(store_cube, calendar):
+    """Week-of-month sales per subCategoryOf, year and month; `calendar` is calendar_columns of the cube."""
+    # Week, year, month and week-of-month columns come from the shared calendar
+    filtered_store_data = store_cube.join(calendar[['week', 'year', 'month', 'week_of_month']])
+
+    # Pivot the DataFrame to create separate columns for each week
+    weekly_sales_per_category = filtered_store_data.pivot_table(
+        index=['subCategoryOf', 'year', 'month'],
+        columns='week_of_month',
+        values='totalProductPrice',
+        aggfunc='sum',
+        observed=True
+    ).reset_index()
+
+    # Rename the columns for better readability
+    weekly_sales_per_category.columns = ['subCategoryOf', 'year', 'month'] + [f'Week {int(col)}' for col in weekly_sales_per_category.columns[3:]]
+
+    # Fill missing values with 0 (weeks with no sales)
+    week_columns = weekly_sales_per_category.select_dtypes('number').columns
+    weekly_sales_per_category[week_columns] = weekly_sales_per_category[week_columns].fillna(0)
+
+    # Dynamically determine the number of weeks present
+    num_weeks = weekly_sales_per_category.shape[1] - 3
+
+    # Calculate percentage change for weekly sales (week over week)
+    for i in range(1, num_weeks):
+        current_week = f'Week {i}'
+        next_week = f'Week {i+1}'
+        change_column = f'{next_week} % Change'
+
+        weekly_sales_per_category[change_column] = weekly_sales_per_category.apply(
+            lambda row: _percentage_change(row[current_week], row[next_week]),
+            axis=1
+        )
+
+    return WeeklyCategorySales(weekly_sales_per_category, num_weeks)
+
+
+def compute_monthly_category_sales(store_cube, calendar):
+    """Sales per subCategoryOf and month (month_year as the month's first day)."""
+    monthly_sales_per_category = store_cube.assign(month_year=calendar['month_period']).groupby(
+        ['subCategoryOf', 'month_year'], observed=True
+    )['totalProductPrice'].sum().reset_index()
+
+    # Convert month-year to datetime for better plotting
+    monthly_sales_per_category['month_year'] = monthly_sales_per_category['month_year'].dt.to_timestamp()
+    return monthly_sales_per_category
+
+
+def compute_category_month_sales(store_cube, calendar, categories):
+    """Sales of the given subCategoryOf values per month name."""
+    comparison_data = store_cube[store_cube['subCategoryOf'].isin(categories)].join(calendar[['month']])
+    return comparison_data.groupby(['subCategoryOf', 'month'], observed=True)['totalProductPrice'].sum().reset_index()
+
+
+def compute_weekly_contribution(store_cube, calendar, month_period):
+    """Each subCategoryOf's share of weekly sales in one month (week_1, week_2, ...), its 3 week average and week 4 variance."""
+    # orderDate is parsed at ingestion; drop undated rows
+    store_data = store_cube.dropna(subset=['orderDate'])
+    store_data = store_data[calendar.loc[store_data.index, 'month_period'] == month_period]
+
+    # Step 1: Weekly Average Analysis
+    store_data = store_data.join(calendar[['week', 'year']])
+
+    # Group by week and category to calculate total sales
+    weekly_sales = store_data.groupby(['year', 'week', 'subCategoryOf'], observed=True).agg(
+        total_sales=('totalProductPrice', 'sum')
+    ).reset_index()
+
+    # Calculate contribution percentage for each category
+    total_weekly_sales = weekly_sales.groupby(['year', 'week'])['total_sales'].sum().reset_index()
+    weekly_sales = weekly_sales.merge(total_weekly_sales, on=['year', 'week'], suffixes=('', '_total'))
+    weekly_sales['contribution'] = (weekly_sales['total_sales'] / weekly_sales['total_sales_total']) * 100
+
+    # Pivot the DataFrame to have weeks as columns
+    weekly_contribution_df = weekly_sales.pivot(index='subCategoryOf', columns='week', values='contribution').reset_index()
+
+    # Rename columns for clarity
+    weekly_contribution_df.columns.name = None
+    weeks_available = weekly_contribution_df.shape[1] - 1
+    weekly_contribution_df.columns = ['subCategoryOf'] + [f'week_{i}' for i in range(1, weeks_available + 1)]
+
+    if weeks_available >= 3:
+        # Calculate the mean of available weeks
+        if weeks_available >= 4:
+            # Calculate for stores with at least 4 weeks of data
+            weekly_contribution_df['3_week_average'] = weekly_contribution_df[[f'week_{i}' for i in range(1, 4)]].mean(axis=1)
+
+            # Handle NaN and calculate difference and variance
+            weekly_contribution_df['3_week_average'] = pd.to_numeric(weekly_contribution_df['3_week_average'], errors='coerce')
+            weekly_contribution_df['3_week_average'] = weekly_contribution_df['3_week_average'].fillna(0)
+            
+            weekly_contribution_df['difference'] = weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']
+            weekly_contribution_df['variance'] = ((weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']) / 
+                                                weekly_contribution_df['week_4']) * 100
+        else:
+            # Handle the case with less than 4 weeks
+            available_weeks = [f'week_{i}' for i in range(1, weeks_available + 1)]
+            weekly_contribution_df['3_week_average'] = weekly_contribution_df[available_weeks].mean(axis=1)
+
+            # Adjust variance calculation if there is no 'week_4'
+            if 'week_4' in weekly_contribution_df.columns:
+                weekly_contribution_df['difference'] = weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']
+                weekly_contribution_df['variance'] = ((weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']) / 
+                                                    weekly_contribution_df['week_4']) * 100
+            else:
+                weekly_contribution_df['difference'] = 0
+                weekly_contribution_df['variance'] = 0
+
+    if '3_week_average' not in weekly_contribution_df.columns:
+        weekly_contribution_df['3_week_average'] = 0
+
+    # Fill NaN values
+    week_columns = weekly_contribution_df.select_dtypes('number').columns
+    weekly_contribution_df[week_columns] = weekly_contribution_df[week_columns].fillna(0)
+    return weekly_contribution_df
+
+
+def cached_category_sales(ctx):
+    """compute_category_sales of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('category')
+    return ctx.cached('category_sales', lambda: compute_category_sales(ctx.store_cube, benchmark), benchmark.version)
 
-    # Round the difference to 2 decimal places
-    sales_per_category['difference'] = sales_per_category['difference'].round(2)
 
-    # Handle NaN values (example: filling with 0)
-    sales_per_category.fillna(0, inplace=True)
+@st.fragment
+def render_sales_by_category(ctx):
+    store_data = ctx.store_cube
+    calendar = ctx.store_cube_calendar
 
-    # Convert profit_margin, contribution, Company Standard, and variance to string with "%" symbol
-    sales_per_category['profit_margin'] = sales_per_category['profit_margin'].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else '')
-    sales_per_category['contribution'] = sales_per_category['contribution'].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else '')
-    sales_per_category['Company Standard'] = sales_per_category['Company Standard'].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else '')
-    sales_per_category['variance'] = sales_per_category['variance'].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else '')
-    sales_per_category['difference'] = sales_per_category['difference'].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else '')
+    results = {
+        'sales_per_category': None,
+        'category_chart': None,
+        'store_kpis': None,
+        #'weekly_sales': None,
+        #'monthly_sales': None
+    }
 
+    st.markdown("<h4 style='color: green; text-align: center; margin-top: 0px;'>💰 SALES BY CATEGORY</h4>", unsafe_allow_html=True)
+    controls = st.expander("Sales by Category Options")
 
-    # Round total_sales to 2 decimal places for display
-    sales_per_category['total_sales'] = sales_per_category['total_sales'].apply(lambda x: f"{x:.2f}")
+    result = cached_category_sales(ctx)
+    sales_per_category = result.sales_per_category
 
+    results['sales_per_category'] = sales_per_category
 
-    # Define a function to highlight negative variances in red
-    def highlight_negative_variance(val):
-        if pd.isnull(val) or val == '':
-            return ''
-        color = 'red' if float(val[:-1]) < 0 else ''
-        return f'color: {color}'
+    # User inputs
+    with controls:
+        st.markdown("### Sales Category Analysis Options")
 
-    def highlight_negative_difference(val):
-        if pd.isnull(val) or val == '':
-            return ''
-        color = 'red' if float(val[:-1]) < 0 else ''  
-        return f'color: {color}'
+        # Ensure that the default value does not exceed the maximum value
+        max_categories = len(sales_per_category)
+        top_n = st.number_input("Select Top-N categories to display:", min_value=0, max_value=max_categories, value=min(20, max_categories), key="top_n_category")
 
+    top_sales_per_category = sales_per_category.head(top_n)
 
+    total_quantity_sum = result.total_quantity
+    total_cost_price_sum = result.total_cost_price
+    total_profit_sum = result.total_profit
 
-    with st.sidebar:
+    with controls:
         st.markdown("### Sales Category Comparison Options")
 
         # Top-N categories input (reflecting lowest to highest)
@@ -224,9 +349,12 @@ def sales_by_category_analysis(store_data, all_data):
     st.markdown(custom_css, unsafe_allow_html=True)
 
     with st.container():
-        final_df = sales_per_category[['subCategoryOf', 'total_sales', 'contribution', 'Company Standard', 'variance', 'difference']].style.applymap(
-            highlight_negative_variance, subset=['variance']).applymap(
-            highlight_negative_difference, subset=['difference']).set_table_styles(
+        # Amounts and percentages are formatted for display only; negative variance and difference in red
+        final_df = styled(
+            sales_per_category[['subCategoryOf', 'total_sales', 'contribution', 'Company Standard', 'variance', 'difference']],
+            {'total_sales': AMOUNT, 'contribution': PERCENT, 'Company Standard': PERCENT, 'variance': PERCENT, 'difference': PERCENT},
+            negative=['variance', 'difference'],
+        ).set_table_styles(
             [{
                 'selector': 'thead th',
                 'props': [('text-align', 'center')]
@@ -283,18 +411,7 @@ def sales_by_category_analysis(store_data, all_data):
 
 
 
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_cat = convert_df(sales_per_category.drop(columns=['profit_margin']))
-
-    st.sidebar.download_button(
-            label="Download Category Sales Data",
-            data=csv_cat,   
-            file_name='sales_by_category.csv',
-            mime='text/csv',
-        )
+    csv_download("Download Category Sales Data", sales_per_category.drop(columns=['profit_margin']), 'sales_by_category.csv', controls, scope=ctx.selection_key)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -312,7 +429,7 @@ def sales_by_category_analysis(store_data, all_data):
 
 
     # --- Comparing Weekly Sales by Category ---
-    if st.sidebar.checkbox("Show Weekly Sales Comparison on selected categories", value=False):
+    if controls.checkbox("Show Weekly Sales Comparison on selected categories", value=False):
         st.markdown("---")
         st.markdown(
             """
@@ -324,63 +441,16 @@ def sales_by_category_analysis(store_data, all_data):
 
         st.markdown("---")
 
-        # Helper function to calculate percentage change
-        def calculate_percentage_change(previous, current):
-            if previous == 0 and current == 0:
-                return 0
-            elif previous == 0:
-                return 100
-            else:
-                return ((current - previous) / previous) * 100
-
-        # Select the store dynamically
-        selected_store = st.selectbox("Select a Store:", store_data['storeName'].unique(), key="store_selection")
-
-        # Filter store_data for the selected store
-        filtered_store_data = store_data[store_data['storeName'] == selected_store]
-
-        # Create week, year, and month columns
-        filtered_store_data['week'] = filtered_store_data['orderDate'].dt.isocalendar().week
-        filtered_store_data['year'] = filtered_store_data['orderDate'].dt.year
-        filtered_store_data['month'] = filtered_store_data['orderDate'].dt.strftime('%b')
-
-        # Create a column to identify week number within the month
-        filtered_store_data['week_of_month'] = filtered_store_data['orderDate'].apply(lambda x: (x.day - 1) // 7 + 1)
-
-        # Pivot the DataFrame to create separate columns for each week
-        weekly_sales_per_category = filtered_store_data.pivot_table(
-            index=['subCategoryOf', 'year', 'month'],
-            columns='week_of_month',
-            values='totalProductPrice',
-            aggfunc='sum'
-        ).reset_index()
-
-        # Rename the columns for better readability
-        weekly_sales_per_category.columns = ['subCategoryOf', 'year', 'month'] + [f'Week {int(col)}' for col in weekly_sales_per_category.columns[3:]]
+        selected_store = ctx.selected_store
 
-        # Fill missing values with 0 (weeks with no sales)
-        weekly_sales_per_category.fillna(0, inplace=True)
-
-        # Dynamically determine the number of weeks present
-        num_weeks = weekly_sales_per_category.shape[1] - 3
-
-        # Calculate percentage change for weekly sales (week over week)
-        for i in range(1, num_weeks):
-            current_week = f'Week {i}'
-            next_week = f'Week {i+1}'
-            change_column = f'{next_week} % Change'
-            
-            weekly_sales_per_category[change_column] = weekly_sales_per_category.apply(
-                lambda row: calculate_percentage_change(row[current_week], row[next_week]),
-                axis=1
-            )
+        weekly = ctx.cached('weekly_category_sales', lambda: compute_weekly_category_sales(
+            ctx.store_cube, ctx.store_cube_calendar
+        ))
+        weekly_sales_per_category = weekly.sales
+        num_weeks = weekly.num_weeks
 
-        # Format the percentage change columns
-        for i in range(1, num_weeks):
-            change_column = f'Week {i+1} % Change'
-            weekly_sales_per_category[change_column] = weekly_sales_per_category[change_column].apply(
-                lambda x: f"{x:+.2f}%" if pd.notnull(x) and x != 100 else "N/A" if pd.isnull(x) else "+100%"
-            )
+        # Percentage change columns are shown signed, e.g. "+12.50%"
+        change_formats = {f'Week {i+1} % Change': '{:+.2f}%' for i in range(1, num_weeks)}
             
         # Select a category for weekly sales comparison
         unique_key = f"category_weekly_{selected_store}"
@@ -424,7 +494,7 @@ def sales_by_category_analysis(store_data, all_data):
             'chart': fig_weekly_sales
         }
         st.subheader(f"Weekly Sales Data for {selected_store}")
-        st.dataframe(weekly_sales_per_category)
+        st.dataframe(weekly_sales_per_category, column_config=column_config(change_formats))
 
         # Comment or recommendation box
         st.markdown("<h4 style='color: green; text-align: center; margin-top: 0px;'>Recommendations</h4>", unsafe_allow_html=True)
@@ -436,15 +506,8 @@ def sales_by_category_analysis(store_data, all_data):
             st.write(feedback)
 
     # --- Monthly Sales Trend ---
-    if st.sidebar.checkbox("Show Monthly Sales Trend on selected categories", value=False):
-        # Extract month and year
-        store_data['month_year'] = store_data['orderDate'].dt.to_period('M')
-        
-        # Group by category, year, and month
-        monthly_sales_per_category = store_data.groupby(['subCategoryOf', 'month_year'])['totalProductPrice'].sum().reset_index()
-        
-        # Convert month-year to datetime for better plotting
-        monthly_sales_per_category['month_year'] = monthly_sales_per_category['month_year'].dt.to_timestamp()
+    if controls.checkbox("Show Monthly Sales Trend on selected categories", value=False):
+        monthly_sales_per_category = ctx.cached('monthly_category_sales', lambda: compute_monthly_category_sales(store_data, calendar))
 
         # Provide plot type options
         plot_type = st.selectbox("Select Plot Type", ["Line Chart", "Bar Chart", "Area Chart"], key="monthly_plot_type")
@@ -497,12 +560,13 @@ def sales_by_category_analysis(store_data, all_data):
         }
 
     # --- Comparing Sales Across Categories ---
-    if st.sidebar.checkbox("Compare Category Sales", value=False, key="sales_comparison"):
+    if controls.checkbox("Compare Category Sales", value=False, key="sales_comparison"):
         selected_categories = st.multiselect("Select Categories to Compare:", sales_per_category['subCategoryOf'].unique(), key="category_compare")
         
         if selected_categories:
-            comparison_data = store_data[store_data['subCategoryOf'].isin(selected_categories)]
-            comparison_sales = comparison_data.groupby(['subCategoryOf', 'month'])['totalProductPrice'].sum().reset_index()
+            comparison_sales = ctx.cached('category_month_sales', lambda: compute_category_month_sales(
+                store_data, calendar, selected_categories
+            ), tuple(selected_categories))
 
             # Dropdown to select chart type
             chart_type = st.selectbox("Select Chart Type:", ["Grouped Bar Chart", "Stacked Bar Chart"], key="chart_type")
@@ -570,13 +634,11 @@ def sales_by_category_analysis(store_data, all_data):
 
 
     ## Weekly contribution analysis
-    # Ensure orderDate is in datetime format
-    store_data['orderDate'] = pd.to_datetime(store_data['orderDate'], errors='coerce')
-
+    # orderDate is parsed at ingestion; drop undated rows
     store_data = store_data.dropna(subset=['orderDate'])
 
 
-    unique_months = store_data['orderDate'].dt.to_period('M').unique()
+    unique_months = calendar.loc[store_data.index, 'month_period'].unique()
 
     if len(unique_months) == 0:
         st.error("No valid months found in the dataset. Please check your data.")
@@ -587,7 +649,7 @@ def sales_by_category_analysis(store_data, all_data):
         st.error("Unable to extract months from the dataset.")
         return None
 
-    selected_month = st.sidebar.selectbox(
+    selected_month = controls.selectbox(
     "Select Month for 3 Week Average Calculation:", 
     month_options, 
     index=len(month_options) - 1,
@@ -597,86 +659,23 @@ def sales_by_category_analysis(store_data, all_data):
         selected_month_period = pd.to_datetime(selected_month).to_period('M')
         
         # Filter store data by the selected month
-        store_data = store_data[store_data['orderDate'].dt.to_period('M') == selected_month_period]
+        store_data = store_data[calendar.loc[store_data.index, 'month_period'] == selected_month_period]
         
         # Proceed with rest of the analysis...
     except Exception as e:
         st.error(f"Error processing selected month: {e}")
         return None 
 
-    selected_month = st.sidebar.selectbox("Select Month for 3 Week Average Calculation:", month_options)
-
-    # Filter store data by the selected month
-    selected_month_period = pd.to_datetime(selected_month).to_period('M')
-    store_data = store_data[store_data['orderDate'].dt.to_period('M') == selected_month_period]
-
-    # Step 1: Weekly Average Analysis
-    store_data['week'] = store_data['orderDate'].dt.isocalendar().week
-    store_data['year'] = store_data['orderDate'].dt.year
+    selected_month = controls.selectbox("Select Month for 3 Week Average Calculation:", month_options)
 
-    # Group by week and category to calculate total sales
-    weekly_sales = store_data.groupby(['year', 'week', 'subCategoryOf']).agg(
-        total_sales=('totalProductPrice', 'sum')
-    ).reset_index()
-
-    # Calculate contribution percentage for each category
-    total_weekly_sales = weekly_sales.groupby(['year', 'week'])['total_sales'].sum().reset_index()
-    weekly_sales = weekly_sales.merge(total_weekly_sales, on=['year', 'week'], suffixes=('', '_total'))
-    weekly_sales['contribution'] = (weekly_sales['total_sales'] / weekly_sales['total_sales_total']) * 100
-
-    # Pivot the DataFrame to have weeks as columns
-    weekly_contribution_df = weekly_sales.pivot(index='subCategoryOf', columns='week', values='contribution').reset_index()
-
-    # Rename columns for clarity
-    weekly_contribution_df.columns.name = None
-    weeks_available = weekly_contribution_df.shape[1] - 1 
-    weekly_contribution_df.columns = ['subCategoryOf'] + [f'week_{i}' for i in range(1, weeks_available + 1)]
-
-    weeks_available = weekly_contribution_df.shape[1] - 1
+    # store_data is already narrowed to the first month picked, so both picks key the result
+    weekly_contribution_df = ctx.cached('weekly_contribution', lambda: compute_weekly_contribution(
+        store_data, calendar, pd.to_datetime(selected_month).to_period('M')
+    ), str(selected_month_period), selected_month)
 
     st.markdown("<h4 style='color: green; text-align: center;'>3 Week Average</h4>", unsafe_allow_html=True)
 
 
-    if weeks_available >= 3:
-        # Calculate the mean of available weeks
-        if weeks_available >= 4:
-            # Calculate for stores with at least 4 weeks of data
-            weekly_contribution_df['3_week_average'] = weekly_contribution_df[[f'week_{i}' for i in range(1, 4)]].mean(axis=1)
-
-            # Handle NaN and calculate difference and variance
-            weekly_contribution_df['3_week_average'] = pd.to_numeric(weekly_contribution_df['3_week_average'], errors='coerce')
-            weekly_contribution_df['3_week_average'].fillna(0, inplace=True)
-            
-            weekly_contribution_df['difference'] = weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']
-            weekly_contribution_df['variance'] = ((weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']) / 
-                                                weekly_contribution_df['week_4']) * 100
-        else:
-            # Handle the case with less than 4 weeks
-            available_weeks = [f'week_{i}' for i in range(1, weeks_available + 1)]
-            weekly_contribution_df['3_week_average'] = weekly_contribution_df[available_weeks].mean(axis=1)
-
-            # Adjust variance calculation if there is no 'week_4'
-            if 'week_4' in weekly_contribution_df.columns:
-                weekly_contribution_df['difference'] = weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']
-                weekly_contribution_df['variance'] = ((weekly_contribution_df['3_week_average'] - weekly_contribution_df['week_4']) / 
-                                                    weekly_contribution_df['week_4']) * 100
-            else:
-                weekly_contribution_df['difference'] = 0
-                weekly_contribution_df['variance'] = 0
-
-    if '3_week_average' not in weekly_contribution_df.columns:
-        weekly_contribution_df['3_week_average'] = 0
- 
-
-    # Fill NaN values and format percentage columns
-    weekly_contribution_df.fillna(0, inplace=True)
-
-    # Format columns like 'week_4', 'variance', 'difference'
-    for col in weekly_contribution_df.columns[1:]:
-        if col in ['week_4', 'variance', 'difference'] or col.startswith('week_'):
-            weekly_contribution_df[col] = weekly_contribution_df[col].apply(lambda x: f"{x:.2f}%" if pd.notnull(x) else "0.00%")
-        
-
     if top_n_comparison > 0:
         # Get the top N categories based on the 3-week average
         if '3_week_average' in weekly_contribution_df.columns:
@@ -688,11 +687,11 @@ def sales_by_category_analysis(store_data, all_data):
         top_categories = weekly_contribution_df
 
 
-    # Sidebar color options for the plot
+    # Color options for the plot
     color_options = ['Purple','Blue', 'Orange', 'Green', 'Red', 'Brown']
     color_options_2 = ['Orange','Blue',  'Red','Green',  'Brown', 'Purple']
-    selected_color_3w_avg = st.sidebar.selectbox("Select 3-Week Average Bar/Line Color:", color_options, key="color_3w_avg")
-    selected_color_week_4 = st.sidebar.selectbox("Select Week 4 Contribution Bar/Line Color:", color_options_2, key="color_week_4")
+    selected_color_3w_avg = controls.selectbox("Select 3-Week Average Bar/Line Color:", color_options, key="color_3w_avg")
+    selected_color_week_4 = controls.selectbox("Select Week 4 Contribution Bar/Line Color:", color_options_2, key="color_week_4")
 
     # Map color names to Plotly color codes
     color_mapping = {
@@ -727,7 +726,7 @@ def sales_by_category_analysis(store_data, all_data):
                 y=top_categories['week_4'],
                 name='Week 4 Contribution',
                 marker_color=selected_color_2,
-                text=top_categories['week_4'] if show_data_labels_comparison else None,
+                text=labels(top_categories['week_4']) if show_data_labels_comparison else None,
                 textposition='auto'
             ))
 
@@ -758,7 +757,7 @@ def sales_by_category_analysis(store_data, all_data):
                 mode='lines+markers' if show_data_labels_comparison else 'lines',
                 name='Week 4 Contribution',
                 line=dict(color=selected_color_2),
-                text=top_categories['week_4'] if show_data_labels_comparison else None,
+                text=labels(top_categories['week_4']) if show_data_labels_comparison else None,
                 textposition='top center'
             ))
 
@@ -778,20 +777,7 @@ def sales_by_category_analysis(store_data, all_data):
         st.markdown("<hr style='border-top: 2px solid #bbb;'>", unsafe_allow_html=True)
 
 
-    def highlight_negative(val):
-        color = 'red' if isinstance(val, str) and '-' in val else ''
-        return f'background-color: {color}'
-
-    styled_df = weekly_contribution_df.style.applymap(highlight_negative, subset=['variance'])
-
-    csv_week = convert_df(weekly_contribution_df)
-
-    st.sidebar.download_button(
-        label="Download weekly average Data",
-        data=csv_week,
-        file_name='weekly_contribution.csv',
-        mime='text/csv',
-    )
+    csv_download("Download weekly average Data", weekly_contribution_df, 'weekly_contribution.csv', controls, scope=ctx.selection_key)
 
     # Store the results
     results['sales_per_category'] = sales_per_category
@@ -1,83 +1,89 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-def sales_per_channel_analysis(store_data_filtered, data, selected_store=None):
-    # ---- Sales per Channel Analysis ----
-    st.markdown("<br><br><br><br><br><br><br>", unsafe_allow_html=True)
-    st.markdown("<h4 style='color: green; text-align: center;'>📊 SALES PER CHANNEL</h4>", unsafe_allow_html=True)
-    st.markdown("---")
+from analysis.formatting import AMOUNT, PERCENT, column_config, styled
 
-    # Filter data for the selected store if provided
-    if selected_store:
-        store_data_filtered = store_data_filtered[store_data_filtered['store'] == selected_store]
 
-    channel_sales = store_data_filtered.groupby('orderType').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_quantity=('quantity', 'sum'),
-        total_cost_price_raw=('costPrice', 'sum'),  # Keep raw cost price for reference
-    ).reset_index()
+@dataclass
+class ChannelSales:
+    """Per-channel sums and their comparison against the company standards."""
+    channel_sales: pd.DataFrame
+    comparison: pd.DataFrame
 
-    channel_sales['total_cost_price'] = store_data_filtered.groupby('orderType').apply(
-        lambda x: (x['costPrice'] * x['quantity']).sum()
-    ).values
+    @property
+    def has_zero_quantity(self):
+        return bool(self.channel_sales['total_quantity'].eq(0).any())
 
-    # Calculate total profit for each channel
-    channel_sales['total_profit'] = channel_sales['total_sales'] - channel_sales['total_cost_price']
 
-    # Check for zero quantity before calculating AOV
-    if channel_sales['total_quantity'].eq(0).any():
-        st.warning("Some channels have a total quantity of zero. Average Order Value may not be calculable.")
+def compute_channel_sales(store_cube, company_benchmark):
+    """Sales, quantity, cost, profit, AOV, margin and share of sales per orderType, against the 'channel' Benchmark."""
+    channel_sales = store_cube.groupby('orderType', observed=True).agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_quantity=('quantity', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
+        total_profit=('line_profit', 'sum'),
+    ).reset_index()
 
     channel_sales['average_order_value'] = channel_sales['total_sales'] / channel_sales['total_quantity'].replace(0, 1)
     channel_sales['profit_margin'] = (channel_sales['total_profit'] / channel_sales['total_sales'].replace(0, 1)) * 100
 
     # Calculate percentage contribution of each channel to the total sales
     channel_sales['sales_percentage_contribution'] = (channel_sales['total_sales'] / channel_sales['total_sales'].sum()) * 100
-    channel_sales['sales_percentage_contribution'] = channel_sales['sales_percentage_contribution'].apply(lambda x: f"{x:.2f}%")
+    channel_sales['contribution'] = channel_sales['sales_percentage_contribution']
 
-    # Check if the channel_sales DataFrame is empty
-    if channel_sales.empty:
-        st.warning("No sales data available for this analysis.")
-        return None, None, None
+    # Every standard channel gets a row, with zero sales if the store never used it;
+    # store channels are found by benchmark key, so the benchmark's 'Pos' is the store's 'pos'
+    by_channel = channel_sales.set_index(channel_sales['orderType'].map(company_benchmark.normalize).astype(object))
+    comparison_data = []
+    for channel, standard in company_benchmark.frame.itertuples(index=False):
+        key = company_benchmark.normalize(channel)
+        if key in by_channel.index:
+            channel = by_channel.at[key, 'orderType']
+            total_sales = by_channel.at[key, 'total_sales']
+            contribution = by_channel.at[key, 'contribution']
+        else:
+            total_sales, contribution = 0, 0.0
+        comparison_data.append({
+            'Channel': channel,
+            'Total Sales': total_sales,
+            'Contribution': contribution,
+            'Standard': float(standard),
+            'Variance': contribution - standard,
+        })
 
-    # Define company standards for each channel
-    company_standards = {
-        'tns-app': 5,
-        'ondc': 2,
-        'zomato': 5,
-        'swiggy': 3,
-        'pos': 85
-    }
+    return ChannelSales(channel_sales, pd.DataFrame(comparison_data))
 
-    # Calculate the contribution for comparison
-    channel_sales['contribution'] = (channel_sales['total_sales'] / channel_sales['total_sales'].sum()) * 100
 
-    # Create comparison DataFrame
-    comparison_data = []
-    for channel in company_standards.keys():
-        if channel in channel_sales['orderType'].values:
-            total_sales = channel_sales[channel_sales['orderType'] == channel]['total_sales'].values[0]
-            contribution = channel_sales[channel_sales['orderType'] == channel]['contribution'].values[0]
-            standard = company_standards[channel]
-            variance = contribution - standard
-            comparison_data.append({
-                'Channel': channel,
-                'Total Sales': total_sales,
-                'Contribution': f"{contribution:.2f}%",
-                'Standard': f"{standard:.2f}%",
-                'Variance': f"{variance:.2f}%",
-            })
-        else:
-            comparison_data.append({
-                'Channel': channel,
-                'Total Sales': 0,
-                'Contribution': "0.00%",
-                'Standard': f"{company_standards[channel]:.2f}%",
-                'Variance': f"{-company_standards[channel]:.2f}%",
-            })
+def cached_channel_sales(ctx):
+    """compute_channel_sales of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('channel')
+    return ctx.cached('channel_sales', lambda: compute_channel_sales(ctx.store_cube, benchmark), benchmark.version)
+
+
+@st.fragment
+def render_sales_per_channel(ctx):
+    # ---- Sales per Channel Analysis ----
+    st.markdown("<br><br><br><br><br><br><br>", unsafe_allow_html=True)
+    st.markdown("<h4 style='color: green; text-align: center;'>📊 SALES PER CHANNEL</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+    controls = st.expander("Sales per Channel Controls")
+
+    result = cached_channel_sales(ctx)
+
+    # Check for zero quantity before calculating AOV
+    if result.has_zero_quantity:
+        st.warning("Some channels have a total quantity of zero. Average Order Value may not be calculable.")
+
+    # Check if the channel_sales DataFrame is empty
+    if result.channel_sales.empty:
+        st.warning("No sales data available for this analysis.")
+        return None, None, None
 
-    comparison_df = pd.DataFrame(comparison_data)
+    channel_sales = result.channel_sales
+    comparison_df = result.comparison
 
     # Dynamically create columns based on the number of channels
     num_channels = len(channel_sales)
@@ -111,7 +117,7 @@ def sales_per_channel_analysis(store_data_filtered, data, selected_store=None):
                 <p><strong>Total Profit:</strong> ₹{row['total_profit']:,}</p>
                 <p><strong>Average Order Value (AOV):</strong> ₹{row['average_order_value']:,.2f}</p>
                 <p><strong>Profit Margin:</strong> {row['profit_margin']:.2f}%</p>
-                <p><strong>Sales % Contribution:</strong> {row['sales_percentage_contribution']}</p>
+                <p><strong>Sales % Contribution:</strong> {row['sales_percentage_contribution']:.2f}%</p>
             </div>
         """
         with columns[index]:
@@ -123,17 +129,17 @@ def sales_per_channel_analysis(store_data_filtered, data, selected_store=None):
                     <p><strong>Total Profit:</strong> ₹{row['total_profit']:,}</p>
                     <p><strong>Average Order Value (AOV):</strong> ₹{row['average_order_value']:,.2f}</p>
                     <p><strong>Profit Margin:</strong> {row['profit_margin']:.2f}%</p>
-                    <p><strong>Sales % Contribution:</strong> {row['sales_percentage_contribution']}</p>
+                    <p><strong>Sales % Contribution:</strong> {row['sales_percentage_contribution']:.2f}%</p>
                 </div>
             """, unsafe_allow_html=True)
 
-    channel_plot_type = st.sidebar.selectbox("Select Plot Type for Sales per Channel Analysis:", ["Bar Chart", "Donut Chart", "Line Chart"], key="channel_plot_type")
+    channel_plot_type = controls.selectbox("Select Plot Type for Sales per Channel Analysis:", ["Bar Chart", "Donut Chart", "Line Chart"], key="channel_plot_type")
 
     # User input for color selection for channel plots
-    selected_channel_color = st.sidebar.selectbox("Select Color Scale for Channel Plot:", ['Viridis', 'Plasma', 'Inferno', 'Magma', 'Cividis'], key="channel_color_scale")
+    selected_channel_color = controls.selectbox("Select Color Scale for Channel Plot:", ['Viridis', 'Plasma', 'Inferno', 'Magma', 'Cividis'], key="channel_color_scale")
 
     # User input to toggle data labels for Sales per Channel Analysis
-    show_data_labels_channel = st.sidebar.checkbox("Show Data Labels for Sales per Channel Analysis", value=True, key="show_data_labels_channel")
+    show_data_labels_channel = controls.checkbox("Show Data Labels for Sales per Channel Analysis", value=True, key="show_data_labels_channel")
 
     # Create the plot based on the selected type for Sales per Channel Analysis
     if channel_plot_type == "Bar Chart":
@@ -189,13 +195,13 @@ def sales_per_channel_analysis(store_data_filtered, data, selected_store=None):
 
 
     # Display the updated DataFrame with percentage contribution
-    st.dataframe(channel_sales)
+    st.dataframe(channel_sales, column_config=column_config({'sales_percentage_contribution': PERCENT}))
 
-    comparison_df['Total Sales'] = comparison_df['Total Sales'].apply(lambda x: f"{x:.2f}")
     # Create styled DataFrame for comparison
-    styled_comparison_df = comparison_df.style.applymap(
-        lambda x: 'color: red;' if isinstance(x, str) and x.endswith('%') and float(x[:-1]) < 0 else '',
-        subset=['Variance']
+    styled_comparison_df = styled(
+        comparison_df,
+        {'Total Sales': AMOUNT, 'Contribution': PERCENT, 'Standard': PERCENT, 'Variance': PERCENT},
+        negative=['Variance'], negative_style='color: red;',
     )
 
     # Convert the styled DataFrame to HTML
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pyarrow.feather as feather
+
+# Parsed datasets are kept as uncompressed Feather files so they can be memory-mapped back in
+CACHE_DIR = Path(os.environ.get('TNS_CACHE_DIR', Path(__file__).resolve().parent.parent / '.cache' / 'snapshots'))
+
+# Total disk budget for all snapshots; least recently used datasets are evicted beyond it
+MAX_CACHE_BYTES = int(os.environ.get('TNS_CACHE_MAX_BYTES', 5 * 1024 ** 3))
+
+# Bumped whenever the layout of what load_sales_csv produces changes, so older snapshots are not reused
+SNAPSHOT_VERSION = 3
+
+_HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def content_hash(source):
+    """Hex digest of an uploaded file's bytes; the file position is restored afterwards."""
+    digest = hashlib.blake2b(digest_size=16)
+    position = source.tell()
+    source.seek(0)
+    for block in iter(lambda: source.read(_HASH_BLOCK_BYTES), b''):
+        digest.update(block)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def is_valid_key(key):
+    # Keys can arrive from the URL, so only accept what content_hash produces
+    return isinstance(key, str) and len(key) == 32 and all(c in '0123456789abcdef' for c in key)
+
+
+def _snapshot_path(key, name):
+    if not is_valid_key(key):
+        raise ValueError(f"Invalid dataset key: {key!r}")
+    return CACHE_DIR / key / f"{name}.v{SNAPSHOT_VERSION}.feather"
+
+
+def _touch(key):
+    # The dataset directory's mtime doubles as its last-used time for LRU eviction
+    now = time.time()
+    try:
+        os.utime(CACHE_DIR / key, (now, now))
+    except FileNotFoundError:
+        # Evicted or cleared by another session meanwhile; the open memory map still holds the data
+        pass
+
+
+def has_snapshot(key, name='data'):
+    return is_valid_key(key) and _snapshot_path(key, name).exists()
+
+
+def load_snapshot(key, name='data'):
+    """Memory-map a cached frame back in, or return None if it is not cached."""
+    if not is_valid_key(key):
+        return None
+
+    path = _snapshot_path(key, name)
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (FileNotFoundError, OSError):
+        return None
+
+    _touch(key)
+    return table.to_pandas()
+
+
+def save_snapshot(key, frame, name='data'):
+    """Persist a frame under a dataset key and evict old datasets if over budget."""
+    path = _snapshot_path(key, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temporary file first so a concurrent reader never sees a partial snapshot
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    feather.write_feather(frame, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+    _touch(key)
+    evict_to_budget(keep=(key,))
+
+
+def _dataset_dirs():
+    if not CACHE_DIR.exists():
+        return []
+    return [entry for entry in CACHE_DIR.iterdir() if entry.is_dir()]
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def cache_usage():
+    """(number of cached datasets, total bytes on disk)."""
+    dirs = _dataset_dirs()
+    return len(dirs), sum(_dir_size(d) for d in dirs)
+
+
+def evict_to_budget(max_bytes=None, keep=()):
+    """Delete least recently used datasets until the cache fits in `max_bytes`."""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+
+    with _lock:
+        entries = [(d.stat().st_mtime, _dir_size(d), d) for d in _dataset_dirs()]
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= max_bytes:
+                break
+            if path.name in keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def clear_cache():
+    """Remove every cached snapshot."""
+    with _lock:
+        for path in _dataset_dirs():
+            shutil.rmtree(path, ignore_errors=True)
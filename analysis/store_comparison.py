@@ -0,0 +1,173 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, column_config
+from analysis.time_parsing import hour_of_day
+
+# Stores one comparison may hold, and how many charts sit side by side
+MAX_COMPARED_STORES = 6
+CHARTS_PER_ROW = 3
+# Categories shown per store (the rest are summed as 'Other') and brands ranked per store
+COMPARISON_TOP_CATEGORIES = 12
+COMPARISON_TOP_BRANDS = 10
+
+
+@dataclass
+class StoreComparison:
+    """Category mix, hourly curve, channel mix and top brands of a few stores, as long frames keyed by storeName."""
+    stores: list
+    summary: pd.DataFrame
+    category_mix: pd.DataFrame
+    hourly: pd.DataFrame
+    channel_mix: pd.DataFrame
+    top_brands: pd.DataFrame
+
+
+def _shares(cube, dimension):
+    # Percent of each store's sales per value of `dimension`, long format
+    sales = cube.groupby(['storeName', dimension], observed=True)['totalProductPrice'].sum()
+    shares = sales / sales.groupby(level='storeName', observed=True).transform('sum') * 100
+    frame = pd.DataFrame({'total_sales': sales, 'share': shares}).reset_index()
+    # Plain labels: a categorical column would put every category of the dataset on each chart axis
+    return frame.assign(**{dimension: frame[dimension].astype(object)})
+
+
+def compute_store_comparison(cube, rows, stores, n_brands=COMPARISON_TOP_BRANDS, n_categories=COMPARISON_TOP_CATEGORIES):
+    """Every comparison metric of `stores` at once, from their cube cells and line items.
+
+    Each metric is one groupby keyed by store over the stores' rows together, so the cost grows
+    with the rows and groups involved rather than with a full recompute per store.
+    """
+    cube = cube.assign(storeName=pd.Categorical(cube['storeName'].astype(object), categories=stores))
+    rows = rows.assign(storeName=pd.Categorical(rows['storeName'].astype(object), categories=stores))
+
+    summary = cube.groupby('storeName', observed=False).agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_profit=('line_profit', 'sum'),
+        total_quantity=('quantity', 'sum'),
+    )
+    summary['profit_margin'] = summary['total_profit'] / summary['total_sales'].replace(0, np.nan) * 100
+    summary = summary.reset_index()
+
+    # The categories largest across the compared stores, the same for every store so the charts line up
+    category_sales = cube.groupby('subCategoryOf', observed=True)['totalProductPrice'].sum().sort_values(ascending=False)
+    shown = category_sales.index[:n_categories]
+    category = cube['subCategoryOf'].astype(object).where(cube['subCategoryOf'].isin(shown), 'Other')
+    category_mix = _shares(cube.assign(subCategoryOf=category), 'subCategoryOf')
+
+    # Hourly curve on all 24 hours, zero where a store sold nothing
+    hours = hour_of_day(rows['time_seconds']).to_numpy(dtype=np.float64, na_value=np.nan)
+    known = ~np.isnan(hours)
+    store_codes = rows['storeName'].cat.codes.to_numpy()[known]
+    hourly_sales = np.bincount(
+        store_codes * 24 + hours[known].astype(np.int64),
+        weights=np.nan_to_num(rows['totalProductPrice'].to_numpy(dtype=np.float64)[known]),
+        minlength=len(stores) * 24,
+    ).reshape(len(stores), 24)
+    store_totals = hourly_sales.sum(axis=1, keepdims=True)
+    hourly_shares = np.divide(hourly_sales * 100, store_totals, out=np.zeros_like(hourly_sales), where=store_totals > 0)
+    hourly = pd.DataFrame({
+        'storeName': pd.Categorical(np.repeat(stores, 24), categories=stores),
+        'hour': np.tile(np.arange(24), len(stores)),
+        'total_sales': hourly_sales.ravel(),
+        'share': hourly_shares.ravel(),
+    })
+
+    channel_mix = _shares(cube, 'orderType')
+
+    brands = _shares(cube, 'brandName').sort_values(['storeName', 'total_sales'], ascending=[True, False])
+    top_brands = brands.groupby('storeName', observed=True).head(n_brands).reset_index(drop=True)
+    top_brands['rank'] = top_brands.groupby('storeName', observed=True).cumcount() + 1
+
+    return StoreComparison(list(stores), summary, category_mix, hourly, channel_mix, top_brands)
+
+
+def default_comparison_stores(ctx):
+    """The selected store and the next stores in the list, until a comparison of three."""
+    others = [store for store in ctx.index.store_names if store != ctx.selected_store]
+    return [ctx.selected_store] + others[:2]
+
+
+def cached_store_comparison(ctx, stores):
+    """compute_store_comparison of `stores` over the selected range and filters, through the result cache."""
+    stores = list(stores)
+    return ctx.range_cached('store_comparison', lambda: compute_store_comparison(
+        pd.concat([ctx.filters.for_store(store).rows(ctx.cube_index) for store in stores]),
+        pd.concat([
+            ctx.filters.for_store(store).rows(ctx.index)[['storeName', 'time_seconds', 'totalProductPrice']]
+            for store in stores
+        ]),
+        stores,
+    ), tuple(stores), ctx.filters.channels, ctx.filters.categories)
+
+
+def _small_multiples(fig, n_stores, independent_y=False):
+    # One panel per store, titled by store name, all the same size
+    fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split('=', 1)[-1]))
+    if independent_y:
+        fig.update_yaxes(matches=None, showticklabels=True)
+    fig.update_layout(height=320 * math.ceil(n_stores / CHARTS_PER_ROW), showlegend=False)
+    return fig
+
+
+@st.fragment
+def render_store_comparison(ctx):
+    st.markdown("<h4 style='color: green; text-align: center;'>STORE COMPARISON</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+    controls = st.expander("Store Comparison Controls")
+
+    stores = controls.multiselect(
+        "Stores to compare:", list(ctx.index.store_names), default=default_comparison_stores(ctx),
+        max_selections=MAX_COMPARED_STORES, key="comparison_stores",
+    )
+    if len(stores) < 2:
+        st.info("Pick at least two stores to compare.")
+        return None
+
+    result = cached_store_comparison(ctx, stores)
+    # Every chart has one panel per store, in the order they were picked
+    facets = dict(facet_col='storeName', facet_col_wrap=CHARTS_PER_ROW)
+    store_order = {'storeName': stores}
+
+    st.dataframe(
+        result.summary,
+        hide_index=True,
+        column_config=column_config({'total_sales': AMOUNT, 'total_profit': AMOUNT, 'profit_margin': PERCENT}),
+    )
+
+    st.markdown("<h5 style='text-align: center;'>Category Mix (% of sales)</h5>", unsafe_allow_html=True)
+    category_order = result.category_mix.groupby('subCategoryOf')['total_sales'].sum().sort_values(ascending=False).index
+    fig_category = px.bar(
+        result.category_mix, x='share', y='subCategoryOf', orientation='h', color='subCategoryOf',
+        labels={'share': '% of sales', 'subCategoryOf': ''},
+        category_orders={**store_order, 'subCategoryOf': list(category_order)}, **facets,
+    )
+    st.plotly_chart(_small_multiples(fig_category, len(stores)), use_container_width=True)
+
+    st.markdown("<h5 style='text-align: center;'>Hourly Sales (% of the store's day)</h5>", unsafe_allow_html=True)
+    fig_hourly = px.line(result.hourly, x='hour', y='share', markers=True, labels={'share': '% of sales', 'hour': 'Hour'},
+                         category_orders=store_order, **facets)
+    st.plotly_chart(_small_multiples(fig_hourly, len(stores)), use_container_width=True)
+
+    st.markdown("<h5 style='text-align: center;'>Channel Mix (% of sales)</h5>", unsafe_allow_html=True)
+    fig_channel = px.bar(result.channel_mix, x='orderType', y='share', color='orderType', labels={'share': '% of sales', 'orderType': ''},
+                         category_orders=store_order, **facets)
+    st.plotly_chart(_small_multiples(fig_channel, len(stores)), use_container_width=True)
+
+    st.markdown(f"<h5 style='text-align: center;'>Top {COMPARISON_TOP_BRANDS} Brands</h5>", unsafe_allow_html=True)
+    fig_brands = px.bar(
+        result.top_brands, x='total_sales', y='brandName', orientation='h',
+        labels={'total_sales': 'Total Sales', 'brandName': ''}, category_orders=store_order, **facets,
+    )
+    fig_brands.update_yaxes(autorange='reversed')
+    st.plotly_chart(_small_multiples(fig_brands, len(stores), independent_y=True), use_container_width=True)
+
+    csv_download("Download Comparison Top Brands CSV", result.top_brands, "store_comparison_top_brands.csv", controls,
+                 scope=(ctx.selection_key, tuple(stores)))
+    return result
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, INTEGER, PERCENT, column_config
+
+
+@dataclass
+class StoreLeaderboard:
+    """Headline KPIs of every store with sales in a date range, one row per store, best revenue first."""
+    table: pd.DataFrame
+    channels: list
+
+
+def compute_store_leaderboard(store_totals, range_cube, daily_standard):
+    """Revenue, profit, margin, average daily sales, customer capture, channel mix and variance per store.
+
+    `store_totals` is KpiService.store_totals for the range and `range_cube` every store's cube cells
+    in it, grouped once for the channel mix. `daily_standard` is the average daily sales each store is
+    measured against: one figure, or a Series by store (peer group standards).
+    """
+    totals = store_totals[store_totals['lines'] > 0]
+
+    table = pd.DataFrame({
+        'Revenue': totals['revenue'],
+        'Profit': totals['revenue'] - totals['cost'],
+        'Orders': totals['orders'],
+        'Average Daily Sales': totals['revenue'] / totals['active_days'],
+        'Customer Capture': totals['customers'] / totals['lines'] * 100,
+    })
+    table['Margin'] = (table['Profit'] / table['Revenue'].replace(0, np.nan) * 100).fillna(0)
+
+    standard = daily_standard.reindex(table.index) if isinstance(daily_standard, pd.Series) else daily_standard
+    table['Daily Standard'] = standard
+    table['Variance'] = (table['Average Daily Sales'] - table['Daily Standard']) / table['Daily Standard'].replace(0, np.nan) * 100
+
+    # Share of each channel in the store's sales, one column per channel, from one bincount over (store, channel)
+    store_codes, stores = pd.factorize(range_cube['storeName'])
+    channel_codes, channels = pd.factorize(range_cube['orderType'], sort=True)
+    valid = (store_codes >= 0) & (channel_codes >= 0)
+    channel_sales = np.bincount(
+        store_codes[valid] * len(channels) + channel_codes[valid],
+        weights=np.nan_to_num(range_cube['totalProductPrice'].to_numpy(dtype=np.float64)[valid]),
+        minlength=len(stores) * len(channels),
+    ).reshape(len(stores), len(channels))
+    channel_mix = pd.DataFrame(channel_sales, index=np.asarray(stores), columns=[f"{channel} %" for channel in channels])
+    channel_mix = channel_mix.div(channel_mix.sum(axis=1).replace(0, np.nan), axis=0) * 100
+    table = table.join(channel_mix.reindex(table.index).fillna(0))
+
+    table = table.sort_values('Revenue', ascending=False)
+    table.insert(0, 'Rank', np.arange(1, len(table) + 1))
+    return StoreLeaderboard(table.rename_axis('storeName').reset_index(), list(channel_mix.columns))
+
+
+def daily_standards(ctx):
+    """Average daily sales each store is compared against under the selected standards."""
+    if ctx.standards != 'peers':
+        return ctx.average_daily_sales
+
+    groups = ctx.peer_groups
+    company = np.nan_to_num(ctx.kpis.period_average(None, ctx.start_date, ctx.end_date, 'day'))
+    standards = pd.Series(company, index=ctx.kpis.stores)
+    for group in np.unique(groups.labels):
+        peers = list(groups.stores[groups.labels == group])
+        standards[peers] = np.nan_to_num(ctx.kpis.period_average(peers, ctx.start_date, ctx.end_date, 'day'))
+    return standards
+
+
+def cached_store_leaderboard(ctx):
+    """compute_store_leaderboard of the selected range, shared by whichever store is selected."""
+    params = (ctx.standards, ctx.n_peer_groups) if ctx.standards == 'peers' else (ctx.standards,)
+    return ctx.range_cached('store_leaderboard', lambda: compute_store_leaderboard(
+        ctx.kpis.store_totals(ctx.start_date, ctx.end_date),
+        ctx.cube_index.date_rows(ctx.start_date, ctx.end_date),
+        daily_standards(ctx),
+    ), *params)
+
+
+def render_store_leaderboard(ctx):
+    # Not a fragment: picking a store changes the whole page
+    st.markdown("<h4 style='color: green; text-align: center;'>Store Leaderboard</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+
+    result = cached_store_leaderboard(ctx)
+    table = result.table
+    if table.empty:
+        st.warning("No store has sales in the selected date range.")
+        return None
+
+    st.caption(
+        f"{len(table)} stores, {ctx.start_date.date()} to {ctx.end_date.date()}. "
+        "Click a column header to sort; select a row to open that store below."
+    )
+
+    def open_store():
+        rows = st.session_state['store_leaderboard'].selection.rows
+        if rows:
+            st.session_state['store_selector'] = table['storeName'].iloc[rows[0]]
+
+    formats = {
+        'Revenue': AMOUNT, 'Profit': AMOUNT, 'Orders': INTEGER,
+        'Average Daily Sales': AMOUNT, 'Daily Standard': AMOUNT,
+        'Customer Capture': PERCENT, 'Margin': PERCENT, 'Variance': PERCENT,
+        **{channel: PERCENT for channel in result.channels},
+    }
+    st.dataframe(
+        table,
+        key='store_leaderboard',
+        on_select=open_store,
+        selection_mode='single-row',
+        hide_index=True,
+        column_config=column_config(formats),
+    )
+
+    csv_download(
+        "Download Store Leaderboard CSV", table, "store_leaderboard.csv",
+        scope=(ctx.dataset_key, ctx.start_date, ctx.end_date, ctx.standards, ctx.n_peer_groups),
+    )
+    return table
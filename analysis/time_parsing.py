@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Supported time-of-day layouts: (name, pattern matched against the raw text, to_datetime format).
+# Patterns capture the pieces needed to rebuild a canonical string for their format.
+TIME_FORMATS = [
+    # ISO timestamps or bare times with fractional seconds and a UTC marker, e.g. 2024-05-01T13:45:12.000Z
+    ('iso', r'^(?:\d{4}-\d{2}-\d{2}[T ])?(\d{1,2}:\d{2}:\d{2})(?:\.\d+)?\s*(?:Z|GMT)$', '%H:%M:%S'),
+    ('hh:mm:ss', r'^(\d{1,2}:\d{2}:\d{2})(?:\.\d+)?$', '%H:%M:%S'),
+    ('hh:mm', r'^(\d{1,2}:\d{2})$', '%H:%M'),
+    # 12-hour clock with or without seconds, e.g. 1:05 PM, 01:05:09pm
+    ('12-hour', r'^(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])$', '%I:%M:%S %p'),
+    # Compact HHMMSS / HHMM; exports that went through a spreadsheet may have lost the leading zero
+    ('hhmmss', r'^(\d{5,6})$', '%H%M%S'),
+    ('hhmm', r'^(\d{3,4})$', '%H%M'),
+]
+
+
+def _canonical_text(name, parts):
+    if name == '12-hour':
+        return parts[0] + ':' + parts[1] + ':' + parts[2].fillna('00') + ' ' + parts[3].str.upper()
+    if name == 'hhmmss':
+        return parts[0].str.zfill(6)
+    if name == 'hhmm':
+        return parts[0].str.zfill(4)
+    return parts[0]
+
+
+def _parse_distinct(values):
+    """Seconds since midnight for an array of distinct strings (float, NaN where unparseable)."""
+    text = pd.Series(values, dtype=object).astype(str).str.strip()
+    seconds = np.full(len(text), np.nan)
+    unmatched = np.ones(len(text), dtype=bool)
+
+    for name, pattern, fmt in TIME_FORMATS:
+        candidates = text[unmatched]
+        parts = candidates.str.extract(pattern)
+        matched = parts[0].notna()
+        if not matched.any():
+            continue
+
+        parsed = pd.to_datetime(_canonical_text(name, parts[matched]), format=fmt, errors='coerce')
+        positions = matched.index[matched]
+        seconds[positions] = (parsed.dt.hour * 3600 + parsed.dt.minute * 60 + parsed.dt.second).to_numpy(dtype=float, na_value=np.nan)
+        unmatched[positions] = False
+
+        if not unmatched.any():
+            break
+
+    return seconds
+
+
+def parse_time_of_day(values):
+    """Parse a column of time-of-day strings into integer seconds since midnight.
+
+    Every distinct value is classified by regex and each format group is converted with a
+    single to_datetime call, so the cost scales with the number of distinct times rather
+    than the number of rows. Unparseable values come back as <NA>.
+    """
+    values = pd.Series(values)
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+
+    # Append a NaN slot so missing values (code -1) map onto it
+    distinct_seconds = np.append(_parse_distinct(uniques), np.nan)
+    return pd.Series(distinct_seconds[codes], index=values.index).astype('Int32')
+
+
+def hour_of_day(time_seconds):
+    """Hour (0-23) from a seconds-since-midnight column."""
+    return time_seconds // 3600
@@ -1,196 +1,186 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
 
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, INTEGER, PERCENT, RUPEE_AMOUNT, labels, styled
 
-def time_slot_analysis(store_data, all_data):
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
-    st.markdown("<h4 style='color: green; text-align: center;'>⏰ TIME SLOT ANALYSIS</h4>", unsafe_allow_html=True)
-    st.markdown("<hr style='border-top: 2px solid #bbb;'>", unsafe_allow_html=True)
 
-    results = {
-        'charts': {},
-        'dataframes': {},
-        'kpis': {}
-    }
+@dataclass
+class TimeSlotSales:
+    """Sales of one store by hour of day, by date and by day of week."""
+    hourly: pd.DataFrame
+    daily: pd.DataFrame
+    weekday: pd.DataFrame
 
-    with st.sidebar:
-        store_names = store_data['storeName'].unique()
-        selected_store = st.selectbox("Select a Store:", store_names, key="store_selector_time")
-        results['selected_store'] = selected_store
 
-        time_plot_type = st.selectbox("Select Plot Type for Time Slot Analysis:", ["Bar Chart", "Line Chart"], index=0, key="plot_type_time")
-        sort_order = st.selectbox("Select Sorting Order:", ["Ascending", "Descending"], key="sort_order_time")
+def _float64_measures(store_rows, **columns):
+    # Sum in float64 like the cube; prices rounded to paise first recover the values float32 approximated
+    return store_rows.assign(
+        totalProductPrice=store_rows['totalProductPrice'].astype('float64').round(2),
+        line_cost=store_rows['line_cost'].astype('float64').round(2),
+        quantity=store_rows['quantity'].astype('float64'),
+        **columns,
+    )
 
-        color_options_time = px.colors.named_colorscales()
-        selected_color_time = st.selectbox("Select Color Scale for Time Slot Plot:", color_options_time, key="color_scale_time")
-        show_data_labels_time = st.checkbox("Show Data Labels for Time Slot Analysis", value=True, key="show_data_labels_time")
 
-    def parse_time_robust(time_str):
-        if pd.isna(time_str):
-            return None
-        
-        time_str = str(time_str).strip()
+def compute_hourly_sales(store_rows, hour, company_benchmark):
+    """Sales, cost, quantity and profit per hour of day, with each hour's share against the 'hourly' Benchmark."""
+    sales_by_hour = _float64_measures(store_rows, hour=hour).groupby('hour').agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
+        total_quantity=('quantity', 'sum'),
+    ).reset_index()
 
-        # Remove timezone (.00Z or other formats) and milliseconds
-        if '.' in time_str:
-            time_str = time_str.split('.')[0]
-        
-        # Remove any potential timezone markers like 'Z', 'GMT', etc.
-        time_str = time_str.replace('Z', '').replace('GMT', '').strip()
-
-        # List of possible time formats to handle different time representations
-        time_formats = [
-            '%H:%M:%S',
-            '%H:%M',
-            '%I:%M:%S %p',
-            '%I:%M %p',
-            '%H%M%S',
-            '%H%M'
-        ]
-
-        # Try parsing the time with each format
-        for fmt in time_formats:
-            try:
-                parsed_time = datetime.strptime(time_str, fmt)
-                return parsed_time.time()
-            except ValueError:
-                continue
-        
-        return None
+    # Round total_sales, total_cost_price, and total_profit to 2 decimals
+    sales_by_hour['total_sales'] = sales_by_hour['total_sales'].round(2)
+    sales_by_hour['total_cost_price'] = sales_by_hour['total_cost_price'].round(2)
+    sales_by_hour['total_profit'] = (sales_by_hour['total_sales'] - sales_by_hour['total_cost_price']).round(2)
 
-    try:
-        # Apply the robust time parsing function to the 'time' column
-        store_data['parsed_time'] = store_data['time'].apply(parse_time_robust)
-        
-        # Convert the parsed time to a datetime object for further processing
-        store_data['time'] = pd.to_datetime(store_data['parsed_time'].astype(str), format='%H:%M:%S', errors='coerce')
-        
-        # Drop the 'parsed_time' column since it's no longer needed
-        store_data = store_data.drop('parsed_time', axis=1)
+    # Contribution percentage of each hour's sales to the total sales of the selected store
+    sales_by_hour['contribution'] = (sales_by_hour['total_sales'] / sales_by_hour['total_sales'].sum()) * 100
 
-        # Extract the hour from the 'time' column
-        store_data['hour'] = store_data['time'].dt.hour
+    sales_by_hour['hour'] = sales_by_hour['hour'].astype(int)
 
-        # Check if parsed time is valid
-        if store_data['time'].isnull().all():
-            st.warning("No valid time data available for the selected store.")
-            return results
+    # Company standard share of each hour
+    sales_by_hour['Company Standard'] = company_benchmark.standard_for(sales_by_hour['hour'])
+    sales_by_hour['hour_24'] = sales_by_hour['hour']
 
-        # Check for NaN in storeName column
-        store_data = store_data.dropna(subset=['storeName'])
+    # Variance calculation
+    sales_by_hour['variance'] = (sales_by_hour['contribution'] - sales_by_hour['Company Standard'])/sales_by_hour['Company Standard']
+    return sales_by_hour
 
-        # Filter data for the selected store
-        store_data_filtered = store_data[store_data['storeName'] == selected_store]
-        
-        # Check if filtered data is empty
-        if store_data_filtered.empty:
-            st.warning(f"No data available for the selected store: {selected_store}.")
-            return results
 
-        # Continue with the analysis after ensuring valid data is available
-        store_data_filtered['orderDate'] = pd.to_datetime(store_data_filtered['orderDate'], errors='coerce')
+def compute_daily_sales(store_rows, company_daily_sales, company_revenue):
+    """Sales, cost, quantity and profit per date, with the store's and the company's share of each day."""
+    sales_over_time = _float64_measures(store_rows).groupby('orderDate').agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
+        total_quantity=('quantity', 'sum'),
+    ).round({'total_sales': 2, 'total_cost_price': 2}).reset_index()
 
-    except Exception as e:
-        st.error(f"Error in time parsing or filtering: {str(e)}")
-        return results
+    sales_over_time['total_profit'] = (sales_over_time['total_sales'] - sales_over_time['total_cost_price']).round(2)
 
-    # Check if valid time data is available after parsing
-    if store_data['time'].isnull().all():
-        st.warning("No valid time data available for the selected store.")
-        return results
+    # Contribution percentage of each day's sales to the total sales of the selected store
+    sales_over_time['contribution'] = (sales_over_time['total_sales'] / sales_over_time['total_sales'].sum()) * 100
 
-    # Filter data for the selected store
-    store_data_filtered = store_data[store_data['storeName'] == selected_store]
+    daily_sales_all_data = company_daily_sales.rename('total_sales_all').reset_index()
+    sales_over_time = sales_over_time.merge(daily_sales_all_data, on='orderDate', suffixes=('', '_all'), how='left')
 
-    # Check if any data is available for the selected store
-    if store_data_filtered.empty:
-        st.warning("No data available for the selected store.")
-        return results
+    # Now calculate contribution to the entire dataset (all_data)
+    sales_over_time['Company Standard'] = (sales_over_time['total_sales_all'] / company_revenue) * 100
+    return sales_over_time
 
-    # Continue with the analysis after ensuring valid data is available
-    store_data_filtered['orderDate'] = pd.to_datetime(store_data_filtered['orderDate'], errors='coerce')
 
+def compute_weekday_sales(store_rows, day_of_week):
+    """Sales, cost, quantity, profit and share of sales per day of week, Monday first."""
+    weekly_sales = _float64_measures(store_rows, day_of_week=day_of_week).groupby('day_of_week').agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
+        total_quantity=('quantity', 'sum'),
+    ).round({'total_sales': 2, 'total_cost_price': 2}).reset_index()
 
+    weekly_sales['day_of_week'] = pd.Categorical(weekly_sales['day_of_week'], categories=DAYS_ORDER, ordered=True)
+    weekly_sales_sorted = weekly_sales.sort_values('day_of_week')
 
-    # ---- Hourly Sales Analysis ----
-    st.markdown("<h4 style='color: green; text-align: center;'>Hourly Sales</h4>", unsafe_allow_html=True)
+    weekly_sales_sorted['total_profit'] = (weekly_sales_sorted['total_sales'] - weekly_sales_sorted['total_cost_price']).round(2)
 
-    if store_data_filtered['time'].isnull().all():
-        st.warning("No valid time data available for the selected store.")
-        return results
+    total_store_sales = weekly_sales_sorted['total_sales'].sum()
+    weekly_sales_sorted['sales_contribution'] = (weekly_sales_sorted['total_sales'] / total_store_sales) * 100
+    return weekly_sales_sorted
 
-    store_data_filtered['hour'] = store_data_filtered['time'].dt.hour
 
-    sales_by_hour = store_data_filtered.groupby('hour').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_cost_price=('costPrice', lambda x: (x * store_data_filtered.loc[x.index, 'quantity']).sum()),
-        total_quantity=('quantity', 'sum'),
-    ).reset_index()
+def compute_time_slot_sales(store_rows, hour, day_of_week, company_daily_sales, company_revenue, hourly_benchmark):
+    """Hourly, daily and weekday sales of one store's line items.
 
-    # Round total_sales, total_cost_price, and total_profit to 2 decimals
-    sales_by_hour['total_sales'] = sales_by_hour['total_sales'].round(2)
-    sales_by_hour['total_cost_price'] = sales_by_hour['total_cost_price'].round(2)
-    sales_by_hour['total_profit'] = (sales_by_hour['total_sales'] - sales_by_hour['total_cost_price']).round(2)
+    `hour` and `day_of_week` are aligned with `store_rows` (see AnalysisContext.store_hour and
+    store_rows_calendar); `company_daily_sales` is the whole dataset's sales per orderDate.
+    """
+    return TimeSlotSales(
+        hourly=compute_hourly_sales(store_rows, hour, hourly_benchmark),
+        daily=compute_daily_sales(store_rows, company_daily_sales, company_revenue),
+        weekday=compute_weekday_sales(store_rows, day_of_week),
+    )
 
-    if sales_by_hour.empty:
-        st.warning("No sales data available for the selected store in this time range.")
-        return results
 
-    # Calculate the total sales for the selected store
-    store_total_sales = sales_by_hour['total_sales'].sum()
+def cached_time_slot_sales(ctx):
+    """compute_time_slot_sales of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('hourly')
+    return ctx.cached('time_slot_sales', lambda: compute_time_slot_sales(
+        ctx.store_rows,
+        ctx.store_hour,
+        ctx.store_rows_calendar['day_of_week'],
+        ctx.company_totals('orderDate')['totalProductPrice'],
+        ctx.company_revenue,
+        benchmark,
+    ), benchmark.version)
 
-    # Load company benchmark data
-    company_benchmark = pd.read_csv('./company_bechmark/hourly_sales_benchmark.csv')
 
-    # Contribution percentage of each hour's sales to the total sales of the selected store
-    sales_by_hour['contribution'] = (sales_by_hour['total_sales'] / store_total_sales) * 100
+@st.fragment
+def render_time_slot_analysis(ctx):
+    store_data = ctx.store_rows
+
+    st.markdown("<h4 style='color: green; text-align: center;'>⏰ TIME SLOT ANALYSIS</h4>", unsafe_allow_html=True)
+    st.markdown("<hr style='border-top: 2px solid #bbb;'>", unsafe_allow_html=True)
+    controls = st.expander("Time Slot Analysis Options")
+
+    results = {
+        'charts': {},
+        'dataframes': {},
+        'kpis': {}
+    }
 
+    with controls:
+        results['selected_store'] = ctx.selected_store
 
-    all_data['time'] = pd.to_datetime(all_data['time'], errors='coerce')
-    all_data['hour'] = all_data['time'].dt.hour
+        time_plot_type = st.selectbox("Select Plot Type for Time Slot Analysis:", ["Bar Chart", "Line Chart"], index=0, key="plot_type_time")
+        sort_order = st.selectbox("Select Sorting Order:", ["Ascending", "Descending"], key="sort_order_time")
 
-   # Group entire dataset by hour for all stores
-    # sales_by_hour_all_stores = all_data.groupby('hour').agg(
-    #     total_sales_all=('totalProductPrice', 'sum')
-    # ).reset_index()
+        color_options_time = px.colors.named_colorscales()
+        selected_color_time = st.selectbox("Select Color Scale for Time Slot Plot:", color_options_time, key="color_scale_time")
+        show_data_labels_time = st.checkbox("Show Data Labels for Time Slot Analysis", value=True, key="show_data_labels_time")
 
-    # # Calculate total sales for all stores
-    # total_sales_all_stores = all_data['totalProductPrice'].sum()
+    # time_seconds is parsed once at ingestion, so there is nothing to re-parse here
+    if 'time_seconds' not in store_data.columns or store_data['time_seconds'].isna().all():
+        st.warning("No valid time data available for the selected store.")
+        return results
 
-    # # Calculate the contribution of each hour's sales to the total sales of all stores
-    # sales_by_hour_all_stores['Company Standard'] = (sales_by_hour_all_stores['total_sales_all'] / total_sales_all_stores) * 100
-    company_benchmark['hour_24'] = pd.to_datetime(company_benchmark['hour'], format='%I:%M %p').dt.hour
+    # ctx.store_rows already holds just the selected store
+    store_data_filtered = store_data
 
+    # Check if any data is available for the selected store
+    if store_data_filtered.empty:
+        st.warning(f"No data available for the selected store: {ctx.selected_store}.")
+        return results
 
-    sales_by_hour['hour'] = sales_by_hour['hour'].astype(int)
 
-    # Merge store-specific and total sales data on the hour
-    sales_by_hour = pd.merge(sales_by_hour, company_benchmark, left_on='hour', right_on='hour_24', how='left')
+    # ---- Hourly Sales Analysis ----
+    st.markdown("<h4 style='color: green; text-align: center;'>Hourly Sales</h4>", unsafe_allow_html=True)
 
-    # Variance calculation
-    sales_by_hour['variance'] = (sales_by_hour['contribution'] - sales_by_hour['Company Standard'])/sales_by_hour['Company Standard']
+    if store_data_filtered['time_seconds'].isna().all():
+        st.warning("No valid time data available for the selected store.")
+        return results
 
-        # Round and format contributions, company standard, and variance
-    sales_by_hour['contribution'] = sales_by_hour['contribution'].round(2).astype(str) + '%'
-    sales_by_hour['Company Standard'] = sales_by_hour['Company Standard'].round(2).astype(str) + '%'
-    sales_by_hour['variance'] = sales_by_hour['variance'].round(2).astype(str) + '%'
+    result = cached_time_slot_sales(ctx)
 
-    # Round total_sales, total_cost_price, total_profit to 2 decimals for display
-    sales_by_hour['total_sales'] = sales_by_hour['total_sales'].map("{:.2f}".format)
-    sales_by_hour['total_cost_price'] = sales_by_hour['total_cost_price'].map("{:.2f}".format)
-    sales_by_hour['total_profit'] = sales_by_hour['total_profit'].map("{:.2f}".format)
+    sales_by_hour = result.hourly
 
+    if sales_by_hour.empty:
+        st.warning("No sales data available for the selected store in this time range.")
+        return results
 
     sales_by_hour['hour_12'] = sales_by_hour['hour_24'].apply(lambda x: f"{x % 12 or 12} {'AM' if x < 12 else 'PM'}")
 
-    hour_plot_type = st.sidebar.selectbox("Select Plot Type for Hourly Sales Analysis:", ["Line Chart", "Bar Chart"], index=1, key="hour_plot_type")
+    hour_plot_type = controls.selectbox("Select Plot Type for Hourly Sales Analysis:", ["Line Chart", "Bar Chart"], index=1, key="hour_plot_type")
 
-    selected_hour_color = st.sidebar.selectbox("Select Color Scale for Hourly Plot:", color_options_time, key="hour_color_scale")
+    selected_hour_color = controls.selectbox("Select Color Scale for Hourly Plot:", color_options_time, key="hour_color_scale")
 
-    show_data_labels_hour = st.sidebar.checkbox("Show Data Labels for Hourly Sales Analysis", value=True, key="show_data_labels_hour")
+    show_data_labels_hour = controls.checkbox("Show Data Labels for Hourly Sales Analysis", value=True, key="show_data_labels_hour")
 
     # Create the plot based on the selected type for Hourly Sales Analysis
     if hour_plot_type == "Line Chart":
@@ -198,7 +188,7 @@ def time_slot_analysis(store_data, all_data):
             sales_by_hour,
             x='hour_12',  # Use the new hour_12 column
             y='total_sales',
-            title='Total Sales by Hour for ' + selected_store,
+            title='Total Sales by Hour for ' + ctx.selected_store,
             labels={'total_sales': 'Total Sales', 'hour_12': 'Hour'},
             line_shape='linear'
         )
@@ -216,7 +206,7 @@ def time_slot_analysis(store_data, all_data):
                 x=sales_by_hour['hour_12'],
                 y=sales_by_hour['total_sales'],
                 mode='text',
-                text=sales_by_hour['total_sales'],
+                text=labels(sales_by_hour['total_sales'], AMOUNT),
                 textposition='top center'
             )
 
@@ -225,7 +215,7 @@ def time_slot_analysis(store_data, all_data):
             sales_by_hour,
             x='hour_12', 
             y='total_sales',
-            title='Total Sales by Hour for ' + selected_store,
+            title='Total Sales by Hour for ' + ctx.selected_store,
             labels={'total_sales': 'Total Sales', 'hour_12': 'Hour'},
             color='total_sales',
             color_continuous_scale=selected_hour_color
@@ -252,31 +242,21 @@ def time_slot_analysis(store_data, all_data):
     sales_by_hour_display = sales_by_hour[['hour_12', 'hour_24', 'total_sales', 'total_cost_price','total_quantity', 'total_profit', 'contribution', 'Company Standard', 'variance']]
 
     # Display the DataFrame with conditional formatting
-    st.table(sales_by_hour_display.style.applymap(lambda x: 'color: red' if isinstance(x, str) and x.endswith('%') and float(x[:-1]) < 0 else '', subset=['variance']))
+    st.table(styled(
+        sales_by_hour_display,
+        {'total_sales': AMOUNT, 'total_cost_price': AMOUNT, 'total_profit': AMOUNT, 'total_quantity': INTEGER,
+         'contribution': PERCENT, 'Company Standard': PERCENT, 'variance': PERCENT},
+        negative=['variance'],
+    ))
     
 
 
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_hourly = convert_df(sales_by_hour_display)
-
-    st.sidebar.download_button(
-            label="Download Hourly Sales Data",
-            data=csv_hourly,   
-            file_name='hourly_sales.csv',
-            mime='text/csv',
-        )
+    csv_download("Download Hourly Sales Data", sales_by_hour_display, 'hourly_sales.csv', controls, scope=ctx.selection_key)
 
     # Create comparison DataFrame with percentages
     comparison_data = sales_by_hour[['hour_12', 'contribution', 'Company Standard']].copy()
     comparison_data.set_index('hour_12', inplace=True)
 
-    # Convert contribution and Company Standard from strings to float for correct plotting
-    comparison_data['contribution'] = comparison_data['contribution'].str.replace('%', '').astype(float)
-    comparison_data['Company Standard'] = comparison_data['Company Standard'].str.replace('%', '').astype(float)
-
     # Create an empty figure
     comparison_fig = go.Figure()
 
@@ -321,34 +301,13 @@ def time_slot_analysis(store_data, all_data):
 
 
 
-    sales_over_time = store_data_filtered.groupby('orderDate').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_cost_price=('costPrice', lambda x: (x * store_data_filtered.loc[x.index, 'quantity']).sum()),
-        total_quantity=('quantity', 'sum'),
-    ).reset_index()
-
-    sales_over_time['total_profit'] = sales_over_time['total_sales'] - sales_over_time['total_cost_price']
+    sales_over_time = result.daily
 
     # Calculate total values for percentage contribution
     total_sales_sum = sales_over_time['total_sales'].sum()
     total_cost_price_sum = sales_over_time['total_cost_price'].sum()
     total_quantity_sum = sales_over_time['total_quantity'].sum()
 
-    # Contribution percentage of each day's sales to the total sales of the selected store
-    sales_over_time['contribution'] = (sales_over_time['total_sales'] / total_sales_sum) * 100
-
-
-    all_data['orderDate'] = pd.to_datetime(all_data['orderDate'], errors='coerce')
-    daily_sales_all_data = all_data.groupby('orderDate').agg(
-        total_sales_all=('totalProductPrice', 'sum')
-    ).reset_index()
-
-    sales_over_time = sales_over_time.merge(daily_sales_all_data, on='orderDate', suffixes=('', '_all'), how='left')
-
-    # Now calculate contribution to the entire dataset (all_data)
-    total_sales_all_data = all_data['totalProductPrice'].sum()
-    sales_over_time['Company Standard'] = (sales_over_time['total_sales_all'] / total_sales_all_data) * 100
-
     # Sort the data based on the selected order for the plot
     if sort_order == "Descending":
         sales_over_time_sorted = sales_over_time.sort_values(by='total_sales', ascending=False)
@@ -420,8 +379,8 @@ def time_slot_analysis(store_data, all_data):
     results['charts']['daily_sales'] = fig_time
     results['dataframes']['daily_sales'] = sales_over_time_sorted
 
-    # Calculate average daily sales across all data
-    average_daily_sales_all = 42358
+    # Company average of a store's daily sales (live or the fixed standard, see AnalysisContext)
+    average_daily_sales_all = ctx.average_daily_sales
 
     # Calculate average daily sales for the selected store
     average_daily_sales_selected_store = sales_over_time['total_sales'].mean()
@@ -453,46 +412,20 @@ def time_slot_analysis(store_data, all_data):
 
 
     
-    # Format the DataFrame to include percentage symbols
-    sales_over_time_sorted['contribution'] = sales_over_time_sorted['contribution'].round(2).astype(str) + '%'
-    sales_over_time_sorted['Company Standard'] = sales_over_time_sorted['Company Standard'].round(2).astype(str) + '%'
-
-    # Convert percentage strings back to floats for variance calculation
-    sales_over_time_sorted['contribution_float'] = sales_over_time_sorted['contribution'].str.replace('%', '').astype(float) / 100
-    sales_over_time_sorted['Company Standard_float'] = sales_over_time_sorted['Company Standard'].str.replace('%', '').astype(float) / 100
+    # Difference between the store's and the company's share of each day, in percentage points
+    sales_over_time_sorted['difference'] = sales_over_time_sorted['contribution'] - sales_over_time_sorted['Company Standard']
 
-    # Calculate variance using the float columns
-    sales_over_time_sorted['difference'] = sales_over_time_sorted['contribution_float'] - sales_over_time_sorted['Company Standard_float']
-
-    # Format the variance to include percentage symbol
-    sales_over_time_sorted['difference'] = (sales_over_time_sorted['difference'] * 100).round(2).astype(str) + '%'
-
-        # Apply conditional formatting for variance
-    def highlight_negative(val):
-        # Check if the value is a string and convert it to float for comparison
-        if isinstance(val, str) and '%' in val:
-            return 'color: red' if float(val.replace('%', '')) < 0 else 'color: black'
-        else:
-            return 'color: black'
-
-        # Drop the unwanted columns before displaying
-    sales_display = sales_over_time_sorted.drop(columns=['contribution_float', 'Company Standard_float', 'total_sales_all'])
-
-    sales_display['total_sales'] = sales_display['total_sales'].apply(lambda x: f"{x:.2f}")
-    sales_display['total_cost_price'] = sales_display['total_cost_price'].apply(lambda x: f"{x:.2f}")
-    sales_display['total_profit'] = sales_display['total_profit'].apply(lambda x: f"{x:.2f}")
-
-    st.table(sales_display.drop(columns = ['Company Standard', 'difference']))
+    # Drop the unwanted columns before displaying
+    sales_display = sales_over_time_sorted.drop(columns=['total_sales_all', 'Company Standard', 'difference'])
 
+    st.table(styled(
+        sales_display,
+        {'total_sales': AMOUNT, 'total_cost_price': AMOUNT, 'total_profit': AMOUNT, 'total_quantity': INTEGER,
+         'contribution': PERCENT},
+    ))
 
-    csv_daily = convert_df(sales_over_time_sorted.drop(columns=["contribution_float", "Company Standard_float", "total_sales_all"]))
 
-    st.sidebar.download_button(
-            label="Download Daily Sales Data",
-            data=csv_daily,   
-            file_name='daily_sales.csv',
-            mime='text/csv',
-        )
+    csv_download("Download Daily Sales Data", sales_over_time_sorted.drop(columns=["total_sales_all"]), 'daily_sales.csv', controls, scope=ctx.selection_key)
     # Calculate and display total sums for sales, cost price, quantity, and profit
     total_profit_sum = sales_over_time['total_profit'].sum()
 
@@ -545,53 +478,27 @@ def time_slot_analysis(store_data, all_data):
     st.markdown("<h4 style='color: green; text-align: center;'>WEEKLY SALES ANALYSIS</h4>", unsafe_allow_html=True)
     st.markdown("---")
 
-    # Add a new column for the day of the week
-    store_data_filtered['day_of_week'] = store_data_filtered['orderDate'].dt.day_name()
-
-    weekly_sales = store_data_filtered.groupby('day_of_week').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_cost_price=('costPrice', lambda x: (x * store_data_filtered.loc[x.index, 'quantity']).sum()),
-        total_quantity=('quantity', 'sum'),
-    ).reset_index()
-
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    weekly_sales['day_of_week'] = pd.Categorical(weekly_sales['day_of_week'], categories=days_order, ordered=True)
-    weekly_sales_sorted = weekly_sales.sort_values('day_of_week')
-
-    weekly_sales_sorted['total_profit'] = weekly_sales_sorted['total_sales'] - weekly_sales_sorted['total_cost_price']
-
-    total_store_sales = weekly_sales_sorted['total_sales'].sum()
-    weekly_sales_sorted['sales_contribution'] = (weekly_sales_sorted['total_sales'] / total_store_sales) * 100
-
-    display_df = weekly_sales_sorted.copy()
-
-
-    display_df['sales_contribution'] = display_df['sales_contribution'].round(2).astype(str) + '%'
-    display_df['total_sales'] = display_df['total_sales'].apply(lambda x: f"₹{x:,.2f}")
-    display_df['total_cost_price'] = display_df['total_cost_price'].apply(lambda x: f"₹{x:,.2f}")
-    display_df['total_profit'] = display_df['total_profit'].apply(lambda x: f"₹{x:,.2f}")
-    display_df['total_quantity'] = display_df['total_quantity'].astype(int)
-
+    weekly_sales_sorted = result.weekday
 
     # Check if the weekly_sales_sorted DataFrame is empty
     if weekly_sales_sorted.empty:
         st.warning("No sales data available for the selected store in this week.")
         return results
 
-    # Sidebar inputs
-    st.sidebar.markdown("### Weekly Sales Analysis Settings")
+    # Inputs
+    controls.markdown("### Weekly Sales Analysis Settings")
 
     # User input for plot type for Weekly Sales Analysis (Pie Chart as default)
-    week_plot_type = st.sidebar.selectbox(
+    week_plot_type = controls.selectbox(
         "Select Plot Type for Weekly Sales Analysis:",
         ["Pie Chart", "Bar Chart", "Line Chart"],
         key="week_plot_type")
 
     # User input for color selection for weekly plots
-    selected_week_color = st.sidebar.selectbox("Select Color Scale for Weekly Plot:", color_options_time, key="week_color_scale")
+    selected_week_color = controls.selectbox("Select Color Scale for Weekly Plot:", color_options_time, key="week_color_scale")
 
     # User input to toggle data labels for Weekly Sales Analysis
-    show_data_labels_week = st.sidebar.checkbox("Show Data Labels for Weekly Sales Analysis", value=True, key="show_data_labels_week")
+    show_data_labels_week = controls.checkbox("Show Data Labels for Weekly Sales Analysis", value=True, key="show_data_labels_week")
 
 
     # Create the plot based on the selected type for Weekly Sales Analysis
@@ -600,7 +507,7 @@ def time_slot_analysis(store_data, all_data):
             weekly_sales_sorted,
             names='day_of_week',
             values='total_sales',
-            title='Total Sales by Day of the Week for ' + selected_store,
+            title='Total Sales by Day of the Week for ' + ctx.selected_store,
             hole=0.4 
         )
 
@@ -619,7 +526,7 @@ def time_slot_analysis(store_data, all_data):
             weekly_sales_sorted,  # Use the unformatted DataFrame
             x='day_of_week',
             y='total_sales',
-            title='Total Sales by Day of the Week for ' + selected_store,
+            title='Total Sales by Day of the Week for ' + ctx.selected_store,
             labels={'total_sales': 'Total Sales', 'day_of_week': 'Day of the Week'},
             color='total_sales',
             color_continuous_scale=selected_week_color 
@@ -632,7 +539,7 @@ def time_slot_analysis(store_data, all_data):
             weekly_sales_sorted,  # Use the unformatted DataFrame
             x='day_of_week',
             y='total_sales',
-            title='Total Sales by Day of the Week for ' + selected_store,
+            title='Total Sales by Day of the Week for ' + ctx.selected_store,
             labels={'total_sales': 'Total Sales', 'day_of_week': 'Day of the Week'},
             line_shape='linear'
         )
@@ -655,26 +562,16 @@ def time_slot_analysis(store_data, all_data):
     st.plotly_chart(fig_weekly)
     results['charts']['weekly_sales'] = fig_weekly
 
-    # Format percentage contribution with the '%' symbol and round to 2 decimal places
-    weekly_sales_sorted['sales_contribution'] = weekly_sales_sorted['sales_contribution'].apply(lambda x: f"{x:.2f}%")
-    weekly_sales_sorted['total_sales'] = weekly_sales_sorted['total_sales'].apply(lambda x: f"{x:,.2f}")
-    weekly_sales_sorted['total_cost_price'] = weekly_sales_sorted['total_cost_price'].apply(lambda x: f"{x:,.2f}")
-    weekly_sales_sorted['total_profit'] = weekly_sales_sorted['total_profit'].apply(lambda x: f"{x:,.2f}")
-
-
-    # Display the updated DataFrame with percentage change and percentage symbol
-    st.table(weekly_sales_sorted)
+    # Display the DataFrame with percentage contribution and thousands separators
+    st.table(styled(
+        weekly_sales_sorted,
+        {'total_sales': RUPEE_AMOUNT, 'total_cost_price': RUPEE_AMOUNT, 'total_profit': RUPEE_AMOUNT,
+         'total_quantity': INTEGER, 'sales_contribution': PERCENT},
+    ))
     results['dataframes']['weekly_sales'] = weekly_sales_sorted
 
-    csv_weekly = convert_df(weekly_sales_sorted)
 
-
-    st.sidebar.download_button(
-            label="Download weekly Data",
-            data=csv_weekly,   
-            file_name='weekly_sales.csv',
-            mime='text/csv',
-        )
+    csv_download("Download weekly Data", weekly_sales_sorted, 'weekly_sales.csv', controls, scope=ctx.selection_key)
 
 
 
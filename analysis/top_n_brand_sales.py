@@ -1,101 +1,157 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def top_n_brand_sales_analysis(store_data_filtered, all_data):
-    # ---- Top N Brand Sales Analysis ----
-    # st.markdown("<br><br><br><br><br><br><br><br><br><br><br><br><br>", unsafe_allow_html=True)
-    st.markdown("<h4 style='color: green; text-align: center;'>TOP-N BRAND ANALYSIS</h4>", unsafe_allow_html=True)
-    st.markdown("---")
-    # Sidebar components
-    st.sidebar.header("Top-N Brands Control Panel")
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, styled
+
+# Starting value of the top-N brands slider
+DEFAULT_TOP_BRANDS = 20
 
-    # Get unique brand names for selection
-    unique_brands = store_data_filtered['brandName'].unique()
-    # UI components to the sidebar
-    n_brands = st.sidebar.slider("Select the number of top brands to analyze:", min_value=1, max_value=len(unique_brands), value=20)
-    selected_brand_color = st.sidebar.selectbox("Select Color Scale for Brand Plot:", ['Viridis', 'Plasma', 'Inferno', 'Magma', 'Cividis'], key="brand_color_scale")
-    show_data_labels_brand = st.sidebar.checkbox("Show Data Labels for Top N Brand Sales Analysis", value=True, key="show_data_labels_brand")
-    chart_type = st.sidebar.selectbox("Select Chart Type:", ["Bar Chart", "Donut Chart", "Line Chart"], key="chart_type_selection")
-
-    brand_sales = store_data_filtered.groupby('brandName').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_quantity=('quantity', 'sum'),
-        total_cost_price_raw=('costPrice', 'sum') 
-    ).reset_index()
 
-    # Calculate the actual total cost price by multiplying costPrice with quantity
-    brand_sales['total_cost_price'] = store_data_filtered.groupby('brandName').apply(
-        lambda x: (x['costPrice'] * x['quantity']).sum()
-    ).values
+@dataclass
+class BrandSales:
+    """Brand sales of one store against the company-wide top brands and the brand benchmark."""
+    brand_sales: pd.DataFrame
+    top_brands: pd.DataFrame
+    top_brands_overall: pd.DataFrame
+    missing_top_brands: pd.DataFrame
+    quantity_comparison: pd.DataFrame
+    benchmark: pd.DataFrame
+    missing_benchmark_brands: pd.DataFrame
 
-    # Calculate total profit for each brand
-    brand_sales['total_profit'] = brand_sales['total_sales'] - brand_sales['total_cost_price']
+    def rag(self, status):
+        """Brands in one RAG band: 'Red' (< 100), 'Amber' (100 - 300) or 'Green' (> 300)."""
+        sales = self.brand_sales['total_sales']
+        mask = {'Red': sales < 100, 'Amber': (sales >= 100) & (sales <= 300), 'Green': sales > 300}[status]
+        return self.brand_sales[mask].assign(**{'RAG Status': status})
+
+
+def _merge_spellings(brand_frame, company_benchmark):
+    # One row per brand as the benchmark spells it: sums of e.g. 'Malboro' and 'Marlboro' rows together
+    return brand_frame.assign(brandName=company_benchmark.canonical(brand_frame['brandName'])).groupby(
+        'brandName'
+    ).sum().reset_index()
+
+
+def compute_brand_sales(store_cube, company_brands, company_benchmark, n_brands):
+    """Top `n_brands` of the store and of the company, missing brands and the benchmark comparison.
+
+    `company_brands` holds whole-dataset sums per brandName (see AnalysisContext.company_totals) and
+    `company_benchmark` is the 'brand' Benchmark; brand spellings it lists as one brand count as one.
+    """
+    brand_sales = _merge_spellings(store_cube.groupby('brandName', observed=True).agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_quantity=('quantity', 'sum'),
+        total_cost_price=('line_cost', 'sum'),
+        total_profit=('line_profit', 'sum'),
+    ).reset_index(), company_benchmark)
+    store_brands = brand_sales['brandName']
 
     # Sort brands by total sales and select top N
     top_n_brands = brand_sales.nlargest(n_brands, 'total_sales')
 
-    # Calculate total sales and total profit across all brands
-    total_sales_all = brand_sales['total_sales'].sum()
-    total_profit_all = brand_sales['total_profit'].sum()
-
     # Calculate percentage contributions for the selected store
-    top_n_brands['Contribution'] = (top_n_brands['total_sales'] / total_sales_all) * 100
-    top_n_brands['% Contribution Profit'] = (top_n_brands['total_profit'] / total_profit_all) * 100
+    top_n_brands['Contribution'] = (top_n_brands['total_sales'] / brand_sales['total_sales'].sum()) * 100
+    top_n_brands['% Contribution Profit'] = (top_n_brands['total_profit'] / brand_sales['total_profit'].sum()) * 100
 
     # Calculate total sales for the overall dataset
-    overall_brand_sales = all_data.groupby('brandName').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        quantity=('quantity', 'sum')
-    ).reset_index()
+    overall_brand_sales = _merge_spellings(
+        company_brands[['totalProductPrice', 'quantity']]
+        .rename(columns={'totalProductPrice': 'total_sales'})
+        .reset_index(),
+        company_benchmark,
+    )
+    top_n_brands = top_n_brands.merge(overall_brand_sales, on='brandName', suffixes=('', '_overall'))
+    top_n_brands['Company Standard'] = company_benchmark.standard_for(top_n_brands['brandName'])
 
-    top_n_brands = top_n_brands.merge(overall_brand_sales[['brandName', 'total_sales', 'quantity']], on='brandName', suffixes=('', '_overall'))
+    # Calculate variance in contribution percentage
+    top_n_brands['Variance'] = top_n_brands['Contribution'] - top_n_brands['Company Standard']
 
+    # Find missing top brands (present in overall top N but not in selected store)
     top_n_brands_overall = overall_brand_sales.nlargest(n_brands, 'total_sales')
+    in_store = top_n_brands_overall['brandName'].isin(store_brands)
+    missing_top_brands = top_n_brands_overall[~in_store][['brandName', 'total_sales', 'quantity']]
 
-    # Find missing top brands (present in overall top N but not in selected store)
-    missing_top_brands = top_n_brands_overall[
-        ~top_n_brands_overall['brandName'].isin(store_data_filtered['brandName'])
-    ][['brandName', 'total_sales', 'quantity']].copy()
+    # Store vs company quantity of each overall top brand, present ones first
+    present = top_n_brands_overall[in_store][['brandName', 'quantity']].merge(
+        brand_sales[['brandName', 'total_quantity']], on='brandName'
+    )
+    quantity_comparison = pd.concat([
+        pd.DataFrame({
+            'brandName': present['brandName'],
+            'store_sales_qty': present['total_quantity'],
+            'all_store_qty': present['quantity'],
+            'Status': 'Present',
+        }),
+        pd.DataFrame({
+            'brandName': missing_top_brands['brandName'],
+            'store_sales_qty': 0,
+            'all_store_qty': missing_top_brands['quantity'],
+            'Status': 'Missing',
+        }),
+    ], ignore_index=True)
+
+    # Benchmark brands among the store's top N, their share of the top N against the company standard
+    benchmark = top_n_brands[['brandName', 'total_sales', 'total_profit', 'total_quantity', 'total_cost_price']].copy()
+    benchmark['total_profit'] = benchmark['total_sales'] - benchmark['total_cost_price']
+    benchmark['Contribution'] = (benchmark['total_sales'] / benchmark['total_sales'].sum()) * 100
+    benchmark['Company Standard'] = company_benchmark.standard_for(benchmark['brandName'])
+    benchmark = benchmark.dropna(subset=['Company Standard']).reset_index(drop=True)
+    benchmark['Variance'] = benchmark['Contribution'] - benchmark['Company Standard']
+
+    # Benchmark brands the selected store does not sell at all
+    missing_benchmark_brands = company_benchmark.frame[~company_benchmark.frame['brandName'].isin(store_brands)]
+
+    return BrandSales(
+        brand_sales, top_n_brands, top_n_brands_overall, missing_top_brands,
+        quantity_comparison, benchmark, missing_benchmark_brands,
+    )
 
-    top_n_brands = top_n_brands.merge(overall_brand_sales[['brandName', 'total_sales']], on='brandName', suffixes=('', '_overall'))
 
-    company_benchmark = pd.read_csv('./company_bechmark/brand_sales_benchmark.csv')
-    top_n_brands = top_n_brands.merge(company_benchmark, on="brandName", how="left")
+def cached_brand_sales(ctx, n_brands):
+    """compute_brand_sales of the selected store and range, through the result cache."""
+    benchmark = ctx.benchmark('brand')
+    return ctx.cached('brand_sales', lambda: compute_brand_sales(
+        ctx.store_cube, ctx.company_totals('brandName'), benchmark, n_brands
+    ), n_brands, benchmark.version)
+
+
+@st.fragment
+def render_top_brand_sales(ctx):
+    # ---- Top N Brand Sales Analysis ----
+    # st.markdown("<br><br><br><br><br><br><br><br><br><br><br><br><br>", unsafe_allow_html=True)
+    st.markdown("<h4 style='color: green; text-align: center;'>TOP-N BRAND ANALYSIS</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+    # Section controls
+    controls = st.expander("Top-N Brands Control Panel")
+
+    # Get unique brand names for selection
+    unique_brands = ctx.store_cube['brandName'].unique()
+    # UI components
+    n_brands = controls.slider("Select the number of top brands to analyze:", min_value=1, max_value=len(unique_brands), value=DEFAULT_TOP_BRANDS, key="n_brands")
+    selected_brand_color = controls.selectbox("Select Color Scale for Brand Plot:", ['Viridis', 'Plasma', 'Inferno', 'Magma', 'Cividis'], key="brand_color_scale")
+    show_data_labels_brand = controls.checkbox("Show Data Labels for Top N Brand Sales Analysis", value=True, key="show_data_labels_brand")
+    chart_type = controls.selectbox("Select Chart Type:", ["Bar Chart", "Donut Chart", "Line Chart"], key="chart_type_selection")
+
+    result = cached_brand_sales(ctx, n_brands)
+    brand_sales = result.brand_sales
+    top_n_brands = result.top_brands
+    missing_top_brands = result.missing_top_brands
 
-    # Calculate variance in contribution percentage
-    top_n_brands['Variance'] = top_n_brands['Contribution'] - top_n_brands['Company Standard']
-                                                                                                      
     # Prepare only the columns needed for display
     columns_to_display = ['brandName', 'total_sales', 'total_profit', 'total_quantity', 
                           'Contribution', 'Company Standard', 'Variance']
     
-    top_n_brands_display = top_n_brands[columns_to_display].copy()
-
-    # Format the contribution columns for display, retaining the original data for calculations
-    top_n_brands_display['Company Standard'] = (top_n_brands['Company Standard']).map(lambda x: f"{x:.2f}%")
-    top_n_brands_display['Contribution'] = (top_n_brands['Contribution']).map(lambda x: f"{x:.2f}%")
-    top_n_brands_display['Variance'] = (top_n_brands['Variance']).map(lambda x: f"{x:.2f}%")
-
-    top_n_brands_display['total_sales'] = top_n_brands_display['total_sales'].apply(lambda x: f"{x:.2f}")
-    top_n_brands_display['total_profit'] = top_n_brands_display['total_profit'].apply(lambda x: f"{x:.2f}")
+    top_n_brands_display = top_n_brands[columns_to_display]
 
 
 
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_brands = convert_df(top_n_brands_display)
-
-    st.sidebar.download_button(
-            label="Top-N Brands Data",
-            data=csv_brands,   
-            file_name='top_n_brands.csv',
-            mime='text/csv',
-        )
+    csv_download("Top-N Brands Data", top_n_brands_display, 'top_n_brands.csv', controls, scope=ctx.selection_key)
 
     # Fixed chart dimensions (1000x600)
     chart_width, chart_height = 1000, 600
@@ -171,15 +227,7 @@ def top_n_brand_sales_analysis(store_data_filtered, all_data):
         value_name='Percentage'
     )
 
-    # Ensure the 'Percentage' column is properly handled
-    comparison_data['Percentage'] = comparison_data['Percentage'].apply(
-        lambda x: str(x).rstrip('%') if isinstance(x, str) else x
-    )
-
-    # Convert to numeric, coercing errors to NaN if necessary
-    comparison_data['Percentage'] = pd.to_numeric(comparison_data['Percentage'], errors='coerce')
-
-    # Drop rows with invalid data if needed
+    # Brands without a company standard have no point to plot
     comparison_data = comparison_data.dropna(subset=['Percentage'])
 
     # Create the line chart
@@ -199,64 +247,26 @@ def top_n_brand_sales_analysis(store_data_filtered, all_data):
     # Update layout with fixed width
     fig_comparison.update_layout(width=1000)
 
-    # Prepare benchmark analysis from top_n_brands
-    benchmark_analysis = top_n_brands[['brandName', 'total_sales', 'total_profit', 'total_quantity', 'total_cost_price']].copy()
+    benchmark_analysis = result.benchmark
 
-    # Calculate total profit for benchmark brands
-    benchmark_analysis['total_profit'] = benchmark_analysis['total_sales'] - benchmark_analysis['total_cost_price']
-
-    # Calculate totals for contribution calculation
-    total_sales_benchmark = benchmark_analysis['total_sales'].sum()
-    total_profit_benchmark = benchmark_analysis['total_profit'].sum()
-
-    # Calculate contributions
-    benchmark_analysis['Contribution'] = (benchmark_analysis['total_sales'] / total_sales_benchmark) * 100
-    
-    # Merge with company benchmark standards
-    benchmark_analysis = benchmark_analysis.merge(
-        company_benchmark[['brandName', 'Company Standard']], 
-        on='brandName', 
-        how='inner'  
-    )
-    
-    # Calculate variance
-    benchmark_analysis['Variance'] = benchmark_analysis['Contribution'] - benchmark_analysis['Company Standard']
-    
-    # Format for display
-    benchmark_display = benchmark_analysis[['brandName', 'total_sales', 'total_profit', 'total_quantity', 'Contribution', 'Company Standard', 'Variance']].copy()
-    
-    # Format the numeric columns
-    benchmark_display['Company Standard'] = benchmark_display['Company Standard'].map(lambda x: f"{x:.2f}%")
-    benchmark_display['Contribution'] = benchmark_display['Contribution'].map(lambda x: f"{x:.2f}%")
-    benchmark_display['Variance'] = benchmark_display['Variance'].map(lambda x: f"{x:.2f}%")
-    benchmark_display['total_sales'] = benchmark_display['total_sales'].apply(lambda x: f"{x:.2f}")
-    benchmark_display['total_profit'] = benchmark_display['total_profit'].apply(lambda x: f"{x:.2f}")
-    
+    # Columns for display; amounts and percentages are formatted by the table only
+    benchmark_display = benchmark_analysis[['brandName', 'total_sales', 'total_profit', 'total_quantity', 'Contribution', 'Company Standard', 'Variance']]
 
     # Display benchmark comparison first
     st.markdown("<h4 style='color: green; text-align: center;'>BENCHMARK BRANDS COMPARISON</h4>", unsafe_allow_html=True)
-    st.table(benchmark_display.style.apply(
-        lambda x: ['background-color: red' if float(val[:-1]) < 0 else '' for val in benchmark_display['Variance']],
-        subset=['Variance']
+    st.table(styled(
+        benchmark_display,
+        {'total_sales': AMOUNT, 'total_profit': AMOUNT, 'Contribution': PERCENT, 'Company Standard': PERCENT, 'Variance': PERCENT},
+        negative=['Variance'], negative_style='background-color: red',
     ))
     
 
-    # New section: Find benchmark brands not available in the selected store
-    missing_benchmark_brands = benchmark_analysis[~benchmark_analysis['brandName'].isin(store_data_filtered['brandName'])]
-
-    # Section: Find benchmark brands not available in the selected store
-    # Compare benchmark brands directly with the selected store's brands
-    missing_benchmark_brands = company_benchmark[
-        ~company_benchmark['brandName'].isin(store_data_filtered['brandName'])
-    ][['brandName', 'Company Standard']].copy()  # Only keep relevant columns
-
-    # Format 'Company Standard' if needed
-    missing_benchmark_brands['Company Standard'] = missing_benchmark_brands['Company Standard'].map(lambda x: f"{x:.2f}%")
+    missing_benchmark_brands = result.missing_benchmark_brands
 
     # Display missing benchmark brands, or a message if none are missing
     if not missing_benchmark_brands.empty:
         st.markdown("<h4 style='color: red; text-align: center;'>MISSING BENCHMARK BRANDS IN SELECTED STORE</h4>", unsafe_allow_html=True)
-        st.table(missing_benchmark_brands)
+        st.table(styled(missing_benchmark_brands, {'Company Standard': PERCENT}))
     else:
         st.markdown("<h4 style='color: green; text-align: center;'>No missing benchmark brands in the selected store.</h4>", unsafe_allow_html=True)
 
@@ -274,65 +284,32 @@ def top_n_brand_sales_analysis(store_data_filtered, all_data):
     st.markdown("---")
 
     # Create separate DataFrames based on price ranges
-    df_below_100 = brand_sales[brand_sales['total_sales'] < 100]
-    df_100_to_300 = brand_sales[(brand_sales['total_sales'] >= 100) & (brand_sales['total_sales'] <= 300)]
-    df_above_300 = brand_sales[brand_sales['total_sales'] > 300]
-
-    df_below_100['RAG Status'] = 'Red' 
-    df_100_to_300['RAG Status'] = 'Amber' 
-    df_above_300['RAG Status'] = 'Green' 
-
-    df_below_100['total_sales'] = df_below_100['total_sales'].apply(lambda x: f"{x:.2f}")
-    df_below_100['total_profit'] = df_below_100['total_profit'].apply(lambda x: f"{x:.2f}")
-
-    df_100_to_300['total_sales'] = df_100_to_300['total_sales'].apply(lambda x: f"{x:.2f}")
-    df_100_to_300['total_profit'] = df_100_to_300['total_profit'].apply(lambda x: f"{x:.2f}")
-
-    df_above_300['total_sales'] = df_above_300['total_sales'].apply(lambda x: f"{x:.2f}")
-    df_above_300['total_profit'] = df_above_300['total_profit'].apply(lambda x: f"{x:.2f}")
+    df_below_100 = result.rag('Red')
+    df_100_to_300 = result.rag('Amber')
+    df_above_300 = result.rag('Green')
 
     # Prepare the DataFrames for display
+    rag_formats = {'total_sales': AMOUNT, 'total_profit': AMOUNT}
     df_below_100_display = df_below_100[['brandName', 'total_sales', 'total_profit', 'RAG Status']]
     df_100_to_300_display = df_100_to_300[['brandName', 'total_sales', 'total_profit', 'RAG Status']]
     df_above_300_display = df_above_300[['brandName', 'total_sales', 'total_profit', 'RAG Status']]
 
-    csv_red = convert_df(df_below_100)
-    csv_amber = convert_df(df_100_to_300)
-    csv_green = convert_df(df_above_300)
-
-    st.sidebar.download_button(
-            label="RAG red Data",
-            data=csv_red,   
-            file_name='red_brands.csv',
-            mime='text/csv',
-        )
-
-    st.sidebar.download_button(
-            label="RAG Amber Data",
-            data=csv_amber,   
-            file_name='amber_brands.csv',
-            mime='text/csv',
-        )
-
-    st.sidebar.download_button(
-            label="RAG Green Data",
-            data=csv_green,   
-            file_name='green_brands.csv',
-            mime='text/csv',
-        )
+    csv_download("RAG red Data", df_below_100, 'red_brands.csv', controls, scope=ctx.selection_key)
+    csv_download("RAG Amber Data", df_100_to_300, 'amber_brands.csv', controls, scope=ctx.selection_key)
+    csv_download("RAG Green Data", df_above_300, 'green_brands.csv', controls, scope=ctx.selection_key)
 
     st.markdown(
         "<h4 style='color: red; text-align: center;'>Brands sales below 100 Rs.</h4>", 
         unsafe_allow_html=True
     )
-    st.table(df_below_100_display.style.applymap(lambda x: 'background-color: red' if x == 'Red' else '', subset=['RAG Status']))
+    st.table(styled(df_below_100_display, rag_formats).map(lambda x: 'background-color: red' if x == 'Red' else '', subset=['RAG Status']))
 
     st.markdown("<br><br><br><br>", unsafe_allow_html=True)
     st.markdown(
         "<h4 style='color: orange; text-align: center;'>Brands sales between 100 - 300 Rs.</h4>", 
         unsafe_allow_html=True
     )   
-    st.table(df_100_to_300_display.style.applymap(lambda x: 'background-color: orange' if x == 'Amber' else '', subset=['RAG Status']))
+    st.table(styled(df_100_to_300_display, rag_formats).map(lambda x: 'background-color: orange' if x == 'Amber' else '', subset=['RAG Status']))
 
     
     if not missing_top_brands.empty:
@@ -345,42 +322,12 @@ def top_n_brand_sales_analysis(store_data_filtered, all_data):
 
         with tab1:
             # Display the table of missing brands
-            missing_top_brands_display = missing_top_brands.copy()
-            missing_top_brands_display['total_sales'] = missing_top_brands_display['total_sales'].apply(lambda x:f"{x:.2f}")
-            
-            st.table(missing_top_brands_display)
+            st.table(styled(missing_top_brands, {'total_sales': AMOUNT}))
         
         with tab2:
-            # Create a comparison visualization
-            # Get the brands that are present in both datasets
-            common_brands = top_n_brands_overall[
-                top_n_brands_overall['brandName'].isin(store_data_filtered['brandName'])
-            ]['brandName'].tolist()
-            
-            # Prepare data for comparison
-            comparison_data = []
-
-            # Add data for common brands
-            for brand in common_brands:
-                quantity_sold_store = store_data_filtered[store_data_filtered['brandName'] == brand]['quantity'].sum()
-                quantity_sold_all = all_data[all_data['brandName'] == brand]['quantity'].sum()
-                comparison_data.append({
-                    'brandName': brand,
-                    'store_sales_qty': quantity_sold_store,
-                    'all_store_qty': quantity_sold_all,
-                    'Status': 'Present'
-                })
-
-            # Add data for missing brands
-            for _, row in missing_top_brands.iterrows():
-                comparison_data.append({
-                    'brandName': row['brandName'],
-                    'store_sales_qty': 0,
-                    'all_store_qty': row['quantity'],
-                    'Status': 'Missing'
-                })
-            
-            comparison_df = pd.DataFrame(comparison_data)
+            # Store vs overall quantity of the overall top brands
+            comparison_df = result.quantity_comparison
+            common_brands = comparison_df.loc[comparison_df['Status'] == 'Present', 'brandName'].tolist()
             
             # Create a grouped bar chart
             fig_comparison = go.Figure()
@@ -452,17 +399,7 @@ def top_n_brand_sales_analysis(store_data_filtered, all_data):
                 f"{(len(common_brands)/n_brands*100)}% of Top {n_brands}"
             )
 
-        @st.cache_data
-        def convert_df(df):
-            return df.to_csv(index=False).encode('utf-8')
-            
-        csv_missing = convert_df(missing_top_brands)
-        st.sidebar.download_button(
-            label="Missing Top Brands Data",
-            data=csv_missing,
-            file_name='missing_top_brands.csv',
-            mime='text/csv',
-        )
+        csv_download("Missing Top Brands Data", missing_top_brands, 'missing_top_brands.csv', controls, scope=ctx.selection_key)
     else:
         st.markdown(
         "<h6 style='color: green; text-align: center;'>All Top brands are available in the store</h6>", 
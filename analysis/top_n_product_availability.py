@@ -13,7 +13,7 @@ def top_n_product_availability_analysis(store_data):
     store_data_filtered = store_data[store_data['storeName'] == selected_store]
 
     # Group availability by product for the selected store
-    product_availability = store_data_filtered.groupby('productName').agg(
+    product_availability = store_data_filtered.groupby('productName', observed=True).agg(
         total_quantity=('quantity', 'sum'),
     ).reset_index()
 
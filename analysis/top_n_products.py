@@ -1,89 +1,107 @@
+from dataclasses import dataclass
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-def top_n_product_analysis(store_data, all_data):
-    # st.markdown("<br><br><br><br><br><br><br><br><br><br><br>", unsafe_allow_html=True)
-    st.markdown("<h4 style='color: green; text-align: center;'>TOP-N PRODUCTS ANALYSIS</h4>", unsafe_allow_html=True)
-    st.markdown("---")
+from analysis.downloads import csv_download
+from analysis.formatting import AMOUNT, PERCENT, styled
 
-    # Sidebar components
-    st.sidebar.header("Top-N Products Control Panel")
+# Starting value of the top-N products slider
+DEFAULT_TOP_PRODUCTS = 50
 
-    # Select a store from the store names
-    store_names = store_data['storeName'].unique()
-    selected_store = st.sidebar.selectbox("Select a Store:", store_names, key="store_selector_product")
 
-    # Filter the data for the selected store
-    store_data_filtered = store_data[store_data['storeName'] == selected_store]
+@dataclass
+class ProductSales:
+    """Per-product sales of one store, with the RAG band of each product."""
+    product_sales: pd.DataFrame
 
-    # Group sales by product for the selected store
-    product_sales = store_data_filtered.groupby('productName').agg(
-        total_sales=('totalProductPrice', 'sum'),
-        total_quantity=('quantity', 'sum'),
-    ).reset_index()
+    @property
+    def total_sales(self):
+        return self.product_sales['total_sales'].sum()
 
-    total_sales_store = product_sales['total_sales'].sum()
+    def rag(self, status):
+        """Products in one RAG band ('Red', 'Amber' or 'Green')."""
+        rag = self.product_sales[['productName', 'total_sales', 'RAG_Status']]
+        return rag[rag['RAG_Status'] == status]
 
-    # Sort products by total sales and get the top N products
-    unique_products = product_sales['productName'].unique()
-    n_products = st.sidebar.slider("Select the number of top products to analyze:", 
-                                    min_value=1, 
-                                    max_value=len(unique_products), 
-                                    value=50)
 
-    top_n_products_sales = product_sales.nlargest(n_products, 'total_sales')
+def compute_product_sales(store_cube):
+    """Total sales and quantity per product, banded Red (< 100), Amber (<= 300) or Green."""
+    product_sales = store_cube.groupby('productName', observed=True).agg(
+        total_sales=('totalProductPrice', 'sum'),
+        total_quantity=('quantity', 'sum'),
+    ).reset_index()
 
-# Calculate sales contribution % to total sales of the selected store and round to 2 decimals
-    top_n_products_sales['contribution'] = ((top_n_products_sales['total_sales'] / total_sales_store) * 100).round(2).astype(str) + '%'
+    product_sales['RAG_Status'] = product_sales['total_sales'].apply(
+        lambda sales: 'Red' if sales < 100 else ('Amber' if sales <= 300 else 'Green')
+    )
+    return ProductSales(product_sales)
 
-    total_sales_all = all_data['totalProductPrice'].sum()
 
-    all_product_sales = all_data.groupby('productName').agg(
-        total_sales=('totalProductPrice', 'sum')
-    ).reset_index()
+def compute_top_products(product_sales, company_sales, company_revenue, n_products):
+    """The store's top `n_products` by sales, with their share of store and company sales (in percent, 2 places)."""
+    top = product_sales.product_sales.nlargest(n_products, 'total_sales').drop(columns='RAG_Status')
+    top['contribution'] = (top['total_sales'] / product_sales.total_sales * 100).round(2)
 
-    top_n_products_sales = top_n_products_sales.merge(
-        all_product_sales,
+    top = top.merge(
+        company_sales.rename('total_sales').reset_index(),
         on='productName',
         suffixes=('', '_overall')
     )
+    top['company standard'] = (top['total_sales_overall'] / company_revenue * 100).round(2)
+    top['variance'] = (top['contribution'] - top['company standard']).round(2)
+    return top
 
-    top_n_products_sales['company standard'] = ((top_n_products_sales['total_sales_overall'] / total_sales_all) * 100).round(2).astype(str) + '%'
 
-    # Calculate the variance between sales_contribution_store (%) and sales_contribution_all (%) and round to 2 decimals
-    top_n_products_sales['variance'] = (
-        (top_n_products_sales['contribution'].str.rstrip('%').astype(float) - 
-        top_n_products_sales['company standard'].str.rstrip('%').astype(float))
-    ).round(2).astype(str) + '%'
+def cached_product_sales(ctx):
+    """compute_product_sales of the selected store and range, through the result cache."""
+    return ctx.cached('product_sales', lambda: compute_product_sales(ctx.store_cube))
 
 
-    def highlight_negative(val):
-        """
-        Apply red text for negative values in the 'sales_contribution_variance (%)' column.
-        """
-        color = 'red' if '-' in val else 'black'
-        return f'color: {color}'
+def cached_top_products(ctx, product_sales, n_products):
+    """compute_top_products of the selected store and range, through the result cache."""
+    return ctx.cached('top_products', lambda: compute_top_products(
+        product_sales, ctx.company_totals('productName')['totalProductPrice'], ctx.company_revenue, n_products
+    ), n_products)
 
-    df_display = top_n_products_sales[['productName','total_sales','total_quantity','contribution']]
-    df_display['total_sales'] = df_display['total_sales'].apply(lambda x: f"{x:.2f}")
 
-    styled_df = df_display.style.applymap(highlight_negative, subset=['variance'])
+@st.fragment
+def render_top_products(ctx):
+    # st.markdown("<br><br><br><br><br><br><br><br><br><br><br>", unsafe_allow_html=True)
+    st.markdown("<h4 style='color: green; text-align: center;'>TOP-N PRODUCTS ANALYSIS</h4>", unsafe_allow_html=True)
+    st.markdown("---")
+
+    # Section controls
+    controls = st.expander("Top-N Products Control Panel")
+
+    product_sales = cached_product_sales(ctx)
+
+    # Sort products by total sales and get the top N products
+    n_products = controls.slider("Select the number of top products to analyze:", 
+                                    min_value=1, 
+                                    max_value=len(product_sales.product_sales), 
+                                    value=DEFAULT_TOP_PRODUCTS,
+                                    key="n_products")
+
+    top_n_products_sales = cached_top_products(ctx, product_sales, n_products)
+
+    df_display = top_n_products_sales[['productName','total_sales','total_quantity','contribution']]
 
 
     # User input for plot type for Top N Product Analysis
-    plot_type = st.sidebar.selectbox("Select Plot Type for Top N Product Analysis:", 
+    plot_type = controls.selectbox("Select Plot Type for Top N Product Analysis:", 
                                       ["Bar Chart", "Donut Chart", "Line Chart"], 
                                       key="plot_type_product")
 
     # User input for color selection for product plots
     color_options_product = px.colors.named_colorscales()
-    selected_color_product = st.sidebar.selectbox("Select Color Scale for Top N Product Plot:", 
+    selected_color_product = controls.selectbox("Select Color Scale for Top N Product Plot:", 
                                                    color_options_product, 
                                                    key="color_scale_product")
 
     # User input to toggle data labels for Top N Product Analysis
-    show_data_labels_product = st.sidebar.checkbox("Show Data Labels for Top N Product Analysis", 
+    show_data_labels_product = controls.checkbox("Show Data Labels for Top N Product Analysis", 
                                                     value=True, 
                                                     key="show_data_labels_product")
 
@@ -145,20 +163,9 @@ def top_n_product_analysis(store_data, all_data):
         st.plotly_chart(fig_product, use_container_width=False)
 
     # Display the DataFrame for Top N Product Analysis
-    st.table(df_display)
+    st.table(styled(df_display, {'total_sales': AMOUNT, 'contribution': PERCENT}))
 
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv_prod = convert_df(df_display)
-
-    st.sidebar.download_button(
-            label="Download Top-N Sales Data",
-            data=csv_prod,   
-            file_name='top_n_sales.csv',
-            mime='text/csv',
-        )
+    csv_download("Download Top-N Sales Data", df_display, 'top_n_sales.csv', controls, scope=ctx.selection_key)
 
     # Plotting to compare contribution and company standard for top N products
     fig_comparison = px.line(
@@ -202,56 +209,14 @@ def top_n_product_analysis(store_data, all_data):
 
 
 
-    product_sales_rag = store_data_filtered.groupby('productName').agg(
-        total_sales=('totalProductPrice', 'sum')
-    ).reset_index()
-
-
-    product_sales_rag['RAG_Status'] = product_sales_rag['total_sales'].apply(
-    lambda sales: 'Red' if sales < 100 else ('Amber' if sales <= 300 else 'Green')
-    )
-
-
-
-    # # ---- RAG Analysis ----
-    # st.markdown("---")
-    # st.markdown("<h2 style='color: green; text-align: center;'>RAG ANALYSIS BY TOTAL SALES</h2>", unsafe_allow_html=True)
-    # st.markdown("---")
-
-
-
-    rag_red = product_sales_rag[product_sales_rag['RAG_Status'] == 'Red']
-    rag_red['total_sales'] = rag_red['total_sales'].apply(lambda x: f"{x:.2f}")
-    rag_amber = product_sales_rag[product_sales_rag['RAG_Status'] == 'Amber']
-    rag_amber['total_sales'] = rag_amber['total_sales'].apply(lambda x: f"{x:.2f}")
-    rag_green = product_sales_rag[product_sales_rag['RAG_Status'] == 'Green']
-    rag_green['total_sales'] = rag_green['total_sales'].apply(lambda x: f"{x:.2f}")
-
+    rag_red = product_sales.rag('Red')
+    rag_amber = product_sales.rag('Amber')
+    rag_green = product_sales.rag('Green')
 
-    csv_red = convert_df(rag_red)
-    csv_amber = convert_df(rag_amber)
-    csv_green = convert_df(rag_green)
 
-    st.sidebar.download_button(
-            label="Download Red Category Data",
-            data=csv_red,   
-            file_name='red.csv',
-            mime='text/csv',
-        )
-
-    st.sidebar.download_button(
-            label="Download Amber Category Data",
-            data=csv_amber,   
-            file_name='amber.csv',
-            mime='text/csv',
-        )
-
-    st.sidebar.download_button(
-            label="Download Green Category Data",
-            data=csv_green,   
-            file_name='red.csv',
-            mime='text/csv',
-        )
+    csv_download("Download Red Category Data", rag_red, 'red.csv', controls, scope=ctx.selection_key)
+    csv_download("Download Amber Category Data", rag_amber, 'amber.csv', controls, scope=ctx.selection_key)
+    csv_download("Download Green Category Data", rag_green, 'green.csv', controls, scope=ctx.selection_key)
 
     # Function to highlight RAG status
     # def highlight_rag_status(rag):
@@ -1,25 +1,43 @@
 import streamlit as st
 import pandas as pd
-from analysis.sales_by_category import sales_by_category_analysis
-from analysis.time_slot_analysis import time_slot_analysis
-from analysis.sales_per_channel import sales_per_channel_analysis
-from analysis.top_n_brand_sales import top_n_brand_sales_analysis
+from analysis.sales_by_category import render_sales_by_category
+from analysis.time_slot_analysis import render_time_slot_analysis
+from analysis.sales_per_channel import render_sales_per_channel
+from analysis.top_n_brand_sales import render_top_brand_sales
 # from brand_availability import top_n_brand_availability_analysis
-from analysis.top_n_products import top_n_product_analysis
+from analysis.top_n_products import render_top_products
 # from top_n_product_availability import top_n_product_availability_analysis
-from analysis.fnb_performance import fnb_performance_analysis
-from analysis.monetized_brands import analyze_monetized_brands
-from analysis.counter_shelf_analysis import analyze_counter_shelf_products
+from analysis.fnb_performance import render_fnb_performance
+from analysis.monetized_brands import render_monetized_brands
+from analysis.counter_shelf_analysis import render_counter_shelf_products
 # from low_performing_brand import low_performing_brand_analysis
 # from low_performing_products import low_performing_product_analysis
-from analysis.profit import display_profit_metrics
-from analysis.grn_analysis import grn_analysis, upload_stock_data
-from analysis.order_analysis import order_analysis
+from analysis.profit import render_profit_metrics
+from analysis.grn_analysis import render_grn_analysis, upload_stock_data
+from analysis.order_analysis import render_order_analysis
+from analysis.store_leaderboard import render_store_leaderboard
+from analysis.store_comparison import render_store_comparison
+from analysis.ingest import load_sales_csv
+from analysis.snapshot_cache import content_hash, load_snapshot, save_snapshot, cache_usage, clear_cache
+from analysis.dataset_registry import get_registry, current_session_id
+from analysis.partition_index import PartitionIndex
+from analysis.cube import load_or_build_cube
+from analysis.kpi import KpiService
+from analysis.context import AnalysisContext
+from analysis.filters import FilterState, filter_options
+from analysis.company_standards import STANDARD_SOURCES
+from analysis.peer_groups import DEFAULT_PEER_GROUPS
+from analysis.result_cache import get_result_cache
+from analysis.downloads import get_download_cache
+from analysis.prefetch import prefetch_sections
 from PIL import Image
 import numpy as np
 # import os
 # import io
 
+# Sessions share one in-memory copy of each dataset; copy-on-write keeps their views from modifying it
+pd.set_option("mode.copy_on_write", True)
+
 # Set page configuration
 st.set_page_config(page_title="TNS DataFactory", page_icon=":bar_chart:", layout="wide")
 
@@ -159,73 +177,108 @@ st.markdown("""
 # Title
 # st.markdown("<h1>🏭 TNS Data Factory (WIP)</h1>", unsafe_allow_html=True)
 
-# Use cache to store uploaded data
-@st.cache_data
-def load_data(uploaded_file):
-    data = pd.read_csv(uploaded_file)
-    data['orderDate'] = pd.to_datetime(data['orderDate'], format="mixed", dayfirst=True, errors="coerce")
-    return data
+# Sessions only keep the key of their dataset; the frame itself lives in the shared registry
+registry = get_registry()
+results = get_result_cache()
+session_id = current_session_id()
 
-def parse_time(time_str):
-    """
-    Parse time string in various formats to datetime.time object
-    """
-    try:
-        return pd.to_datetime(time_str, format='%H:%M:%S.%fZ').time()
-    except ValueError:
-        try:
-            return pd.to_datetime(time_str, format='%H:%M:%S').time()
-        except ValueError:
-            try:
-                return pd.to_datetime(time_str, format='%H:%M').time()
-            except ValueError:
-                return None
-
-if 'data' not in st.session_state:
-    st.session_state.data = None
+if 'dataset_key' not in st.session_state:
+    st.session_state.dataset_key = None
 if 'show_uploader' not in st.session_state:
     st.session_state.show_uploader = True
 
+# Reopen the dataset named in the URL from the snapshot cache, e.g. after a browser reload or server restart
+if st.session_state.dataset_key is None and "dataset" in st.query_params:
+    requested_key = st.query_params["dataset"]
+    if registry.acquire(requested_key, session_id, lambda: load_snapshot(requested_key)) is not None:
+        st.session_state.dataset_key = requested_key
+        st.session_state.show_uploader = False
+
 # File uploader
 if st.session_state.show_uploader:
     uploaded_file = st.file_uploader("Upload CSV file", type="csv")
     if uploaded_file is not None:
-        # Load the uploaded data
-        st.session_state.data = pd.read_csv(uploaded_file)
-        
-        # Parse the 'orderDate' column
-        if 'orderDate' in st.session_state.data.columns:
-            st.session_state.data['orderDate'] = pd.to_datetime(st.session_state.data['orderDate'], format="mixed", dayfirst=True, errors="coerce")
-
-        # Parse the 'time' column with the new dynamic parsing
-        if 'time' in st.session_state.data.columns:
-            st.session_state.data['time'] = st.session_state.data['time'].apply(parse_time)
-        
+        # Identical uploads share a snapshot, so only parse the CSV the first time these bytes are seen
+        dataset_key = content_hash(uploaded_file)
+
+        def read_upload():
+            data = load_snapshot(dataset_key)
+            if data is None:
+                # Stream the upload into a typed frame; orderDate and time are parsed chunk by chunk
+                progress_bar = st.progress(0.0, text="Loading sales data...")
+                data = load_sales_csv(
+                    uploaded_file,
+                    progress=lambda done: progress_bar.progress(done, text=f"Loading sales data... {done:.0%}")
+                )
+                progress_bar.empty()
+                save_snapshot(dataset_key, data)
+            return data
+
+        registry.acquire(dataset_key, session_id, read_upload)
+        st.session_state.dataset_key = dataset_key
+        st.query_params["dataset"] = dataset_key
         st.session_state.show_uploader = False
 
 # Toggle button to show/hide the uploader
 if st.button("^"):
     st.session_state.show_uploader = not st.session_state.show_uploader
 
+# Read-only view of this session's dataset; reloaded from its snapshot if the registry dropped it meanwhile
+data = None
+if st.session_state.dataset_key is not None:
+    dataset_key = st.session_state.dataset_key
+    data = registry.acquire(dataset_key, session_id, lambda: load_snapshot(dataset_key))
+
 # Proceed only if data is loaded
-if st.session_state.data is not None:
-    data = st.session_state.data
+if data is not None:
+    # Store/date lookups are binary searches over the (storeName, orderDate) sorted frame
+    index = registry.artifact(dataset_key, 'partition_index', PartitionIndex)
+    # Daily store/category/brand/product/channel cube for everything that only needs sums; persisted next to the snapshot
+    cube_index = registry.artifact(dataset_key, 'cube_index', lambda frame: PartitionIndex(load_or_build_cube(dataset_key, frame)))
+    # Per-store daily prefix sums: every KPI card below is a couple of array lookups
+    kpis = registry.artifact(dataset_key, 'kpis', KpiService)
 
     # Move selectors and inputs to sidebar
     with st.sidebar:
         st.markdown("### Control Panel")
         
         # Store selection
-        store_names = data['storeName'].unique()
+        store_names = index.store_names
         selected_store = st.selectbox("Select a Store:", store_names, key="store_selector")
 
         # Date range selection
-        start_date = st.date_input("Select Start Date:", value=data['orderDate'].min().date(),
-                                   min_value=data['orderDate'].min().date(),
-                                   max_value=data['orderDate'].max().date())
-        end_date = st.date_input("Select End Date:", value=data['orderDate'].max().date(),
-                                 min_value=data['orderDate'].min().date(),
-                                 max_value=data['orderDate'].max().date())
+        start_date = st.date_input("Select Start Date:", value=index.min_date.date(),
+                                   min_value=index.min_date.date(),
+                                   max_value=index.max_date.date())
+        end_date = st.date_input("Select End Date:", value=index.max_date.date(),
+                                 min_value=index.min_date.date(),
+                                 max_value=index.max_date.date())
+        # A reversed range would leave every KPI empty; read it the way it was meant
+        if start_date > end_date:
+            st.warning("The start date is after the end date; the two have been swapped.")
+            start_date, end_date = end_date, start_date
+
+        # Optional narrowing of the selected store's data; every section sees the same filtered slices
+        channels = st.multiselect("Channels:", filter_options(index, 'orderType'), key="filter_channels",
+                                  placeholder="All channels")
+        categories = st.multiselect("Categories:", filter_options(index, 'subCategoryOf'), key="filter_categories",
+                                    placeholder="All categories")
+        if channels or categories:
+            st.caption("Channel and category filters apply to the section tables; the KPI cards, "
+                       "company standards and leaderboard cover all sales.")
+
+        # Read by every section's download buttons
+        st.checkbox("Compress downloads (gzip)", key="gzip_downloads")
+
+        # Standards the KPI cards and variance columns compare against
+        standards = st.radio(
+            "Company standards:", list(STANDARD_SOURCES), format_func=STANDARD_SOURCES.get, key="standards",
+            help="Compare against the benchmark files, or against standards measured from the selected dates' "
+                 "sales of every store or of the stores with a category mix like the selected one.",
+        )
+        n_peer_groups = DEFAULT_PEER_GROUPS
+        if standards == 'peers':
+            n_peer_groups = st.slider("Peer groups:", 2, 10, DEFAULT_PEER_GROUPS, key="n_peer_groups")
 
   
     # Convert start_date and end_date to datetime64[ns] for comparison
@@ -234,16 +287,44 @@ if st.session_state.data is not None:
 
     date_range_length = (end_date - start_date).days + 1
 
-    # Filter data based on selected store and date range
-    store_data = data[(data['storeName'] == selected_store) & 
-                      (data['orderDate'] >= start_date) & 
-                      (data['orderDate'] <= end_date)]
+    # The one selection every section works from, sliced once through the partition indexes
+    filters = FilterState(selected_store, start_date, end_date, tuple(channels), tuple(categories))
+
+    # Store/date slices and shared intermediates, computed once and handed to every section
+    ctx = AnalysisContext(index, cube_index, kpis, filters, dataset_key, results, standards, n_peer_groups)
+    if standards == 'peers':
+        st.sidebar.caption(f"Peers of {selected_store}: {', '.join(store for store in ctx.peers if store != selected_store) or 'none'}")
+    # Company figures the KPI cards compare against, fixed or measured from the selected dates
+    company_daily_avg = ctx.average_daily_sales
+
+    # Sections in page order and whether they start open; each is computed only while its toggle is on
+    sections = {
+        "Store Leaderboard": False,
+        "Profit": True,
+        "Order Analysis": True,
+        "Sales by Category": False,
+        "Time Slot Analysis": False,
+        "Sales per Channel": False,
+        "Top-N Brands": False,
+        "Top-N Products": False,
+        "F&B Performance": False,
+        "Monetized Brands": False,
+        "Counter Shelf Products": False,
+        "Store Comparison": False,
+    }
+    open_sections = [title for title, expanded in sections.items() if st.session_state.get(f"section_open:{title}", expanded)]
+    # The open sections' kernels run concurrently while the page renders top to bottom
+    prefetched = prefetch_sections(ctx, open_sections, {key: st.session_state[key] for key in ('n_brands', 'n_products', 'comparison_stores') if key in st.session_state})
 
-    # Filter for available stock using the quantity column
-    store_data_filtered = store_data[store_data['quantity'] > 0]
+    def lazy_section(title, render, *args):
+        if st.toggle(title, value=sections[title], key=f"section_open:{title}"):
+            if title in prefetched:
+                # Wait for its results; a kernel error resurfaces, and is reported, in render
+                prefetched[title].exception()
+            return render(*args)
 
     # Calculate the total number of unique stores for overall data
-    overall_unique_store_count = data['storeName'].nunique()
+    overall_unique_store_count = len(index.store_names)
 
     # Define the performance rating function based on the logic you provided
     def performance_rating(avg_price, overall_average):
@@ -258,21 +339,23 @@ if st.session_state.data is not None:
         else:
             return 'Poor'
       
-    selected_store_total_revenue = store_data['totalProductPrice'].sum()
-
-    overall_data_filtered = data[(data['orderDate'] >= start_date) & 
-                              (data['orderDate'] <= end_date)]
+    selected_store_total_revenue = kpis.total(selected_store, start_date, end_date)
+    selected_store_line_count = kpis.total(selected_store, start_date, end_date, 'lines')
 
     # Calculate total revenue for all stores
-    overall_total_revenue = overall_data_filtered['totalProductPrice'].sum()
+    overall_total_revenue = kpis.total(None, start_date, end_date)
+
+    # Whether any store sold in the selected range
+    range_has_sales = kpis.has_sales(None, start_date, end_date)
 
-    if len(overall_data_filtered) > 0:
-        overall_avg_sales = 42358 * date_range_length
+    # Live standards are 0 for a range in which no store (or no peer) sold; every ratio below checks for that
+    if range_has_sales and company_daily_avg > 0:
+        overall_avg_sales = company_daily_avg * date_range_length
     else:
         overall_avg_sales = 0
 
-    if len(store_data) > 0:
-        selected_store_avg_sales = selected_store_total_revenue / len(store_data)
+    if selected_store_line_count > 0:
+        selected_store_avg_sales = selected_store_total_revenue / selected_store_line_count
     else:
         selected_store_avg_sales = 0
 
@@ -296,6 +379,9 @@ if st.session_state.data is not None:
         selected_store_percentage_contribution = 0
 
     store_performance['performanceRating'] = store_performance['averageTotalProductPrice'].apply(performance_rating, overall_average=overall_avg_sales)
+    # Every store side by side; picking one there switches the page to it
+    lazy_section("Store Leaderboard", render_store_leaderboard, ctx)
+
     # Create KPI Cards for key metrics
     st.markdown(f"<h2 style='color: green; text-align: center;'>{selected_store}</h2>", unsafe_allow_html=True)
     st.markdown(
@@ -315,7 +401,7 @@ if st.session_state.data is not None:
         column.markdown(delta_text, unsafe_allow_html=True)
 
     # Calculate the percentage difference between overall average sales and store total revenue
-    total_revenue_difference_percentage = ((selected_store_total_revenue - overall_avg_sales) / overall_avg_sales) * 100
+    total_revenue_difference_percentage = ((selected_store_total_revenue - overall_avg_sales) / overall_avg_sales) * 100 if overall_avg_sales > 0 else 0
 
     # Create three equal columns
     col1, col2, col3 = st.columns(3, gap="large")
@@ -375,87 +461,15 @@ if st.session_state.data is not None:
             delta_color="normal"  
         )
 
-    display_profit_metrics(data, selected_store, start_date, end_date)
-    order_analysis(store_data)
-    selected_store_data = data[data['storeName'] == selected_store]
-    all_data = data.copy()
-    sales_by_category_analysis(store_data, all_data)
-    time_slot_analysis(store_data, all_data)
-
-    selected_store_data = data[data['storeName'] == selected_store]
-    selected_store_data['orderDate'] = pd.to_datetime(selected_store_data['orderDate'], format='%d-%m-%Y')
-    
-    selected_store_data['year'] = selected_store_data['orderDate'].dt.isocalendar().year
-    selected_store_data['week'] = selected_store_data['orderDate'].dt.isocalendar().week
-    selected_store_data['year'] = selected_store_data['orderDate'].dt.year
-    selected_store_data['month'] = selected_store_data['orderDate'].dt.month
-
-    filtered_data = data[(data['orderDate'] >= start_date) & (data['orderDate'] <= end_date)]
-
-    filtered_data['month'] = filtered_data['orderDate'].dt.month
-
-    # Calculate monthly sales for each store
-    monthly_sales_per_store = filtered_data.groupby(['storeName', 'month'])['totalProductPrice'].sum().reset_index()
-
-    # Calculate average monthly sales for each store
-    average_monthly_sales_per_store = monthly_sales_per_store.groupby('storeName')['totalProductPrice'].mean().reset_index()
-    average_monthly_sales_per_store.rename(columns={'totalProductPrice': 'averageMonthlySales'}, inplace=True)
-
-    # Calculate overall average monthly sales based on unique store names in the filtered data
-    overall_average_monthly_sales = filtered_data['totalProductPrice'].sum() / filtered_data['month'].nunique() / filtered_data['storeName'].nunique()
+    lazy_section("Profit", render_profit_metrics, ctx)
+    lazy_section("Order Analysis", render_order_analysis, ctx)
+    lazy_section("Sales by Category", render_sales_by_category, ctx)
+    lazy_section("Time Slot Analysis", render_time_slot_analysis, ctx)
 
-    # Calculate percentage difference
-    average_monthly_sales_per_store['percentageDifference'] = (
-        (average_monthly_sales_per_store['averageMonthlySales'] - overall_average_monthly_sales) / overall_average_monthly_sales
-    ) * 100
-
-        # Add overall average to the DataFrame
-    average_monthly_sales_per_store['overallAverageMonthlySales'] = overall_average_monthly_sales
-
-    data['orderDate'] = pd.to_datetime(data['orderDate'], format='%d-%m-%Y', errors='coerce')
-
-    # Filter data for the selected date range
-    filtered_data = data[(data['orderDate'] >= start_date) & (data['orderDate'] <= end_date)]
-
-    # Calculate daily sales for each store
-    daily_sales_per_store = filtered_data.groupby(['storeName', 'orderDate'])['totalProductPrice'].sum().reset_index()
-
-    # Calculate average daily sales for each store
-    average_daily_sales_per_store = daily_sales_per_store.groupby('storeName')['totalProductPrice'].mean().reset_index()
-    average_daily_sales_per_store.rename(columns={'totalProductPrice': 'averageDailySales'}, inplace=True)
-
-    # Calculate overall average daily sales based on unique store names in the filtered data
-    overall_average_daily_sales = filtered_data['totalProductPrice'].sum() / filtered_data['orderDate'].nunique() / filtered_data['storeName'].nunique()
-
-    # Calculate percentage difference
-    average_daily_sales_per_store['percentageDifference'] = (
-        (average_daily_sales_per_store['averageDailySales'] - overall_average_daily_sales) / overall_average_daily_sales
-    ) * 100
-
-    # Add overall average daily sales to the DataFrame
-    average_daily_sales_per_store['overallAverageDailySales'] = overall_average_daily_sales
-
-    # Convert 'orderDate' to datetime
-    data['orderDate'] = pd.to_datetime(data['orderDate'], format='%d-%m-%Y', errors='coerce')
-
-    # Filter data for the selected date range
-    filtered_data = data[(data['orderDate'] >= start_date) & (data['orderDate'] <= end_date)]
-
-    # Extract week number from orderDate
-    filtered_data['week_number'] = filtered_data['orderDate'].dt.isocalendar().week
-
-    weekly_sales_per_store = filtered_data.groupby(['storeName', 'week_number'])['totalProductPrice'].sum().reset_index()
-
-    average_weekly_sales_per_store = weekly_sales_per_store.groupby('storeName')['totalProductPrice'].mean().reset_index()
-    average_weekly_sales_per_store.rename(columns={'totalProductPrice': 'averageWeeklySales'}, inplace=True)
-
-    overall_average_weekly_sales = filtered_data['totalProductPrice'].sum() / filtered_data['week_number'].nunique() / filtered_data['storeName'].nunique()
-
-    average_weekly_sales_per_store['percentageDifference'] = (
-        (average_weekly_sales_per_store['averageWeeklySales'] - overall_average_weekly_sales) / overall_average_weekly_sales
-    ) * 100
-
-    average_weekly_sales_per_store['overallAverageWeeklySales'] = overall_average_weekly_sales
+    # Store averages per day, ISO week and month over the selected range
+    store_avg = kpis.period_average(selected_store, start_date, end_date, 'day')
+    store_avg_weekly = kpis.period_average(selected_store, start_date, end_date, 'week')
+    store_avg_monthly = kpis.period_average(selected_store, start_date, end_date, 'month')
 
     col1, col2, col3 = st.columns([1, 1, 1])
 
@@ -468,16 +482,15 @@ if st.session_state.data is not None:
             <hr style='border: 1px solid #0072B8; width: 80%; margin: auto;'/>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Store Avg. Daily Sales</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {average_daily_sales_per_store[average_daily_sales_per_store['storeName'] == selected_store]['averageDailySales'].mean():,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {store_avg:,.2f}</h3>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Overall Avg.</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {42358:,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {company_daily_avg:,.2f}</h3>
             """,
             unsafe_allow_html=True
         )
 
-        store_avg = average_daily_sales_per_store[average_daily_sales_per_store['storeName'] == selected_store]['averageDailySales'].mean()
-        percentage_difference_daily = ((store_avg - 42358) / 42358) * 100
+        percentage_difference_daily = ((store_avg - company_daily_avg) / company_daily_avg) * 100 if company_daily_avg > 0 else 0
 
         if percentage_difference_daily > 0:
             st.markdown(f"<h4 style='color: green; text-align: center; margin: 0; font-size: 16px;'>+{percentage_difference_daily:.2f}%</h4>", unsafe_allow_html=True)
@@ -488,7 +501,7 @@ if st.session_state.data is not None:
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-        if filtered_data.empty:
+        if not range_has_sales:
             st.markdown("<h4 style='text-align: center; color: red;'>No data available for the selected store and date range.</h4>", unsafe_allow_html=True)
 
     with col2:
@@ -500,18 +513,17 @@ if st.session_state.data is not None:
             <hr style='border: 1px solid #0072B8; width: 80%; margin: auto;'/>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Store Avg. Weekly Sales</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {average_weekly_sales_per_store[average_weekly_sales_per_store['storeName'] == selected_store]['averageWeeklySales'].mean():,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {store_avg_weekly:,.2f}</h3>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Overall Avg.</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {42358 * 7:,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {company_daily_avg * 7:,.2f}</h3>
             """,
             unsafe_allow_html=True
         )
 
 
-        store_avg_weekly = average_weekly_sales_per_store[average_weekly_sales_per_store['storeName'] == selected_store]['averageWeeklySales'].mean()
-        overall_avg_weekly = 42358 * 7
-        percentage_difference_weekly = ((store_avg_weekly - overall_avg_weekly) / overall_avg_weekly) * 100
+        overall_avg_weekly = company_daily_avg * 7
+        percentage_difference_weekly = ((store_avg_weekly - overall_avg_weekly) / overall_avg_weekly) * 100 if overall_avg_weekly > 0 else 0
 
         if percentage_difference_weekly > 0:
             st.markdown(f"<h4 style='color: green; text-align: center; margin: 0; font-size: 16px;'>+{percentage_difference_weekly:.2f}%</h4>", unsafe_allow_html=True)
@@ -523,7 +535,7 @@ if st.session_state.data is not None:
         st.markdown("</div>", unsafe_allow_html=True)
 
     # Display a message if no data is available for the selected store and date range
-    if filtered_data.empty:
+    if not range_has_sales:
         st.markdown("<h4 style='text-align: center; color: red;'>No data available for the selected store and date range.</h4>", unsafe_allow_html=True)
 
 
@@ -536,17 +548,16 @@ if st.session_state.data is not None:
             <hr style='border: 1px solid #0072B8; width: 80%; margin: auto;'/>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Store Avg. Monthly Sales</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {average_monthly_sales_per_store[average_monthly_sales_per_store['storeName'] == selected_store]['averageMonthlySales'].mean():,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {store_avg_monthly:,.2f}</h3>
 
             <h4 style='text-align: center; margin: 0; font-size: 14px;'>Overall Avg.</h4>
-            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {42358 * 30:,.2f}</h3>
+            <h3 style='text-align: center; margin: 5px 0; font-size: 24px;'>₹ {company_daily_avg * 30:,.2f}</h3>
             """,
             unsafe_allow_html=True
         )
 
-        store_avg_monthly = average_monthly_sales_per_store[average_monthly_sales_per_store['storeName'] == selected_store]['averageMonthlySales'].mean()
-        overall_avg_monthly = 42358 * 30
-        percentage_difference_monthly = ((store_avg_monthly - overall_avg_monthly) / overall_avg_monthly) * 100
+        overall_avg_monthly = company_daily_avg * 30
+        percentage_difference_monthly = ((store_avg_monthly - overall_avg_monthly) / overall_avg_monthly) * 100 if overall_avg_monthly > 0 else 0
 
         if percentage_difference_monthly > 0:
             st.markdown(f"<h4 style='color: green; text-align: center; margin: 0; font-size: 16px;'>+{percentage_difference_monthly:.2f}%</h4>", unsafe_allow_html=True)
@@ -557,15 +568,16 @@ if st.session_state.data is not None:
 
         st.markdown("</div>", unsafe_allow_html=True)
 
-    if filtered_data.empty:
+    if not range_has_sales:
         st.markdown("<h4 style='text-align: center; color: red;'>No data available for the selected store and date range.</h4>", unsafe_allow_html=True)
 
-    sales_per_channel_analysis(store_data, data)
-    top_n_brand_df = top_n_brand_sales_analysis(store_data, all_data)
-    top_n_product_analysis(store_data, all_data)
-    fnb_performance_analysis(store_data, all_data)
-    analyze_monetized_brands(store_data, all_data)
-    analyze_counter_shelf_products(store_data, all_data)
+    lazy_section("Sales per Channel", render_sales_per_channel, ctx)
+    top_n_brand_df = lazy_section("Top-N Brands", render_top_brand_sales, ctx)
+    lazy_section("Top-N Products", render_top_products, ctx)
+    lazy_section("F&B Performance", render_fnb_performance, ctx)
+    lazy_section("Monetized Brands", render_monetized_brands, ctx)
+    lazy_section("Counter Shelf Products", render_counter_shelf_products, ctx)
+    lazy_section("Store Comparison", render_store_comparison, ctx)
 
     with st.sidebar:
         st.markdown("---")
@@ -578,7 +590,7 @@ if st.session_state.data is not None:
         st.markdown("<h4 style='color: green; text-align: center;'>Stock/Inventory Analysis</h4>", unsafe_allow_html=True)
         st.markdown("---")
 
-        grn_analysis(st.session_state.data, stock_data, selected_store)
+        render_grn_analysis(ctx, stock_data)
         st.markdown("<h4 style='color: green; text-align: center; margin-top: 0px;'>Recommendations</h4>", unsafe_allow_html=True)
         feedback = st.text_area("", "", key="feedback_input_grn")
 
@@ -591,6 +603,31 @@ with st.sidebar:
     st.markdown("### Attach Screenshots")
     uploaded_files = st.file_uploader("Upload screenshots", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
 
+    with st.expander("Admin"):
+        cached_datasets, cached_bytes = cache_usage()
+        st.caption(f"Snapshot cache: {cached_datasets} dataset(s), {cached_bytes / 1024 ** 2:,.1f} MB")
+        resident = registry.stats()
+        st.caption(
+            f"In memory: {len(resident)} dataset(s), {sum(size for _, _, size in resident) / 1024 ** 2:,.1f} MB, "
+            f"{sum(sessions for _, sessions, _ in resident)} session(s)"
+        )
+        result_stats = results.stats()
+        st.caption(
+            f"Result cache: {result_stats['entries']} result(s), {result_stats['bytes'] / 1024 ** 2:,.1f} of "
+            f"{result_stats['max_bytes'] / 1024 ** 2:,.0f} MB, {result_stats['hits']} hit(s) / {result_stats['misses']} miss(es) "
+            f"({result_stats['hit_rate']:.0%} hit rate)"
+        )
+        download_stats = get_download_cache().stats()
+        st.caption(
+            f"Download cache: {download_stats['entries']} file(s), {download_stats['bytes'] / 1024 ** 2:,.1f} of "
+            f"{download_stats['max_bytes'] / 1024 ** 2:,.0f} MB"
+        )
+        if st.button("Clear cache", key="clear_snapshot_cache"):
+            clear_cache()
+            results.clear()
+            get_download_cache().clear()
+            st.success("Snapshot, result and download caches cleared.")
+
 st.markdown("""
     <h2 style='text-align: center; color: #2e7d32;'>Google Reviews</h2>
 """, unsafe_allow_html=True)